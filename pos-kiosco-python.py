@@ -12,7 +12,21 @@ import requests
 import uuid
 import hashlib
 import json
+import unicodedata
+import re
+import bisect
+import collections
+import itertools
+import argparse
+import tempfile
+import time
+import statistics
+import threading
+import queue
+import subprocess
+import shlex
 from pathlib import Path
+from decimal import Decimal, ROUND_HALF_UP
 
 class LicenseManager:
     def __init__(self):
@@ -294,7 +308,1802 @@ class LicenseManager:
         root.destroy()
         sys.exit()
 
+def a_centavos(importe):
+    """Importe en pesos (float, str o Decimal) a centavos enteros, redondeando al centavo"""
+    if importe is None:
+        return 0
+    return int((Decimal(str(importe)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def normalizar_texto(texto):
+    """Minúsculas, sin acentos y con espacios simples ('  Café  Molido' -> 'cafe molido')"""
+    if texto is None:
+        return ''
+    texto = str(texto).lower()
+    if texto.isascii():
+        return ' '.join(texto.split())
+    texto = unicodedata.normalize('NFKD', texto)
+    return ' '.join(''.join(c for c in texto if not unicodedata.combining(c)).split())
+
+class CatalogoProductos:
+    """Índice en memoria del catálogo de productos.
+
+    Se carga una vez al iniciar y se mantiene al día cuando los productos cambian,
+    así las búsquedas por nombre, categoría o código de barras no consultan la BD.
+    Las búsquedas no distinguen mayúsculas ni acentos ("cafe" encuentra "Café").
+    Las filas conservan la estructura de `SELECT * FROM productos`.
+    """
+    DIAS_VENDIDOS = 30  # ventana de ventas recientes que se usa para rankear
+
+    def __init__(self):
+        self.productos = {}  # id -> fila de productos
+        self.por_codigo = {} # código de barras -> [ids] (más de uno si está duplicado)
+        self._orden = []     # [(nombre, id)] ordenado por nombre
+        self._nombres = []   # [(nombre normalizado, id)] ordenado, para buscar por prefijo
+        self._claves = {}    # id -> clave de búsqueda normalizada
+        self._indice = {}    # palabra normalizada -> {ids} (nombre y categoría)
+        self._vocabulario = {}  # palabra (o dos palabras seguidas juntas) -> [(palabras), productos]
+        self._trigramas = {}    # trigrama -> {entradas de `_vocabulario`} (búsqueda aproximada)
+        self._palabras = None  # palabras de `_indice` ordenadas (None = rearmar)
+        self._codigos = None   # códigos de barras ordenados (None = rearmar)
+        self._texto = None   # claves de búsqueda concatenadas en el orden de `_orden`
+        self._inicios = []   # posición donde empieza cada clave dentro de `_texto`
+        self.vendidos = {}   # id -> unidades vendidas en los últimos DIAS_VENDIDOS días
+        self._mas_vendidos = None  # ids ordenados por unidades vendidas (None = rearmar)
+        self._posiciones = None    # ({id: posición en `_orden`}, versión con la que se armó)
+        self.version = 0     # cambia cada vez que cambian los textos o el orden de búsqueda
+
+    def cargar(self, cursor):
+        """Carga (o recarga) todo el catálogo desde la base de datos"""
+        cursor.execute('SELECT * FROM productos')
+        self.productos = {fila[0]: fila for fila in cursor.fetchall()}
+        self._orden = sorted((fila[1], pid) for pid, fila in self.productos.items())
+        self._claves = {}
+        self._indice = {}
+        self._vocabulario = {}
+        self._trigramas = {}
+        for pid, fila in self.productos.items():
+            self._indexar_producto(fila)
+        self._nombres = sorted((clave.split('\n', 1)[0], pid) for pid, clave in self._claves.items())
+        self._texto = None
+        self.version += 1
+        self.por_codigo = {}
+        for pid in sorted(self.productos):
+            codigo = self._codigo(self.productos[pid])
+            if codigo:
+                self.por_codigo.setdefault(codigo, []).append(pid)
+        self._codigos = None
+        self.cargar_vendidos(cursor)
+        
+        duplicados = self.codigos_duplicados()
+        if duplicados:
+            print(f"⚠️ Códigos de barras duplicados ({len(duplicados)}):")
+            for codigo, ids in duplicados.items():
+                print(f"   {codigo}: productos {', '.join(str(i) for i in ids)}")
+
+    def cargar_vendidos(self, cursor):
+        """Unidades vendidas por producto en los últimos DIAS_VENDIDOS días (para el ranking)"""
+        desde = (datetime.now() - timedelta(days=self.DIAS_VENDIDOS)).strftime('%Y-%m-%d')
+        cursor.execute('''
+            SELECT iv.producto_id, SUM(iv.cantidad)
+            FROM ventas v
+            JOIN items_venta iv ON iv.venta_id = v.id
+            WHERE v.fecha >= ? AND iv.producto_id IS NOT NULL
+            GROUP BY iv.producto_id
+        ''', (desde,))
+        self.vendidos = {pid: cantidad for pid, cantidad in cursor.fetchall() if pid in self.productos}
+        self._mas_vendidos = None
+
+    def registrar_venta(self, producto_id, cantidad):
+        """Suma una venta recién registrada al ranking de más vendidos"""
+        if producto_id in self.productos:
+            self.vendidos[producto_id] = self.vendidos.get(producto_id, 0) + cantidad
+            self._mas_vendidos = None
+
+    @staticmethod
+    def _codigo(producto):
+        """Código de barras normalizado como el texto buscado ('' si no tiene): 'ABC123' -> 'abc123'"""
+        return normalizar_texto(producto[6]) if producto[6] else ''
+
+    def codigos_duplicados(self):
+        """Retorna {código: [ids]} de los códigos de barras asignados a más de un producto"""
+        return {codigo: ids for codigo, ids in self.por_codigo.items() if len(ids) > 1}
+
+    def buscar_codigo(self, codigo):
+        """Retorna el producto con ese código de barras (el de menor ID si está duplicado) o None"""
+        ids = self.por_codigo.get(normalizar_texto(codigo))
+        return self.productos[ids[0]] if ids else None
+
+    def _agregar_codigo(self, producto):
+        codigo = self._codigo(producto)
+        if codigo:
+            bisect.insort(self.por_codigo.setdefault(codigo, []), producto[0])
+            self._codigos = None
+
+    def _quitar_codigo(self, producto):
+        codigo = self._codigo(producto)
+        ids = self.por_codigo.get(codigo)
+        if ids and producto[0] in ids:
+            ids.remove(producto[0])
+            if not ids:
+                del self.por_codigo[codigo]
+                self._codigos = None
+
+    @staticmethod
+    def _clave(producto):
+        """Texto de búsqueda: nombre, categoría y código de barras normalizados"""
+        return '\n'.join((normalizar_texto(producto[1]), normalizar_texto(producto[5]),
+                          normalizar_texto(producto[6])))
+
+    @staticmethod
+    def _separar_palabras(texto):
+        """Palabras de un texto ya normalizado ('coca-cola 500ml' -> ['coca', 'cola', '500ml'])"""
+        return [palabra for palabra in re.split(r'[\W_]+', texto) if palabra]
+
+    @staticmethod
+    def _trigramas_de(texto):
+        return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+    @staticmethod
+    def _entradas_vocabulario(palabras):
+        """Palabras sin números y pares de palabras seguidas escritas juntas ('cocacola')"""
+        palabras = [palabra for palabra in palabras if palabra.isalpha()]
+        entradas = {palabra: (palabra,) for palabra in palabras}
+        for primera, segunda in zip(palabras, palabras[1:]):
+            entradas[primera + segunda] = (primera, segunda)
+        return entradas
+
+    def _indexar_producto(self, producto):
+        """Agrega la clave, las palabras y el vocabulario del producto a los índices"""
+        pid = producto[0]
+        clave = self._clave(producto)
+        self._claves[pid] = clave
+        nombre, categoria, _ = clave.split('\n')
+        palabras = self._separar_palabras(f"{nombre} {categoria}")
+        for palabra in palabras:
+            ids = self._indice.get(palabra)
+            if ids is None:
+                self._indice[palabra] = {pid}
+                self._palabras = None
+            else:
+                ids.add(pid)
+        for entrada, partes in self._entradas_vocabulario(palabras).items():
+            registro = self._vocabulario.get(entrada)
+            if registro is not None:
+                registro[1] += 1
+                continue
+            self._vocabulario[entrada] = [partes, 1]
+            for trigrama in self._trigramas_de(entrada):
+                self._trigramas.setdefault(trigrama, set()).add(entrada)
+
+    def _desindexar_producto(self, producto_id):
+        clave = self._claves.pop(producto_id, None)
+        if clave is None:
+            return
+        nombre, categoria, _ = clave.split('\n')
+        palabras = self._separar_palabras(f"{nombre} {categoria}")
+        for palabra in palabras:
+            ids = self._indice.get(palabra)
+            if ids is not None:
+                ids.discard(producto_id)
+                if not ids:
+                    del self._indice[palabra]
+                    self._palabras = None
+        for entrada in self._entradas_vocabulario(palabras):
+            registro = self._vocabulario.get(entrada)
+            if registro is None:
+                continue
+            registro[1] -= 1
+            if registro[1] == 0:
+                del self._vocabulario[entrada]
+                for trigrama in self._trigramas_de(entrada):
+                    entradas = self._trigramas.get(trigrama)
+                    if entradas is not None:
+                        entradas.discard(entrada)
+                        if not entradas:
+                            del self._trigramas[trigrama]
+
+    def _indexar(self):
+        """Arma el texto concatenado sobre el que se buscan subcadenas"""
+        claves = [self._claves[pid] for _, pid in self._orden]
+        self._inicios = []
+        pos = 0
+        for clave in claves:
+            self._inicios.append(pos)
+            pos += len(clave) + 1
+        # '\0' separa productos: no se puede tipear, así que ninguna búsqueda cruza de uno a otro
+        self._texto = '\0'.join(claves)
+
+    def obtener(self, producto_id):
+        """Retorna la fila del producto o None"""
+        return self.productos.get(producto_id)
+
+    def actualizar(self, producto):
+        """Agrega o reemplaza un producto en el índice"""
+        anterior = self.productos.get(producto[0])
+        if anterior is not None and anterior[1] != producto[1]:
+            self._quitar_orden(anterior)
+        if anterior is None or anterior[1] != producto[1]:
+            bisect.insort(self._orden, (producto[1], producto[0]))
+            bisect.insort(self._nombres, (normalizar_texto(producto[1]), producto[0]))
+        if anterior is None or self._codigo(anterior) != self._codigo(producto):
+            if anterior is not None:
+                self._quitar_codigo(anterior)
+            self._agregar_codigo(producto)
+        self._desindexar_producto(producto[0])
+        self._indexar_producto(producto)
+        self.productos[producto[0]] = producto
+        self._texto = None
+        self.version += 1
+
+    def quitar(self, producto_id):
+        """Quita un producto del índice si existe"""
+        anterior = self.productos.pop(producto_id, None)
+        if anterior is not None:
+            self._quitar_orden(anterior)
+            self._quitar_codigo(anterior)
+            self._desindexar_producto(producto_id)
+            self.vendidos.pop(producto_id, None)
+            self._mas_vendidos = None
+            self._texto = None
+            self.version += 1
+
+    def _quitar_orden(self, producto):
+        pos = bisect.bisect_left(self._orden, (producto[1], producto[0]))
+        if pos < len(self._orden) and self._orden[pos] == (producto[1], producto[0]):
+            del self._orden[pos]
+        clave = (normalizar_texto(producto[1]), producto[0])
+        pos = bisect.bisect_left(self._nombres, clave)
+        if pos < len(self._nombres) and self._nombres[pos] == clave:
+            del self._nombres[pos]
+
+    def ajustar_stock(self, producto_id, delta):
+        """Aplica un cambio de stock ya guardado en la BD (no altera el texto indexado)"""
+        producto = self.productos.get(producto_id)
+        if producto is not None:
+            self.productos[producto_id] = producto[:4] + (producto[4] + delta,) + producto[5:]
+
+    def buscar(self, texto=''):
+        """Retorna los productos cuyo nombre, categoría o código contiene `texto`, ordenados por nombre"""
+        texto = normalizar_texto(texto)
+        if not texto:
+            return [self.productos[pid] for _, pid in self._orden]
+        return [self.productos[pid] for pid in self._ids_con_subcadena(texto)]
+
+    def _ids_con_subcadena(self, texto):
+        """Genera, por nombre, los ids cuya clave contiene `texto` (ya normalizado)"""
+        if self._texto is None:
+            self._indexar()
+        inicios = self._inicios
+        orden = self._orden
+        total = len(inicios)
+        pos = self._texto.find(texto)
+        while pos != -1:
+            indice = bisect.bisect_right(inicios, pos) - 1
+            yield orden[indice][1]
+            # Saltar al siguiente producto para no repetir coincidencias
+            if indice + 1 >= total:
+                break
+            pos = self._texto.find(texto, inicios[indice + 1])
+
+    def refinar(self, texto, ids):
+        """Como buscar(texto), pero recorriendo solo `ids` (el resultado de una búsqueda
+        anterior que `texto` extiende, hecha con la misma versión del catálogo)"""
+        texto = normalizar_texto(texto)
+        claves = self._claves
+        productos = self.productos
+        return [productos[pid] for pid in ids if pid in claves and texto in claves[pid]]
+
+    @staticmethod
+    def _rango_prefijo(ordenados, prefijo):
+        """Posiciones [inicio, fin) de los elementos de `ordenados` que empiezan con `prefijo`"""
+        inicio = bisect.bisect_left(ordenados, prefijo)
+        fin = bisect.bisect_left(ordenados, prefijo + '\uffff')
+        return inicio, fin
+
+    def _ids_con_palabras(self, palabras):
+        """Ids que tienen, para cada palabra buscada, alguna palabra que empieza con ella"""
+        if self._palabras is None:
+            self._palabras = sorted(self._indice)
+        resultado = None
+        # Empezar por la palabra más larga: suele ser la que menos productos abarca
+        for palabra in sorted(palabras, key=len, reverse=True):
+            inicio, fin = self._rango_prefijo(self._palabras, palabra)
+            ids = set()
+            for completa in self._palabras[inicio:fin]:
+                ids |= self._indice[completa]
+            resultado = ids if resultado is None else resultado & ids
+            if not resultado:
+                break
+        return resultado or set()
+
+    def mas_vendidos(self):
+        """Ids con ventas recientes, del más vendido al menos vendido"""
+        if self._mas_vendidos is None:
+            self._mas_vendidos = sorted(self.vendidos, key=lambda pid: (-self.vendidos[pid], pid))
+        return self._mas_vendidos
+
+    def buscar_rankeado(self, texto='', limite=100):
+        """Los `limite` productos que mejor coinciden con `texto`, del más al menos relevante.
+
+        Orden de relevancia: código de barras exacto, código que empieza con el texto,
+        nombre que empieza con el texto, todas las palabras buscadas como inicio de palabras
+        del nombre o la categoría, y por último el texto en cualquier parte. Dentro de cada
+        nivel van primero los más vendidos de los últimos DIAS_VENDIDOS días y después el
+        resto por nombre. Cada nivel solo se calcula si los anteriores no alcanzaron `limite`.
+        """
+        texto = normalizar_texto(texto)
+        resultado = []
+        vistos = set()
+        mas_vendidos = [pid for pid in self.mas_vendidos() if pid in self.productos]
+
+        def agregar(ids):
+            for pid in ids:
+                if pid not in vistos:
+                    vistos.add(pid)
+                    resultado.append(self.productos[pid])
+                    if len(resultado) >= limite:
+                        return True
+            return False
+
+        def nivel(coincide, resto):
+            """Agrega los más vendidos que cumplen `coincide` y luego `resto()` (ya en orden)"""
+            return agregar(pid for pid in mas_vendidos if coincide(pid)) or agregar(resto())
+
+        if not texto:
+            agregar(mas_vendidos)
+            agregar(pid for _, pid in self._orden)
+            return resultado
+
+        claves = self._claves
+        if ' ' not in texto:
+            if agregar(self.por_codigo.get(texto, ())):
+                return resultado
+            if self._codigos is None:
+                self._codigos = sorted(self.por_codigo)
+            inicio, fin = self._rango_prefijo(self._codigos, texto)
+            if nivel(lambda pid: claves[pid].rsplit('\n', 1)[1].startswith(texto),
+                     lambda: (pid for codigo in self._codigos[inicio:fin] for pid in self.por_codigo[codigo])):
+                return resultado
+
+        inicio = bisect.bisect_left(self._nombres, (texto,))
+        fin = bisect.bisect_left(self._nombres, (texto + '\uffff',))
+        if nivel(lambda pid: claves[pid].startswith(texto),
+                 lambda: (pid for _, pid in self._nombres[inicio:fin])):
+            return resultado
+
+        palabras = self._separar_palabras(texto)
+        if palabras:
+            ids = self._ids_con_palabras(palabras)
+            if nivel(ids.__contains__, lambda: self._por_nombre(ids - vistos)):
+                return resultado
+
+        agregar(self._ids_con_subcadena(texto))
+        if not resultado:
+            # Nada coincide tal cual: probar con errores de tipeo ("alfajr", "cocacola")
+            ids = self.ids_aproximados(texto)
+            nivel(ids.__contains__, lambda: self._por_nombre(ids))
+        return resultado
+
+    def _por_nombre(self, ids):
+        """Retorna `ids` en orden de nombre"""
+        if self._posiciones is None or self._posiciones[1] != self.version:
+            self._posiciones = ({pid: i for i, (_, pid) in enumerate(self._orden)}, self.version)
+        return sorted(ids, key=self._posiciones[0].__getitem__)
+
+    def ids_aproximados(self, texto):
+        """Ids cuyas palabras empiezan como las de `texto`, admitiendo errores de tipeo.
+
+        Cada palabra buscada se compara con el vocabulario del catálogo (palabras y pares
+        de palabras escritas juntas) preseleccionado por trigramas. Se admite 1 error
+        hasta 5 letras y 2 desde ahí; las palabras cortas o con números deben coincidir.
+        """
+        resultado = None
+        palabras = self._separar_palabras(normalizar_texto(texto))
+        for palabra in sorted(palabras, key=len, reverse=True):
+            if len(palabra) < 3 or not palabra.isalpha():
+                ids = self._ids_con_palabras([palabra])
+            else:
+                ids = set()
+                entradas = self._entradas_parecidas(palabra)
+                for entrada in entradas:
+                    partes = self._vocabulario[entrada][0]
+                    if len(partes) == 1:
+                        ids |= self._indice[entrada]
+                    elif partes[0] not in entradas:
+                        # Un par solo suma si su primera palabra no coincidió ya por sí sola
+                        ids |= self._indice[partes[0]] & self._indice[partes[1]]
+            resultado = ids if resultado is None else resultado & ids
+            if not resultado:
+                break
+        return resultado or set()
+
+    def _entradas_parecidas(self, palabra):
+        """Entradas del vocabulario que empiezan como `palabra` con pocos errores"""
+        maximo = 1 if len(palabra) <= 5 else 2
+        comunes = collections.Counter()
+        for trigrama in self._trigramas_de(palabra):
+            comunes.update(self._trigramas.get(trigrama, ()))
+        # Cada error elimina a lo sumo 3 trigramas de la palabra buscada
+        minimo = len(palabra) - 2 - 3 * maximo
+        return {entrada for entrada, cantidad in comunes.items()
+                if cantidad >= minimo and self._distancia_prefijo(palabra, entrada, maximo) <= maximo}
+
+    @staticmethod
+    def _distancia_prefijo(patron, palabra, maximo):
+        """Menor distancia de edición entre `patron` y algún comienzo de `palabra`.
+
+        Se calcula fila por fila y corta apenas toda la fila supera `maximo`
+        (en ese caso retorna maximo + 1).
+        """
+        anterior = list(range(len(palabra) + 1))
+        for i, letra in enumerate(patron, 1):
+            actual = [i]
+            for j, otra in enumerate(palabra, 1):
+                actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (letra != otra)))
+            if min(actual) > maximo:
+                return maximo + 1
+            anterior = actual
+        return min(min(anterior), maximo + 1)
+
+class Carrito:
+    """Items de la venta en curso, con un índice id -> línea y los totales siempre al día.
+
+    Los importes se acumulan en centavos enteros, así el total no arrastra errores de
+    redondeo. Cada cambio llama a al_cambiar(accion, indice, item) con accion 'agregar',
+    'actualizar', 'quitar' o 'vaciar', para que la vista redibuje solo esa línea.
+    Los items son dicts con id, nombre, precio, costo, cantidad, stock_disponible, categoria
+    y codigo_barras (estos dos se guardan con la venta tal como estaban al vender).
+    """
+
+    def __init__(self, al_cambiar=None):
+        self.items = []
+        self._lineas = {}  # id de producto -> índice en `items`
+        self.total_centavos = 0
+        self.costo_centavos = 0
+        self.al_cambiar = al_cambiar
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, indice):
+        return self.items[indice]
+
+    @property
+    def total(self):
+        return self.total_centavos / 100
+
+    @property
+    def costo_total(self):
+        return self.costo_centavos / 100
+
+    def cantidad_de(self, producto_id):
+        """Unidades del producto que ya hay en el carrito"""
+        indice = self._lineas.get(producto_id)
+        return self.items[indice]['cantidad'] if indice is not None else 0
+
+    def _avisar(self, accion, indice, item):
+        if self.al_cambiar:
+            self.al_cambiar(accion, indice, item)
+
+    def _sumar(self, item, cantidad):
+        item['cantidad'] += cantidad
+        self.total_centavos += item['precio_centavos'] * cantidad
+        self.costo_centavos += item['costo_centavos'] * cantidad
+
+    def agregar(self, producto, cantidad=1):
+        """Suma unidades de un producto (fila del catálogo); si no estaba, agrega la línea"""
+        indice = self._lineas.get(producto[0])
+        if indice is not None:
+            item = self.items[indice]
+            self._sumar(item, cantidad)
+            self._avisar('actualizar', indice, item)
+            return item
+        item = {
+            'id': producto[0],
+            'nombre': producto[1],
+            'precio': producto[2],
+            'costo': producto[3],
+            'cantidad': 0,
+            'stock_disponible': producto[4],
+            'categoria': producto[5],
+            'codigo_barras': producto[6],
+            'precio_centavos': a_centavos(producto[2]),
+            'costo_centavos': a_centavos(producto[3]),
+        }
+        self._sumar(item, cantidad)
+        self._lineas[producto[0]] = len(self.items)
+        self.items.append(item)
+        self._avisar('agregar', len(self.items) - 1, item)
+        return item
+
+    def quitar_unidad(self, indice):
+        """Resta una unidad de la línea; si no quedan, la quita"""
+        item = self.items[indice]
+        if item['cantidad'] <= 1:
+            self.quitar(indice)
+        else:
+            self._sumar(item, -1)
+            self._avisar('actualizar', indice, item)
+
+    def quitar(self, indice):
+        """Quita la línea completa"""
+        item = self.items.pop(indice)
+        self.total_centavos -= item['precio_centavos'] * item['cantidad']
+        self.costo_centavos -= item['costo_centavos'] * item['cantidad']
+        del self._lineas[item['id']]
+        for posterior in self.items[indice:]:
+            self._lineas[posterior['id']] -= 1
+        self._avisar('quitar', indice, item)
+
+    def vaciar(self):
+        self.items = []
+        self._lineas = {}
+        self.total_centavos = 0
+        self.costo_centavos = 0
+        self._avisar('vaciar', None, None)
+
+class TicketPDF:
+    """Ticket en PDF para un rollo de ANCHO_MM, con el largo justo para sus items.
+
+    ServicioTickets lo arma al cobrar y guarda los bytes en ArchivoTickets; también se
+    arma para ver una venta cuyo ticket no se guardó en PDF.
+    """
+    extension = 'pdf'
+    ANCHO_MM = 80
+    MARGEN_MM = 4
+    # Columnas: producto, cantidad, importe (suman el ancho útil del rollo)
+    COLUMNAS_MM = (44, 8, 20)
+    LARGO_NOMBRE = 26
+    ALTO_LINEA_MM = 4
+    ALTO_FIJO_MM = 58   # encabezado, separadores, total y pie
+
+    def renderizar(self, ticket):
+        """Bytes del PDF (sin escribirlo)"""
+        return self._armar_pdf(ticket).output(dest='S').encode('latin-1')
+
+    def _armar_pdf(self, ticket):
+        fecha = datetime.strptime(ticket['fecha'], '%Y-%m-%d %H:%M:%S')
+        ancho_producto, ancho_cantidad, ancho_importe = self.COLUMNAS_MM
+        alto = self.ALTO_FIJO_MM + self.ALTO_LINEA_MM * len(ticket['items'])
+        pdf = FPDF(unit='mm', format=(self.ANCHO_MM, alto))
+        pdf.set_margins(self.MARGEN_MM, self.MARGEN_MM)
+        pdf.set_auto_page_break(False)
+        pdf.add_page()
+
+        # Encabezado
+        pdf.set_font('Arial', 'B', 11)
+        pdf.cell(0, 6, 'KIOSCO - TICKET DE VENTA', 0, 1, 'C')
+        pdf.set_font('Arial', '', 8)
+        pdf.cell(0, 4, f"Ticket N: {ticket['venta_id']}", 0, 1, 'C')
+        pdf.cell(0, 4, f"Fecha: {fecha.strftime('%d/%m/%Y %H:%M')}", 0, 1, 'C')
+        pdf.cell(0, 4, f"Vendedor: {ticket['vendedor']}", 0, 1, 'C')
+        pdf.ln(2)
+        pdf.cell(0, 0, '', 'T', 1)
+        pdf.ln(2)
+
+        # Items
+        pdf.set_font('Arial', 'B', 8)
+        pdf.cell(ancho_producto, 4, 'Producto', 0, 0)
+        pdf.cell(ancho_cantidad, 4, 'Cant.', 0, 0, 'C')
+        pdf.cell(ancho_importe, 4, 'Importe', 0, 1, 'R')
+        pdf.set_font('Arial', '', 8)
+        for nombre, cantidad, importe_centavos in ticket['items']:
+            pdf.cell(ancho_producto, self.ALTO_LINEA_MM, nombre[:self.LARGO_NOMBRE], 0, 0)
+            pdf.cell(ancho_cantidad, self.ALTO_LINEA_MM, str(cantidad), 0, 0, 'C')
+            pdf.cell(ancho_importe, self.ALTO_LINEA_MM, f'${importe_centavos / 100:.2f}', 0, 1, 'R')
+        pdf.ln(2)
+        pdf.cell(0, 0, '', 'T', 1)
+        pdf.ln(2)
+
+        # Total y pie
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(ancho_producto + ancho_cantidad, 6, 'TOTAL:', 0, 0, 'R')
+        pdf.cell(ancho_importe, 6, f"${ticket['total_centavos'] / 100:.2f}", 0, 1, 'R')
+        pdf.set_font('Arial', '', 8)
+        pdf.cell(0, 4, f"Metodo de pago: {ticket['metodo_pago']}", 0, 1, 'C')
+        pdf.ln(3)
+        pdf.set_font('Arial', 'I', 7)
+        pdf.cell(0, 4, 'Gracias por su compra!', 0, 1, 'C')
+        return pdf
+
+class TicketESCPOS:
+    """Ticket como bytes ESC/POS para impresoras térmicas de 58 u 80 mm.
+
+    El texto va en la página de códigos 850 (acentos y ñ) con la fuente A: 32 columnas
+    en 58 mm y 48 en 80 mm. Las partes fijas (inicialización, título, separador, pie y
+    corte) se codifican una sola vez al crear el backend; por ticket solo se arman las
+    líneas variables. `destino` puede ser un archivo o dispositivo (se agrega al final,
+    p. ej. /dev/usb/lp0 o \\\\localhost\\TERMICA) o '|comando' para pasarle los bytes por
+    stdin (p. ej. '|lp -d termica -o raw' o '|C:\\Tools\\RawPrint.exe /p TERMICA'; se ejecuta sin
+    shell, así que no admite tuberías ni redirecciones). Sin destino no se imprime nada.
+    """
+    extension = 'bin'
+    COLUMNAS = {58: 32, 80: 48}
+
+    ESC = b'\x1b'
+    GS = b'\x1d'
+    INICIALIZAR = ESC + b'@'
+    PAGINA_850 = ESC + b't\x02'
+    CENTRADO = ESC + b'a\x01'
+    IZQUIERDA = ESC + b'a\x00'
+    NEGRITA = ESC + b'E\x01'
+    SIN_NEGRITA = ESC + b'E\x00'
+    DOBLE_ALTO = GS + b'!\x01'
+    NORMAL = GS + b'!\x00'
+    CORTE = GS + b'V\x42\x03'   # avanza 3 líneas y corta parcial
+
+    def __init__(self, ancho_mm=80, destino=''):
+        if ancho_mm not in self.COLUMNAS:
+            raise ValueError(f"Ancho de ticket no soportado: {ancho_mm} mm (usar 58 u 80)")
+        self.ancho_mm = ancho_mm
+        self.columnas = self.COLUMNAS[ancho_mm]
+        self.destino = destino
+        # Producto a la izquierda; cantidad (4) e importe (11) alineados a la derecha
+        self.largo_nombre = self.columnas - 16
+        self._separador = ('-' * self.columnas + '\n').encode('cp850')
+        self._inicio = (self.INICIALIZAR + self.PAGINA_850 + self.CENTRADO + self.NEGRITA + self.DOBLE_ALTO
+                        + self._texto('KIOSCO') + self.NORMAL + self._texto('TICKET DE VENTA') + self.SIN_NEGRITA)
+        self._titulos = (self.IZQUIERDA + self._separador + self.NEGRITA
+                         + self._texto(f"{'Producto':<{self.largo_nombre}}{'Cant':>4} {'Importe':>11}")
+                         + self.SIN_NEGRITA)
+        self._pie = self.CENTRADO + b'\n' + self._texto('¡Gracias por su compra!') + self.CORTE
+
+    @staticmethod
+    def _texto(linea):
+        return (linea + '\n').encode('cp850', errors='replace')
+
+    def renderizar(self, ticket):
+        """Bytes ESC/POS del ticket (sin enviarlos)"""
+        fecha = ticket['fecha']
+        lineas = [
+            f"Ticket N: {ticket['venta_id']}",
+            f"Fecha: {fecha[8:10]}/{fecha[5:7]}/{fecha[:4]} {fecha[11:16]}",
+            f"Vendedor: {ticket['vendedor']}",
+        ]
+        cabecera = '\n'.join(lineas) + '\n'
+        ancho = self.largo_nombre
+        detalle = ''.join(
+            f"{nombre[:ancho]:<{ancho}}{cantidad:>4} {'$' + format(importe_centavos / 100, '.2f'):>11}\n"
+            for nombre, cantidad, importe_centavos in ticket['items']
+        )
+        total = f"TOTAL: ${ticket['total_centavos'] / 100:.2f}"
+        return b''.join((
+            self._inicio, cabecera.encode('cp850', errors='replace'),
+            self._titulos, detalle.encode('cp850', errors='replace'), self._separador,
+            self.NEGRITA, self.DOBLE_ALTO, self._texto(f"{total:>{self.columnas}}"), self.NORMAL, self.SIN_NEGRITA,
+            self._texto(f"Pago: {ticket['metodo_pago']}"), self._pie,
+        ))
+
+    def enviar(self, datos):
+        """Manda los bytes de un ticket al destino configurado (impresora, archivo o comando)"""
+        if self.destino.startswith('|'):
+            comando = self.destino[1:]
+            if os.name != 'nt':
+                comando = shlex.split(comando)
+            # En Windows la línea de comandos va tal cual a CreateProcess (rutas con \ y entre comillas)
+            subprocess.run(comando, input=datos, check=True)
+        else:
+            with open(self.destino, 'ab') as salida:
+                salida.write(datos)
+
+class ArchivoTickets:
+    """Tickets agrupados por día: tickets/AAAA-MM-DD.tickets con su índice AAAA-MM-DD.idx.
+
+    Cada ticket se agrega al final del archivo del día tal como lo armó el backend (bytes
+    PDF o ESC/POS). El índice guarda venta_id, posición, largo y formato, así leer un
+    ticket es un seek y un read. Los dos archivos solo crecen al final: un corte a mitad
+    de una escritura deja como mucho el último ticket sin índice, sin tocar los anteriores.
+    """
+
+    def __init__(self, carpeta='tickets'):
+        self.carpeta = carpeta
+        os.makedirs(carpeta, exist_ok=True)
+
+    def _rutas(self, dia):
+        base = os.path.join(self.carpeta, dia)
+        return base + '.tickets', base + '.idx'
+
+    def guardar(self, venta_id, fecha, datos, formato):
+        """Agrega los bytes del ticket al archivo de su día y retorna la ruta del archivo"""
+        ruta_datos, ruta_indice = self._rutas(fecha[:10])
+        with open(ruta_datos, 'ab') as salida:
+            posicion = salida.seek(0, os.SEEK_END)
+            salida.write(datos)
+        with open(ruta_indice, 'a', encoding='ascii') as indice:
+            indice.write(f"{venta_id} {posicion} {len(datos)} {formato}\n")
+        return ruta_datos
+
+    def leer(self, venta_id, dia):
+        """(formato, bytes) del ticket de la venta guardado el día AAAA-MM-DD (None si no está)"""
+        ruta_datos, ruta_indice = self._rutas(dia)
+        buscado = str(venta_id)
+        ubicacion = None
+        try:
+            with open(ruta_indice, encoding='ascii') as indice:
+                for linea in indice:
+                    campos = linea.split()
+                    # Si se reimprimió, vale la última copia
+                    if linea.endswith('\n') and len(campos) == 4 and campos[0] == buscado:
+                        ubicacion = (int(campos[1]), int(campos[2]), campos[3])
+        except FileNotFoundError:
+            return None
+        if ubicacion is None:
+            return None
+        with open(ruta_datos, 'rb') as datos:
+            datos.seek(ubicacion[0])
+            return ubicacion[2], datos.read(ubicacion[1])
+
+class ServicioTickets:
+    """Genera los tickets de venta en un hilo aparte, de a uno y en orden de llegada.
+
+    finalizar_venta encola una foto del carrito (instantanea) y sigue, así la caja queda
+    libre para el próximo cliente. El hilo arma el ticket con el backend, guarda los bytes
+    en el ArchivoTickets del día y, si el backend tiene destino (TicketESCPOS a una
+    impresora), los imprime; el hilo arma un ticket de prueba al arrancar para que el
+    primero real no pague la preparación.
+    Cada resultado queda en `resultados` como (estado, venta_id, destino o error, ms de
+    armado, ms de espera en la cola) para que la interfaz lo lea desde el hilo principal.
+    """
+
+    def __init__(self, backend=None, archivo=None):
+        self.backend = backend or TicketPDF()
+        self.archivo = archivo or ArchivoTickets()
+        self.pendientes = queue.Queue()
+        self.resultados = queue.Queue()
+        self.latencias_ms = collections.deque(maxlen=200)
+        self.hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self.hilo.start()
+
+    @staticmethod
+    def desde_configuracion(configuracion):
+        """Backend según las claves ticket_formato ('pdf'/'escpos'), ticket_ancho_mm y ticket_destino"""
+        if configuracion.texto('ticket_formato', 'pdf') == 'escpos':
+            return TicketESCPOS(configuracion.entero('ticket_ancho_mm', 80), configuracion.texto('ticket_destino', ''))
+        return TicketPDF()
+
+    @staticmethod
+    def instantanea(venta_id, fecha, vendedor, metodo_pago, carrito):
+        """Copia de lo necesario para el ticket (el carrito se vacía apenas termina la venta)"""
+        return {
+            'venta_id': venta_id,
+            'fecha': fecha,
+            'vendedor': vendedor,
+            'metodo_pago': metodo_pago,
+            'total_centavos': carrito.total_centavos,
+            'items': [(item['nombre'], item['cantidad'], item['precio_centavos'] * item['cantidad']) for item in carrito],
+        }
+
+    def encolar(self, ticket):
+        ticket['encolado'] = time.perf_counter()
+        self.pendientes.put(ticket)
+
+    def detener(self, espera=5):
+        """Termina los tickets pendientes y cierra el hilo"""
+        self.pendientes.put(None)
+        self.hilo.join(espera)
+
+    def _trabajar(self):
+        try:
+            self.backend.renderizar(self.instantanea(0, '2000-01-01 00:00:00', '', '', Carrito()))
+        except Exception as e:
+            print(f"⚠️ No se pudo preparar el generador de tickets: {e}")
+        while True:
+            ticket = self.pendientes.get()
+            if ticket is None:
+                return
+            inicio = time.perf_counter()
+            espera_ms = (inicio - ticket['encolado']) * 1000
+            try:
+                backend = self.backend
+                datos = backend.renderizar(ticket)
+                destino = self.archivo.guardar(ticket['venta_id'], ticket['fecha'], datos, backend.extension)
+                if getattr(backend, 'destino', ''):
+                    backend.enviar(datos)
+                    destino = backend.destino
+                armado_ms = (time.perf_counter() - inicio) * 1000
+                self.latencias_ms.append(armado_ms)
+                self.resultados.put(('ok', ticket['venta_id'], destino, armado_ms, espera_ms))
+            except Exception as e:
+                self.resultados.put(('error', ticket['venta_id'], str(e), None, espera_ms))
+
+class MedidorEscaneos:
+    """Tiempos entre escaneos de código de barras en el punto de venta.
+
+    Mide los intervalos que cruzan un cobro (último escaneo de un cliente -> primer escaneo
+    del siguiente), que es lo que agregan los diálogos del cobro. Se guardan por modo
+    ('rapida' o 'normal') junto con cuánto tardó el sistema en dejar la caja lista tras
+    cobrar en venta rápida.
+    """
+
+    def __init__(self, maximo=500):
+        self.entre_ventas = {'rapida': collections.deque(maxlen=maximo), 'normal': collections.deque(maxlen=maximo)}
+        self.listo_ms = collections.deque(maxlen=maximo)
+        self._ultimo = None
+        self._modo_cobro = None   # modo del último cobro si todavía no se escaneó al siguiente cliente
+
+    def escaneo(self):
+        """Registra un escaneo; retorna (segundos desde el anterior, modo del cobro en medio o None)"""
+        ahora = time.perf_counter()
+        anterior, self._ultimo = self._ultimo, ahora
+        modo, self._modo_cobro = self._modo_cobro, None
+        if anterior is None:
+            return None, None
+        intervalo = ahora - anterior
+        if modo:
+            self.entre_ventas[modo].append(intervalo)
+        return intervalo, modo
+
+    def cobro(self, modo, listo_ms=None):
+        """Marca el fin de una venta (el próximo escaneo ya es del cliente siguiente)"""
+        self._modo_cobro = modo
+        if listo_ms is not None:
+            self.listo_ms.append(listo_ms)
+
+    def resumen(self, modo):
+        """(cantidad, mediana en s) de los intervalos entre clientes del modo"""
+        intervalos = self.entre_ventas[modo]
+        return len(intervalos), statistics.median(intervalos) if intervalos else 0.0
+
+    def listo_mediana(self):
+        """Mediana en ms de lo que tardó la caja en quedar lista tras un cobro rápido (None sin datos)"""
+        return statistics.median(self.listo_ms) if self.listo_ms else None
+
+class BusquedaIncremental:
+    """Búsqueda mientras se escribe en un Entry.
+
+    Espera una pausa en el tecleo (root.after) y cada tecla nueva cancela la búsqueda
+    pendiente. Si el texto extiende al de la búsqueda anterior y el catálogo no cambió,
+    filtra ese resultado en lugar de recorrer todo el catálogo. Las teclas que no cambian
+    el texto (flechas, modificadores, F1-F12, etc.) no programan otra búsqueda. Con
+    `limite` muestra solo los mejores resultados de CatalogoProductos.buscar_rankeado (el
+    índice ya es rápido).
+    """
+    ESPERA_MS = 120
+
+    def __init__(self, root, entry, catalogo, mostrar, al_medir=None, limite=None):
+        self.root = root
+        self.entry = entry
+        self.catalogo = catalogo
+        self.limite = limite
+        self.mostrar = mostrar      # mostrar(productos): dibuja el resultado
+        self.al_medir = al_medir    # al_medir(ms): latencia de búsqueda + dibujo
+        self._pendiente = None
+        self._anterior = None       # (texto, versión del catálogo, [ids])
+        self._texto = entry.get()   # texto de la última búsqueda programada
+        self.ultima_ms = 0.0
+        self.maxima_ms = 0.0
+        entry.bind('<KeyRelease>', self.tecla)
+
+    def tecla(self, event=None):
+        texto = self.entry.get()
+        if texto == self._texto:
+            return
+        self._texto = texto
+        self.programar()
+
+    def programar(self):
+        """Reprograma la búsqueda descartando la que estaba pendiente"""
+        self.cancelar()
+        self._pendiente = self.root.after(self.ESPERA_MS, self.ejecutar)
+
+    def cancelar(self):
+        if self._pendiente is not None:
+            self.root.after_cancel(self._pendiente)
+            self._pendiente = None
+
+    def ejecutar(self):
+        self._pendiente = None
+        try:
+            texto = self.entry.get()
+        except tk.TclError:
+            # El Entry se destruyó mientras la búsqueda esperaba
+            return
+        inicio = time.perf_counter()
+        self.mostrar(self.buscar(texto))
+        self.ultima_ms = (time.perf_counter() - inicio) * 1000
+        self.maxima_ms = max(self.maxima_ms, self.ultima_ms)
+        if self.al_medir:
+            self.al_medir(self.ultima_ms)
+
+    def buscar(self, texto):
+        """Resultado para `texto`, reutilizando la búsqueda anterior cuando se puede"""
+        if self.limite:
+            return self.catalogo.buscar_rankeado(texto, self.limite)
+        texto = normalizar_texto(texto)
+        anterior = self._anterior
+        if (anterior and anterior[0] and texto.startswith(anterior[0])
+                and anterior[1] == self.catalogo.version):
+            productos = self.catalogo.refinar(texto, anterior[2])
+        else:
+            productos = self.catalogo.buscar(texto)
+        self._anterior = (texto, self.catalogo.version, [producto[0] for producto in productos])
+        return productos
+
+class PerfilConexion:
+    """PRAGMAs de SQLite que se aplican cada vez que se abre kiosco.db.
+
+    Cada valor se puede cambiar en la tabla configuracion con la clave 'bd_<pragma>'
+    (por ejemplo bd_synchronous = FULL) y se aplica en la próxima apertura.
+    """
+    DEFAULT = {
+        'journal_mode': 'WAL',       # las lecturas largas (exportaciones) no bloquean las ventas
+        'synchronous': 'NORMAL',     # con WAL no hace fsync en cada commit y la BD no se corrompe
+        'cache_size': '-20000',      # ~20 MB de caché de páginas
+        'mmap_size': '268435456',    # 256 MB de lectura mapeada en memoria
+        'temp_store': 'MEMORY',
+        'busy_timeout': '5000',      # ms de espera si otra conexión está escribiendo
+    }
+    VALORES_PERMITIDOS = {
+        'journal_mode': ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL'),
+        'synchronous': ('OFF', 'NORMAL', 'FULL', 'EXTRA'),
+        'temp_store': ('DEFAULT', 'FILE', 'MEMORY'),
+    }
+
+    def __init__(self, valores=None):
+        self.valores = dict(self.DEFAULT)
+        for pragma, valor in (valores or {}).items():
+            if pragma in self.DEFAULT:
+                self.valores[pragma] = str(valor).strip()
+
+    @classmethod
+    def desde_bd(cls, conn):
+        """Lee el perfil guardado en configuracion (usa los valores por defecto si no hay)"""
+        try:
+            filas = conn.execute("SELECT clave, valor FROM configuracion WHERE substr(clave, 1, 3) = 'bd_'").fetchall()
+        except sqlite3.OperationalError:
+            # Primera ejecución: la tabla configuracion todavía no existe
+            filas = []
+        return cls({clave[3:]: valor for clave, valor in filas})
+
+    def _valor_pragma(self, pragma):
+        """Valida el valor antes de interpolarlo (PRAGMA no admite parámetros)"""
+        valor = self.valores[pragma]
+        if pragma in self.VALORES_PERMITIDOS:
+            if valor.upper() not in self.VALORES_PERMITIDOS[pragma]:
+                raise ValueError(f"Valor inválido para {pragma}: {valor}")
+            return valor.upper()
+        return str(int(valor))
+
+    def aplicar(self, conn):
+        """Aplica los PRAGMAs a una conexión abierta"""
+        for pragma in self.valores:
+            try:
+                conn.execute(f"PRAGMA {pragma} = {self._valor_pragma(pragma)}")
+            except (ValueError, sqlite3.Error) as e:
+                print(f"⚠️ No se pudo aplicar PRAGMA {pragma}: {e}")
+
+    @classmethod
+    def conectar(cls, ruta):
+        """Abre la BD y le aplica el perfil guardado en ella"""
+        conn = sqlite3.connect(ruta, timeout=int(cls.DEFAULT['busy_timeout']) / 1000)
+        perfil = cls.desde_bd(conn)
+        perfil.aplicar(conn)
+        return conn
+
+    @classmethod
+    def conectar_lectura(cls, ruta):
+        """Abre la BD en modo solo lectura (para reportes en segundo plano).
+
+        No toca journal_mode ni synchronous: esos los define la conexión principal.
+        """
+        uri = Path(ruta).resolve().as_uri() + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, timeout=int(cls.DEFAULT['busy_timeout']) / 1000)
+        perfil = cls.desde_bd(conn)
+        for pragma in ('journal_mode', 'synchronous'):
+            perfil.valores.pop(pragma)
+        perfil.aplicar(conn)
+        return conn
+
+class ConfiguracionCache:
+    """Tabla configuracion en memoria: se lee una vez y set() escribe en la BD y en el caché.
+
+    Los getters tipados no consultan la BD, así que se pueden llamar dentro de bucles.
+    Con suscribir(clave, funcion) se avisa funcion(clave, valor) cuando esa clave cambia.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.valores = None
+        self._suscriptores = {}
+
+    def cargar(self):
+        """Lee toda la tabla configuracion (descarta lo que hubiera en memoria)"""
+        self.valores = dict(self.conn.execute("SELECT clave, valor FROM configuracion").fetchall())
+
+    def texto(self, clave, default=None):
+        if self.valores is None:
+            self.cargar()
+        valor = self.valores.get(clave)
+        return valor if valor is not None else default
+
+    def entero(self, clave, default=0):
+        try:
+            return int(self.texto(clave, default))
+        except (TypeError, ValueError):
+            return default
+
+    def decimal(self, clave, default=0.0):
+        try:
+            return float(self.texto(clave, default))
+        except (TypeError, ValueError):
+            return default
+
+    def booleano(self, clave, default=False):
+        valor = self.texto(clave)
+        if valor is None:
+            return default
+        return valor.strip().lower() in ('1', 'true', 'si', 'sí')
+
+    def set(self, clave, valor):
+        """Guarda el valor y notifica a los suscriptores si cambió"""
+        valor = str(valor)
+        anterior = self.texto(clave)
+        self.conn.execute('''
+            INSERT OR REPLACE INTO configuracion (clave, valor)
+            VALUES (?, ?)
+        ''', (clave, valor))
+        self.conn.commit()
+        self.valores[clave] = valor
+        if valor != anterior:
+            for funcion in self._suscriptores.get(clave, ()):
+                funcion(clave, valor)
+
+    def suscribir(self, clave, funcion):
+        self._suscriptores.setdefault(clave, []).append(funcion)
+
+class ResumenVentas:
+    """Totales de ventas por día, turno y método de pago (tabla ventas_resumen_diario).
+
+    finalizar_venta lo actualiza en la misma transacción que la venta, así las
+    estadísticas de hoy/mes/año leen unas pocas filas en lugar de toda la tabla ventas.
+    Los importes se guardan en centavos enteros, igual que en la tabla ventas.
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def crear_tabla(self):
+        """Crea la tabla de resumen si no existe"""
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ventas_resumen_diario (
+                dia TEXT NOT NULL,
+                turno TEXT NOT NULL,
+                metodo_pago TEXT NOT NULL,
+                cantidad INTEGER NOT NULL,
+                total_centavos INTEGER NOT NULL,
+                costo_centavos INTEGER NOT NULL,
+                PRIMARY KEY (dia, turno, metodo_pago)
+            ) WITHOUT ROWID
+        ''')
+
+    def registrar_venta(self, fecha, turno, metodo_pago, total_centavos, costo_centavos):
+        """Suma una venta al resumen (no hace commit: va en la transacción de la venta)"""
+        self.cursor.execute('''
+            INSERT INTO ventas_resumen_diario (dia, turno, metodo_pago, cantidad, total_centavos, costo_centavos)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT (dia, turno, metodo_pago) DO UPDATE SET
+                cantidad = cantidad + 1,
+                total_centavos = total_centavos + excluded.total_centavos,
+                costo_centavos = costo_centavos + excluded.costo_centavos
+        ''', (fecha[:10], turno, metodo_pago, total_centavos, costo_centavos))
+
+    def reconstruir(self):
+        """Recalcula todo el resumen a partir de la tabla ventas (no hace commit)"""
+        self.crear_tabla()
+        self.cursor.execute("DELETE FROM ventas_resumen_diario")
+        self.cursor.execute('''
+            INSERT INTO ventas_resumen_diario (dia, turno, metodo_pago, cantidad, total_centavos, costo_centavos)
+            SELECT substr(fecha, 1, 10), turno, metodo_pago, COUNT(*), SUM(total_centavos), SUM(costo_centavos)
+            FROM ventas
+            GROUP BY substr(fecha, 1, 10), turno, metodo_pago
+        ''')
+        self.cursor.execute("SELECT COUNT(*) FROM ventas_resumen_diario")
+        return self.cursor.fetchone()[0]
+
+    def verificar(self):
+        """Compara el resumen con la tabla ventas.
+        
+        Retorna una lista de (dia, turno, metodo_pago, esperado, resumen) con las filas
+        que no coinciden; vacía si el resumen es consistente.
+        """
+        self.crear_tabla()
+        self.cursor.execute('''
+            SELECT substr(fecha, 1, 10), turno, metodo_pago, COUNT(*), SUM(total_centavos), SUM(costo_centavos)
+            FROM ventas
+            GROUP BY substr(fecha, 1, 10), turno, metodo_pago
+        ''')
+        esperado = {fila[:3]: fila[3:] for fila in self.cursor.fetchall()}
+        self.cursor.execute('''
+            SELECT dia, turno, metodo_pago, cantidad, total_centavos, costo_centavos FROM ventas_resumen_diario
+        ''')
+        resumen = {fila[:3]: fila[3:] for fila in self.cursor.fetchall()}
+        
+        diferencias = []
+        for clave in sorted(set(esperado) | set(resumen)):
+            real = esperado.get(clave, (0, 0, 0))
+            guardado = resumen.get(clave, (0, 0, 0))
+            # Centavos enteros: la comparación es exacta
+            if real != guardado:
+                diferencias.append(clave + (real, guardado))
+        return diferencias
+
+    def totales(self, inicio, fin):
+        """Retorna (cantidad, total, ganancia) en pesos de los días en el rango [inicio, fin)"""
+        self.cursor.execute('''
+            SELECT COALESCE(SUM(cantidad), 0),
+                   COALESCE(SUM(total_centavos), 0) / 100.0,
+                   COALESCE(SUM(total_centavos - costo_centavos), 0) / 100.0
+            FROM ventas_resumen_diario WHERE dia >= ? AND dia < ?
+        ''', (inicio, fin))
+        return self.cursor.fetchone()
+
+class TotalesCaja:
+    """Totales de ventas de cada sesión de caja, guardados en la propia fila de cajas.
+
+    Cada venta lleva el caja_id de la caja abierta y finalizar_venta suma su importe a la
+    columna del método de pago en la misma transacción, así el cierre lee una sola fila en
+    lugar de buscar las ventas por rango de fechas. Importes en centavos enteros.
+    """
+    COLUMNAS = {
+        'Efectivo': 'efectivo_centavos',
+        'Transferencia': 'transferencia_centavos',
+        'Débito': 'debito_centavos',
+        'Crédito': 'credito_centavos',
+    }
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def agregar_columnas(self):
+        """Agrega a cajas las columnas de totales que falten"""
+        self.cursor.execute("PRAGMA table_info(cajas)")
+        existentes = [col[1] for col in self.cursor.fetchall()]
+        for columna in ('ventas_cantidad',) + tuple(self.COLUMNAS.values()):
+            if columna not in existentes:
+                self.cursor.execute(f"ALTER TABLE cajas ADD COLUMN {columna} INTEGER NOT NULL DEFAULT 0")
+
+    def caja_abierta(self):
+        """Id de la caja abierta o None (el administrador puede vender sin caja)"""
+        self.cursor.execute("SELECT id FROM cajas WHERE estado = 'abierta' ORDER BY id DESC LIMIT 1")
+        fila = self.cursor.fetchone()
+        return fila[0] if fila else None
+
+    def registrar_venta(self, caja_id, metodo_pago, total_centavos):
+        """Suma una venta a su caja (no hace commit: va en la transacción de la venta)"""
+        columna = self.COLUMNAS.get(metodo_pago)
+        if columna is None:
+            raise ValueError(f"Método de pago desconocido: {metodo_pago}")
+        self.cursor.execute(f'''
+            UPDATE cajas SET ventas_cantidad = ventas_cantidad + 1, {columna} = {columna} + ?
+            WHERE id = ?
+        ''', (total_centavos, caja_id))
+
+    def _columnas(self):
+        return ('ventas_cantidad',) + tuple(self.COLUMNAS.values())
+
+    def _consulta_esperada(self):
+        """Columnas de totales calculadas desde la tabla ventas, en el orden de _columnas()"""
+        sumas = ', '.join(f"COALESCE(SUM(CASE WHEN metodo_pago = '{metodo}' THEN total_centavos END), 0)"
+                          for metodo in self.COLUMNAS)
+        return f"SELECT caja_id, COUNT(*), {sumas} FROM ventas WHERE caja_id IS NOT NULL GROUP BY caja_id"
+
+    def reconstruir(self):
+        """Recalcula los totales de todas las cajas a partir de la tabla ventas (no hace commit)"""
+        columnas = self._columnas()
+        self.cursor.execute(f"UPDATE cajas SET {', '.join(f'{columna} = 0' for columna in columnas)}")
+        self.cursor.execute(self._consulta_esperada())
+        filas = self.cursor.fetchall()
+        self.cursor.executemany(f'''
+            UPDATE cajas SET {', '.join(f'{columna} = ?' for columna in columnas)} WHERE id = ?
+        ''', [fila[1:] + (fila[0],) for fila in filas])
+        return len(filas)
+
+    def verificar(self):
+        """Compara los totales guardados en cajas con la tabla ventas.
+
+        Retorna una lista de (caja_id, esperado, guardado) con las cajas que no coinciden;
+        vacía si los totales son consistentes.
+        """
+        self.cursor.execute(self._consulta_esperada())
+        esperado = {fila[0]: fila[1:] for fila in self.cursor.fetchall()}
+        self.cursor.execute(f"SELECT id, {', '.join(self._columnas())} FROM cajas")
+        guardado = {fila[0]: fila[1:] for fila in self.cursor.fetchall()}
+
+        vacio = (0,) * len(self._columnas())
+        diferencias = []
+        for caja_id in sorted(set(esperado) | set(guardado)):
+            real = esperado.get(caja_id, vacio)
+            actual = guardado.get(caja_id, vacio)
+            if real != actual:
+                diferencias.append((caja_id, real, actual))
+        return diferencias
+
+    def totales(self, caja_id):
+        """Retorna {método: total en pesos} de los métodos con ventas en la caja"""
+        self.cursor.execute(f"SELECT {', '.join(self.COLUMNAS.values())} FROM cajas WHERE id = ?", (caja_id,))
+        fila = self.cursor.fetchone() or ()
+        return {metodo: centavos / 100.0 for metodo, centavos in zip(self.COLUMNAS, fila) if centavos}
+
+class ExportacionCancelada(Exception):
+    """El usuario canceló una exportación en curso"""
+
+class TrabajoExportacion:
+    """Genera un reporte en un hilo aparte con su propia conexión de solo lectura.
+
+    La función de generación recibe el trabajo: consulta con trabajo.cursor, escribe en
+    trabajo.archivo (un temporal que reemplaza al destino solo si termina bien) e
+    informa el avance con trabajo.avance(), que también corta si se pidió cancelar.
+    La interfaz lee trabajo.mensajes desde el hilo principal (tkinter no es thread-safe).
+    """
+    def __init__(self, ruta_bd, destino, funcion):
+        self.ruta_bd = ruta_bd
+        self.destino = destino
+        self.funcion = funcion
+        self.archivo = None
+        self.cursor = None
+        self.cancelado = threading.Event()
+        self.mensajes = queue.Queue()
+        self.hilo = threading.Thread(target=self._ejecutar, daemon=True)
+
+    def iniciar(self):
+        self.hilo.start()
+
+    def cancelar(self):
+        self.cancelado.set()
+
+    def en_curso(self):
+        return self.hilo.is_alive()
+
+    def verificar_cancelacion(self):
+        """Lanza ExportacionCancelada si el usuario canceló"""
+        if self.cancelado.is_set():
+            raise ExportacionCancelada()
+
+    def avance(self, porcentaje, texto):
+        """Informa el progreso (y corta si el usuario canceló)"""
+        self.verificar_cancelacion()
+        self.mensajes.put(('avance', porcentaje, texto))
+
+    def _ejecutar(self):
+        inicio = time.perf_counter()
+        conn = None
+        descriptor, self.archivo = tempfile.mkstemp(
+            suffix=os.path.splitext(self.destino)[1],
+            dir=os.path.dirname(os.path.abspath(self.destino))
+        )
+        os.close(descriptor)
+        try:
+            conn = PerfilConexion.conectar_lectura(self.ruta_bd)
+            self.cursor = conn.cursor()
+            self.funcion(self)
+            self.avance(100, "Guardando archivo...")
+            os.replace(self.archivo, self.destino)
+            self.mensajes.put(('fin', time.perf_counter() - inicio, self.destino))
+        except ExportacionCancelada:
+            self.mensajes.put(('cancelado', None, None))
+        except Exception as e:
+            self.mensajes.put(('error', None, str(e)))
+        finally:
+            if conn:
+                conn.close()
+            if os.path.exists(self.archivo):
+                os.remove(self.archivo)
+
+class LibroExcelStreaming:
+    """Libro de Excel en modo write_only de openpyxl.
+
+    El título, los estilos de encabezado, el formato moneda y el ancho de las columnas
+    se deciden antes de escribir las filas, que se vuelcan al archivo de a una: la
+    memoria no crece con la cantidad de filas y se puede pasar un cursor directamente.
+    """
+    PALABRAS_DINERO = ('precio', 'costo', 'total', 'ganancia', 'subtotal')
+    FILAS_MUESTRA = 200        # filas que se miran para calcular el ancho de cada columna
+    FILAS_POR_CONTROL = 2000   # cada cuántas filas se revisa si se canceló la exportación
+
+    def __init__(self):
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
+        self.libro = Workbook(write_only=True)
+        lado = Side(style='thin')
+        borde = Border(left=lado, right=lado, top=lado, bottom=lado)
+        self.estilo_titulo = {
+            'font': Font(bold=True, size=14, color='FFFFFF'),
+            'fill': PatternFill(start_color='203764', end_color='203764', fill_type='solid'),
+            'alignment': Alignment(horizontal='center'),
+        }
+        self.estilo_encabezado = {
+            'font': Font(bold=True, color='FFFFFF'),
+            'fill': PatternFill(start_color='366092', end_color='366092', fill_type='solid'),
+            'alignment': Alignment(horizontal='center', vertical='center'),
+            'border': borde,
+        }
+        self.estilo_texto = {'border': borde, 'alignment': Alignment(vertical='center')}
+        self.estilo_dinero = {
+            'border': borde,
+            'alignment': Alignment(horizontal='right', vertical='center'),
+            'number_format': '"$" #,##0.00',
+        }
+        # Resaltado de la hoja de análisis: (relleno concepto, fuente concepto, relleno valor, fuente valor)
+        self.resaltado_total = (
+            PatternFill(start_color='70AD47', end_color='70AD47', fill_type='solid'), Font(bold=True, color='FFFFFF'),
+            PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid'), Font(bold=True),
+        )
+        self.resaltado_destacado = (
+            PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid'), Font(bold=True),
+            PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid'), None,
+        )
+
+    def _celda(self, hoja, valor, estilo):
+        from openpyxl.cell import WriteOnlyCell
+
+        celda = WriteOnlyCell(hoja, value=valor)
+        for atributo, valor_estilo in estilo.items():
+            setattr(celda, atributo, valor_estilo)
+        return celda
+
+    def _es_dinero(self, columna):
+        return any(palabra in columna.lower() for palabra in self.PALABRAS_DINERO)
+
+    def _resaltado(self, concepto):
+        concepto = str(concepto).lower()
+        if 'total' in concepto:
+            return self.resaltado_total
+        if 'producto más vendido' in concepto or 'mejor' in concepto:
+            return self.resaltado_destacado
+        return None
+
+    def agregar_hoja(self, nombre, titulo, columnas, filas, trabajo=None, analisis=False):
+        """Escribe una hoja: título combinado, encabezados y las filas (lista o cursor).
+
+        Con analisis=True resalta las filas de totales (hojas Concepto/Valor).
+        Devuelve la cantidad de filas escritas.
+        """
+        from openpyxl.utils import get_column_letter
+
+        filas = iter(filas)
+        muestra = list(itertools.islice(filas, self.FILAS_MUESTRA))
+        hoja = self.libro.create_sheet(nombre)
+
+        for indice, columna in enumerate(columnas):
+            largo = max([len(str(columna))] + [len(str(fila[indice])) for fila in muestra if fila[indice] is not None])
+            hoja.column_dimensions[get_column_letter(indice + 1)].width = min(max(largo + 2, 12), 50)
+        if len(columnas) > 1:
+            hoja.merged_cells.add(f'A1:{get_column_letter(len(columnas))}1')
+
+        hoja.append([self._celda(hoja, titulo, self.estilo_titulo)])
+        hoja.append([self._celda(hoja, columna, self.estilo_encabezado) for columna in columnas])
+
+        # Una celda por columna que se reutiliza: cada fila se escribe al archivo en append()
+        estilos = [self.estilo_dinero if self._es_dinero(columna) else self.estilo_texto for columna in columnas]
+        plantilla = [self._celda(hoja, None, estilo) for estilo in estilos]
+        cantidad = 0
+        for cantidad, fila in enumerate(itertools.chain(muestra, filas), 1):
+            if trabajo and cantidad % self.FILAS_POR_CONTROL == 0:
+                trabajo.verificar_cancelacion()
+            resaltado = self._resaltado(fila[0]) if analisis else None
+            if resaltado:
+                celdas = [self._celda(hoja, valor, estilo) for valor, estilo in zip(fila, estilos)]
+                relleno_concepto, fuente_concepto, relleno_valor, fuente_valor = resaltado
+                celdas[0].fill, celdas[0].font = relleno_concepto, fuente_concepto
+                celdas[1].fill = relleno_valor
+                if fuente_valor:
+                    celdas[1].font = fuente_valor
+                hoja.append(celdas)
+                continue
+            for celda, valor in zip(plantilla, fila):
+                celda.value = valor
+            hoja.append(plantilla)
+        return cantidad
+
+    def agregar_hoja_registros(self, nombre, titulo, registros, trabajo=None, analisis=False):
+        """Igual que agregar_hoja pero con una lista de diccionarios (columnas = claves)"""
+        if not registros:
+            return 0
+        columnas = list(registros[0])
+        filas = [tuple(registro.values()) for registro in registros]
+        return self.agregar_hoja(nombre, titulo, columnas, filas, trabajo, analisis)
+
+    def guardar(self, archivo):
+        self.libro.save(archivo)
+
+class ImportadorProductos:
+    """Importa productos desde Excel o CSV por lotes.
+
+    El archivo se lee de a TAMANO_LOTE filas (read_csv con chunksize u openpyxl en modo
+    read_only), cada lote se valida con operaciones vectorizadas de pandas y las filas
+    válidas se insertan con executemany, todo en una sola transacción. Las filas con
+    errores se saltean y se informan al final.
+    """
+    COLUMNAS = ('Nombre', 'Precio', 'Costo', 'Stock', 'Categoría', 'Código Barras')
+    TAMANO_LOTE = 5000
+
+    ESTADOS = ('nuevo', 'cambiado', 'sin_cambios', 'conflicto')
+
+    def __init__(self, conn, stock_habilitado):
+        self.conn = conn
+        self.stock_habilitado = stock_habilitado
+        self.columnas_encontradas = []
+
+    def leer_lotes(self, ruta):
+        """Devuelve DataFrames de hasta TAMANO_LOTE filas con los datos del archivo"""
+        if not ruta.lower().endswith('.xlsx'):
+            # Códigos de barras como texto para no perder ceros a la izquierda
+            for lote in pd.read_csv(ruta, dtype={'Código Barras': str}, chunksize=self.TAMANO_LOTE):
+                self.columnas_encontradas = list(lote.columns)
+                yield lote
+            return
+
+        from openpyxl import load_workbook
+
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            filas = libro.worksheets[0].iter_rows(values_only=True)
+            encabezados = [str(valor).strip() if valor is not None else '' for valor in next(filas, ())]
+            self.columnas_encontradas = encabezados
+            while True:
+                bloque = list(itertools.islice(filas, self.TAMANO_LOTE))
+                if not bloque:
+                    break
+                yield pd.DataFrame(bloque, columns=encabezados, dtype=object)
+        finally:
+            libro.close()
+
+    def preparar_lote(self, lote, primera_fila):
+        """Valida y convierte un lote; devuelve (filas válidas, errores por fila).
+
+        Cada fila válida es (fila del archivo, nombre, precio, costo, stock, categoría, código).
+        primera_fila es el número de fila del archivo (contando el encabezado) del primer registro.
+        """
+        lote = lote.reset_index(drop=True)
+        for columna in self.COLUMNAS:
+            if columna not in lote.columns:
+                lote[columna] = None
+        filas_archivo = pd.RangeIndex(primera_fila, primera_fila + len(lote))
+        errores = pd.Series('', index=lote.index, dtype=object)
+
+        def vacio(serie):
+            return serie.isna() | (serie.astype(str).str.strip() == '')
+
+        def numero(serie, por_defecto):
+            """Convierte a número; los vacíos toman por_defecto y el texto inválido queda NaN"""
+            valores = pd.to_numeric(serie.where(~vacio(serie)), errors='coerce')
+            invalidos = valores.isna() & ~vacio(serie)
+            return valores.fillna(por_defecto).where(~invalidos), invalidos
+
+        nombres = lote['Nombre'].where(~vacio(lote['Nombre'])).astype(object)
+        sin_nombre = nombres.isna()
+        errores[sin_nombre] = 'Nombre es obligatorio'
+
+        precios, precio_invalido = numero(lote['Precio'], 0.0)
+        costos, costo_invalido = numero(lote['Costo'], 0.0)
+        if self.stock_habilitado:
+            sin_stock = vacio(lote['Stock'])
+            stocks, stock_invalido = numero(lote['Stock'], 0)
+            errores[(errores == '') & sin_stock] = 'Stock requerido cuando está habilitado'
+        else:
+            # Valor por defecto cuando stock está deshabilitado
+            stocks = pd.Series(0, index=lote.index)
+            stock_invalido = pd.Series(False, index=lote.index)
+        for columna, invalido in (('Precio', precio_invalido), ('Costo', costo_invalido), ('Stock', stock_invalido)):
+            marcar = (errores == '') & invalido
+            errores[marcar] = 'Error de formato de datos - ' + columna + ' no numérico: ' + lote.loc[marcar, columna].astype(str)
+
+        categorias = lote['Categoría'].where(~lote['Categoría'].isna(), 'Otros').astype(str)
+        # Códigos de barras como texto; si Excel los guardó como número, quitar el .0
+        codigos = lote['Código Barras'].where(~vacio(lote['Código Barras']), '').astype(str).str.strip()
+        codigos = codigos.str.replace(r'\.0$', '', regex=True)
+
+        validas = errores == ''
+        filas = list(zip(
+            filas_archivo[validas],
+            nombres[validas].astype(str).str.strip(),
+            precios[validas].astype(float),
+            costos[validas].astype(float),
+            stocks[validas].astype(float).astype(int),
+            categorias[validas],
+            codigos[validas],
+        ))
+        detalle_errores = [f"Fila {fila}: {error}" for fila, error in zip(filas_archivo[~validas], errores[~validas])]
+        return filas, detalle_errores
+
+    def importar(self, ruta):
+        """Importa el archivo completo en una transacción; devuelve (importados, errores)"""
+        cursor = self.conn.cursor()
+        importados = 0
+        errores = []
+        primera_fila = 2  # la fila 1 es el encabezado
+        if self.conn.in_transaction:
+            self.conn.commit()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            for lote in self.leer_lotes(ruta):
+                filas, errores_lote = self.preparar_lote(lote, primera_fila)
+                primera_fila += len(lote)
+                cursor.executemany('''
+                    INSERT INTO productos (nombre, precio, costo, stock, categoria, codigo_barras)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [fila[1:] for fila in filas])
+                importados += len(filas)
+                errores.extend(errores_lote)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return importados, errores
+
+    def importar_actualizando(self, ruta):
+        """Importa actualizando los productos que ya existen (lista de precios del proveedor).
+
+        Cada fila se busca por código de barras y, si no tiene o no existe, por nombre
+        normalizado. Los productos encontrados solo actualizan precio, costo, stock y
+        categoría si cambiaron; los no encontrados se agregan. Si el archivo repite un
+        producto vale la última fila.
+
+        Devuelve (resumen, errores): resumen cuenta las filas nuevas, cambiadas, sin
+        cambios y en conflicto (varios productos posibles o código de barras distinto).
+        """
+        cursor = self.conn.cursor()
+        errores = []
+        primera_fila = 2  # la fila 1 es el encabezado
+        self.conn.create_function('normalizar_texto', 1, normalizar_texto, deterministic=True)
+        if self.conn.in_transaction:
+            self.conn.commit()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('DROP TABLE IF EXISTS temp.importacion_productos')
+            cursor.execute('''
+                CREATE TEMP TABLE importacion_productos (
+                    clave TEXT PRIMARY KEY,
+                    fila INTEGER NOT NULL,
+                    nombre TEXT NOT NULL,
+                    nombre_normalizado TEXT NOT NULL,
+                    precio REAL NOT NULL,
+                    costo REAL NOT NULL,
+                    stock INTEGER NOT NULL,
+                    categoria TEXT,
+                    codigo_barras TEXT NOT NULL,
+                    producto_id INTEGER,
+                    coincidencias INTEGER NOT NULL DEFAULT 0,
+                    por_nombre INTEGER NOT NULL DEFAULT 0,
+                    estado TEXT
+                )
+            ''')
+            for lote in self.leer_lotes(ruta):
+                filas, errores_lote = self.preparar_lote(lote, primera_fila)
+                primera_fila += len(lote)
+                errores.extend(errores_lote)
+                # La clave es el código de barras o, si no hay, el nombre normalizado:
+                # una fila repetida en el archivo pisa a la anterior
+                cursor.executemany('''
+                    INSERT INTO importacion_productos
+                        (clave, fila, nombre, nombre_normalizado, precio, costo, stock, categoria, codigo_barras)
+                    VALUES (
+                        CASE WHEN ?7 != '' THEN 'c:' || ?7 ELSE 'n:' || normalizar_texto(?2) END,
+                        ?1, ?2, normalizar_texto(?2), ?3, ?4, ?5, ?6, ?7
+                    )
+                    ON CONFLICT (clave) DO UPDATE SET
+                        fila = excluded.fila,
+                        nombre = excluded.nombre,
+                        precio = excluded.precio,
+                        costo = excluded.costo,
+                        stock = excluded.stock,
+                        categoria = excluded.categoria
+                ''', filas)
+            
+            resumen = self._aplicar_importacion(cursor, errores)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.execute('DROP TABLE IF EXISTS temp.importacion_productos')
+            cursor.execute('DROP TABLE IF EXISTS temp.productos_normalizados')
+        return resumen, errores
+
+    def _aplicar_importacion(self, cursor, errores):
+        """Resuelve cada fila de importacion_productos contra productos y aplica los cambios"""
+        # Primero por código de barras (usa idx_productos_codigo_barras)
+        cursor.execute('''
+            UPDATE importacion_productos SET
+                producto_id = (SELECT MIN(p.id) FROM productos p WHERE p.codigo_barras = importacion_productos.codigo_barras),
+                coincidencias = (SELECT COUNT(*) FROM productos p WHERE p.codigo_barras = importacion_productos.codigo_barras)
+            WHERE codigo_barras != ''
+        ''')
+        # Después por nombre normalizado para las filas sin código o con un código que no existe
+        cursor.execute('''
+            CREATE TEMP TABLE productos_normalizados AS
+            SELECT id, normalizar_texto(nombre) AS nombre_normalizado, COALESCE(codigo_barras, '') AS codigo_barras
+            FROM productos
+        ''')
+        cursor.execute('CREATE INDEX temp.idx_productos_normalizados ON productos_normalizados (nombre_normalizado)')
+        cursor.execute('''
+            UPDATE importacion_productos SET
+                producto_id = (SELECT MIN(n.id) FROM productos_normalizados n
+                               WHERE n.nombre_normalizado = importacion_productos.nombre_normalizado),
+                coincidencias = (SELECT COUNT(*) FROM productos_normalizados n
+                                 WHERE n.nombre_normalizado = importacion_productos.nombre_normalizado),
+                por_nombre = 1
+            WHERE coincidencias = 0
+        ''')
+        
+        cursor.execute('''
+            UPDATE importacion_productos SET estado = CASE
+                WHEN coincidencias = 0 THEN 'nuevo'
+                WHEN coincidencias > 1 THEN 'conflicto'
+                WHEN por_nombre = 1 AND codigo_barras != ''
+                     AND (SELECT codigo_barras FROM productos_normalizados n WHERE n.id = producto_id) != '' THEN 'conflicto'
+                WHEN EXISTS (
+                    SELECT 1 FROM productos p
+                    WHERE p.id = producto_id
+                      AND p.precio IS importacion_productos.precio
+                      AND p.costo IS importacion_productos.costo
+                      AND (?1 = 0 OR p.stock IS importacion_productos.stock)
+                      AND p.categoria IS importacion_productos.categoria
+                ) THEN 'sin_cambios'
+                ELSE 'cambiado'
+            END
+        ''', (int(self.stock_habilitado),))
+        
+        cursor.execute('''
+            SELECT fila, nombre, codigo_barras, coincidencias, por_nombre
+            FROM importacion_productos WHERE estado = 'conflicto' ORDER BY fila
+        ''')
+        for fila, nombre, codigo, coincidencias, por_nombre in cursor.fetchall():
+            if coincidencias > 1:
+                criterio = 'nombre' if por_nombre else f'código {codigo}'
+                errores.append(f"Fila {fila}: {coincidencias} productos coinciden por {criterio} ('{nombre}'), no se modificó ninguno")
+            else:
+                errores.append(f"Fila {fila}: '{nombre}' ya existe con otro código de barras (archivo: {codigo})")
+        
+        # Altas y cambios en una sola sentencia: las filas nuevas no tienen id y se insertan,
+        # las cambiadas chocan con su id y solo actualizan los campos de precio/stock/categoría
+        cursor.execute('''
+            INSERT INTO productos (id, nombre, precio, costo, stock, categoria, codigo_barras)
+            SELECT producto_id, nombre, precio, costo, stock, categoria, codigo_barras
+            FROM importacion_productos
+            WHERE estado IN ('nuevo', 'cambiado')
+            ORDER BY fila
+            ON CONFLICT (id) DO UPDATE SET
+                precio = excluded.precio,
+                costo = excluded.costo,
+                stock = CASE WHEN ?1 THEN excluded.stock ELSE productos.stock END,
+                categoria = excluded.categoria
+        ''', (int(self.stock_habilitado),))
+        
+        cursor.execute('SELECT estado, COUNT(*) FROM importacion_productos GROUP BY estado')
+        resumen = dict.fromkeys(self.ESTADOS, 0)
+        resumen.update(cursor.fetchall())
+        return resumen
+
+class TablaVirtual:
+    """Muestra una lista larga en un ttk.Treeview creando solo las filas visibles.
+
+    El modelo es una lista de claves (ids de producto) y `formatear(clave)` devuelve
+    (valores, tags) de una fila. El Treeview tiene tantos ítems como filas entran en
+    pantalla; al desplazarse solo se les cambian los valores. La barra, la rueda del
+    mouse y las flechas mueven la ventana sobre el modelo, no el Treeview.
+    """
+    ALTO_FILA = 20          # se corrige con la medida real apenas hay una fila dibujada
+    ALTO_ENCABEZADO = 25
+    FILAS_POR_RUEDA = 3
+
+    def __init__(self, arbol, scrollbar, formatear):
+        self.arbol = arbol
+        self.scrollbar = scrollbar
+        self.formatear = formatear
+        self.claves = []
+        self.posiciones = {}    # clave -> índice en self.claves
+        self.inicio = 0         # índice del modelo que se ve en la primera fila
+        self.capacidad = 1      # filas que entran en pantalla
+        self.ranuras = []       # iids de los ítems del Treeview que se reutilizan
+        self.seleccionada = None
+
+        scrollbar.config(command=self._desplazar)
+        arbol.bind('<Configure>', self._al_redimensionar, add='+')
+        arbol.bind('<<TreeviewSelect>>', self._al_seleccionar, add='+')
+        for evento in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            arbol.bind(evento, self._rueda, add='+')
+        arbol.bind('<Down>', lambda e: self._mover_seleccion(1))
+        arbol.bind('<Up>', lambda e: self._mover_seleccion(-1))
+        arbol.bind('<Next>', lambda e: self._mover_seleccion(self.capacidad))
+        arbol.bind('<Prior>', lambda e: self._mover_seleccion(-self.capacidad))
+
+    def cargar(self, claves):
+        """Reemplaza el modelo (al refrescar, filtrar u ordenar) y redibuja"""
+        self.claves = list(claves)
+        self.posiciones = {clave: indice for indice, clave in enumerate(self.claves)}
+        if self.seleccionada not in self.posiciones:
+            self.seleccionada = None
+        self._dibujar()
+
+    def actualizar_clave(self, clave):
+        """Redibuja solo la fila de esa clave (si está en pantalla)"""
+        posicion = self.posiciones.get(clave)
+        if posicion is not None and self.inicio <= posicion < self.inicio + len(self.ranuras):
+            valores, tags = self.formatear(clave)
+            self.arbol.item(self.ranuras[posicion - self.inicio], values=valores, tags=tags)
+
+    def _dibujar(self):
+        total = len(self.claves)
+        self.inicio = max(0, min(self.inicio, total - self.capacidad))
+        visibles = min(self.capacidad, total - self.inicio)
+        while len(self.ranuras) < visibles:
+            self.ranuras.append(self.arbol.insert('', 'end'))
+        while len(self.ranuras) > visibles:
+            self.arbol.delete(self.ranuras.pop())
+
+        seleccion = ()
+        for ranura, clave in zip(self.ranuras, self.claves[self.inicio:self.inicio + visibles]):
+            valores, tags = self.formatear(clave)
+            self.arbol.item(ranura, values=valores, tags=tags)
+            if clave == self.seleccionada:
+                seleccion = (ranura,)
+        self.arbol.selection_set(seleccion)
+        if seleccion:
+            self.arbol.focus(seleccion[0])
+
+        if total:
+            self.scrollbar.set(self.inicio / total, (self.inicio + visibles) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _al_redimensionar(self, event):
+        if self.ranuras:
+            caja = self.arbol.bbox(self.ranuras[0])
+            if caja:
+                self.ALTO_ENCABEZADO, self.ALTO_FILA = caja[1], caja[3]
+        capacidad = max(1, (event.height - self.ALTO_ENCABEZADO) // self.ALTO_FILA)
+        if capacidad != self.capacidad:
+            self.capacidad = capacidad
+            self._dibujar()
+
+    def _al_seleccionar(self, event=None):
+        # Si la fila seleccionada salió de pantalla el Treeview queda sin selección,
+        # pero se recuerda la clave para volver a marcarla al desplazarse
+        seleccion = self.arbol.selection()
+        if seleccion and seleccion[0] in self.ranuras:
+            self.seleccionada = self.claves[self.inicio + self.ranuras.index(seleccion[0])]
+
+    def _desplazar(self, *args):
+        """Comando de la barra de desplazamiento ('moveto' o 'scroll')"""
+        if args[0] == 'moveto':
+            self.inicio = int(float(args[1]) * len(self.claves))
+        elif args[0] == 'scroll':
+            self.inicio += int(args[1]) * (self.capacidad if args[2] == 'pages' else 1)
+        self._dibujar()
+
+    def _rueda(self, event):
+        hacia_arriba = event.num == 4 or getattr(event, 'delta', 0) > 0
+        self.inicio += -self.FILAS_POR_RUEDA if hacia_arriba else self.FILAS_POR_RUEDA
+        self._dibujar()
+        return 'break'
+
+    def _mover_seleccion(self, paso):
+        if not self.claves:
+            return 'break'
+        actual = self.posiciones.get(self.seleccionada)
+        if actual is None:
+            actual = self.inicio - 1 if paso > 0 else self.inicio
+        nueva = max(0, min(len(self.claves) - 1, actual + paso))
+        self.seleccionada = self.claves[nueva]
+        if nueva < self.inicio:
+            self.inicio = nueva
+        elif nueva >= self.inicio + self.capacidad:
+            self.inicio = nueva - self.capacidad + 1
+        self._dibujar()
+        return 'break'
+
 class KioscoPOS:
+    # Productos que muestra la lista del punto de venta (los más relevantes de la búsqueda)
+    LIMITE_LISTA_VENTAS = 200
+    # Valores de la clave ticket_preferencia (como se muestran en el combo de la pestaña de venta)
+    PREFERENCIAS_TICKET = ('Preguntar', 'Siempre', 'Nunca')
+    # Cuánto queda visible el aviso de venta registrada
+    AVISO_MS = 2500
+    
     def __init__(self, root):
         self.root = root
         self.root.title("Sistema POS - Kiosco Argentina")
@@ -325,8 +2134,29 @@ class KioscoPOS:
         # Inicializar base de datos
         self.init_database()
         
-        # Carrito de compras
-        self.carrito = []
+        # Catálogo de productos en memoria para búsquedas rápidas
+        self.catalogo = CatalogoProductos()
+        self.catalogo.cargar(self.cursor)
+        
+        # Las vistas de productos se redibujan cuando cambia la configuración que muestran
+        self.configuracion.suscribir('stock_habilitado', self._al_cambiar_stock)
+        self.configuracion.suscribir('ganancia_deseada_default', self._al_cambiar_ganancia)
+        
+        # Carrito de compras (la lista en pantalla se actualiza línea por línea)
+        self.carrito = Carrito(self._al_cambiar_carrito)
+        # Tiempo entre escaneos (sobre todo entre un cliente y el siguiente)
+        self.medidor_escaneos = MedidorEscaneos()
+        # Tickets en un hilo aparte (arranca ya para tener listo el generador)
+        try:
+            backend_tickets = ServicioTickets.desde_configuracion(self.configuracion)
+        except ValueError as e:
+            # Un ticket_ancho_mm mal cargado a mano no tiene que impedir abrir la caja
+            messagebox.showwarning("Tickets", f"{e}\nSe usarán tickets en PDF hasta corregir la configuración.")
+            backend_tickets = TicketPDF()
+        self.servicio_tickets = ServicioTickets(backend_tickets)
+        self._tickets_en_curso = 0
+        for clave in ('ticket_formato', 'ticket_ancho_mm', 'ticket_destino'):
+            self.configuracion.suscribir(clave, self._al_cambiar_formato_ticket)
         # Atajos globales habilitados por defecto (se deshabilitan mientras hay diálogos modales abiertos)
         self.shortcuts_enabled = True
         
@@ -356,8 +2186,20 @@ class KioscoPOS:
         
     def init_database(self):
         """Inicializa la base de datos y crea las tablas"""
-        self.conn = sqlite3.connect('kiosco.db')
+        # Conexión con el perfil de PRAGMAs (WAL, synchronous, caché, etc.)
+        self.ruta_bd = 'kiosco.db'
+        self.conn = PerfilConexion.conectar(self.ruta_bd)
+        # Exportación a Excel corriendo en segundo plano (una por vez)
+        self.exportacion_activa = None
         self.cursor = self.conn.cursor()
+        # Importes en pesos -> centavos enteros, con el mismo redondeo que el carrito
+        self.conn.create_function('a_centavos', 1, a_centavos, deterministic=True)
+        # Tabla configuracion en memoria (se escribe con set_configuracion)
+        self.configuracion = ConfiguracionCache(self.conn)
+        # Totales agregados de ventas por día/turno/método
+        self.resumen_ventas = ResumenVentas(self.cursor)
+        # Totales de ventas de cada sesión de caja
+        self.totales_caja = TotalesCaja(self.cursor)
         
         # Tabla de usuarios
         self.cursor.execute('''
@@ -389,9 +2231,11 @@ class KioscoPOS:
                 fecha TEXT NOT NULL,
                 usuario TEXT NOT NULL,
                 metodo_pago TEXT NOT NULL,
-                total REAL NOT NULL,
-                costo_total REAL NOT NULL,
-                turno TEXT NOT NULL
+                total_centavos INTEGER NOT NULL,
+                costo_centavos INTEGER NOT NULL,
+                turno TEXT NOT NULL,
+                caja_id INTEGER,
+                FOREIGN KEY (caja_id) REFERENCES cajas (id)
             )
         ''')
         
@@ -402,8 +2246,11 @@ class KioscoPOS:
                 venta_id INTEGER NOT NULL,
                 producto_nombre TEXT NOT NULL,
                 cantidad INTEGER NOT NULL,
-                precio_unitario REAL NOT NULL,
-                costo_unitario REAL NOT NULL,
+                precio_centavos INTEGER NOT NULL,
+                costo_centavos INTEGER NOT NULL,
+                producto_id INTEGER,
+                codigo_barras TEXT,
+                categoria TEXT,
                 FOREIGN KEY (venta_id) REFERENCES ventas (id)
             )
         ''')
@@ -428,7 +2275,12 @@ class KioscoPOS:
                 total_ventas_por_metodo TEXT,
                 faltante_sobrante REAL,
                 estado TEXT NOT NULL,
-                turno TEXT
+                turno TEXT,
+                ventas_cantidad INTEGER NOT NULL DEFAULT 0,
+                efectivo_centavos INTEGER NOT NULL DEFAULT 0,
+                transferencia_centavos INTEGER NOT NULL DEFAULT 0,
+                debito_centavos INTEGER NOT NULL DEFAULT 0,
+                credito_centavos INTEGER NOT NULL DEFAULT 0
             )
         ''')
         
@@ -481,6 +2333,9 @@ class KioscoPOS:
 
         # Ejecutar migraciones de BD
         self._migrar_bd()
+        
+        # Releer la configuración con los valores que agregaron las migraciones
+        self.configuracion.cargar()
 
     def _migrar_bd(self):
         """Ejecuta migraciones necesarias para actualizar el esquema de BD."""
@@ -516,28 +2371,253 @@ class KioscoPOS:
                 ''')
                 print("✅ Configuración 'ganancia_deseada_default' establecida a 30%")
             
+            # Migraciones versionadas: cada paso se aplica una sola vez según PRAGMA user_version
+            self.cursor.execute("PRAGMA user_version")
+            version = self.cursor.fetchone()[0]
+            
+            if version < 1:
+                # Índices para los filtros por fecha, turno, venta, código de barras y caja
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas (fecha)")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_turno_fecha ON ventas (turno, fecha)")
+                # Índice de expresión para listar los meses con ventas sin recorrer la tabla
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_mes ON ventas (substr(fecha, 1, 7))")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_items_venta_venta ON items_venta (venta_id)")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_productos_codigo_barras ON productos (codigo_barras)")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_movimientos_caja_caja ON movimientos_caja (caja_id)")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_cajas_estado ON cajas (estado, id)")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_cajas_fecha_apertura ON cajas (fecha_apertura)")
+                self.cursor.execute("PRAGMA user_version = 1")
+                print("✅ Índices de BD creados (versión 1)")
+            
+            if version < 2:
+                # Resumen diario de ventas mantenido por finalizar_venta
+                # (si las ventas todavía están en pesos REAL lo arma la versión 4)
+                if self._ventas_en_centavos():
+                    filas = self.resumen_ventas.reconstruir()
+                    print(f"✅ Tabla 'ventas_resumen_diario' creada con {filas} filas (versión 2)")
+                self.cursor.execute("PRAGMA user_version = 2")
+            
+            if version < 3:
+                # Perfil de conexión editable desde la tabla configuracion (se aplica al abrir la BD)
+                self.cursor.executemany('''
+                    INSERT OR IGNORE INTO configuracion (clave, valor) VALUES (?, ?)
+                ''', [(f'bd_{pragma}', valor) for pragma, valor in PerfilConexion.DEFAULT.items()])
+                self.cursor.execute("PRAGMA user_version = 3")
+                print("✅ Perfil de conexión guardado en configuración (versión 3)")
+            
+            if version < 4:
+                # Importes de ventas, items y resumen en centavos enteros
+                if not self._ventas_en_centavos():
+                    self._migrar_importes_a_centavos()
+                self.cursor.execute("PRAGMA user_version = 4")
+            
+            if version < 5:
+                # Producto (id, código y categoría al momento de vender) en cada item vendido
+                self.cursor.execute("PRAGMA table_info(items_venta)")
+                columnas_items = [col[1] for col in self.cursor.fetchall()]
+                for columna, tipo in (('producto_id', 'INTEGER'), ('codigo_barras', 'TEXT'), ('categoria', 'TEXT')):
+                    if columna not in columnas_items:
+                        self.cursor.execute(f"ALTER TABLE items_venta ADD COLUMN {columna} {tipo}")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_items_venta_producto ON items_venta (producto_id)")
+                asignados = self._asignar_productos_a_items()
+                self.cursor.execute("PRAGMA user_version = 5")
+                print(f"✅ Items de venta asociados a su producto: {asignados} filas (versión 5)")
+            
+            if version < 6:
+                # Caja de cada venta y totales por caja mantenidos por finalizar_venta
+                self.cursor.execute("PRAGMA table_info(ventas)")
+                if 'caja_id' not in [col[1] for col in self.cursor.fetchall()]:
+                    self.cursor.execute("ALTER TABLE ventas ADD COLUMN caja_id INTEGER REFERENCES cajas (id)")
+                self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_caja ON ventas (caja_id)")
+                self.totales_caja.agregar_columnas()
+                asignadas = self._asignar_cajas_a_ventas()
+                cajas = self.totales_caja.reconstruir()
+                self.cursor.execute("PRAGMA user_version = 6")
+                print(f"✅ Ventas asociadas a su caja: {asignadas} filas, totales en {cajas} cajas (versión 6)")
+            
+            # Precios sugeridos desactualizados (antes se corregían fila por fila al dibujar la tabla)
+            reparados = self.recalcular_precios_sugeridos(auto_commit=False)
+            if reparados:
+                print(f"✅ Precio sugerido recalculado en {reparados} productos")
+            
             self.conn.commit()
         except Exception as e:
             print(f"⚠️ Error en migración de BD: {e}")
             self.conn.rollback()
     
+    def _asignar_cajas_a_ventas(self):
+        """Completa caja_id en las ventas anteriores a la versión 6 (no hace commit).
+        
+        Usa la misma ventana que usaba el cierre (apertura <= fecha <= cierre); si dos cajas
+        se superponen la venta queda en la abierta más recientemente. Las ventas fuera de
+        toda caja (administrador sin caja abierta) quedan en NULL.
+        """
+        self.cursor.execute('''
+            UPDATE ventas SET caja_id = (
+                SELECT c.id FROM cajas c
+                WHERE c.fecha_apertura <= ventas.fecha
+                  AND (c.fecha_cierre IS NULL OR ventas.fecha <= c.fecha_cierre)
+                ORDER BY c.fecha_apertura DESC, c.id DESC LIMIT 1
+            )
+            WHERE caja_id IS NULL
+        ''')
+        self.cursor.execute("SELECT COUNT(*) FROM ventas WHERE caja_id IS NOT NULL")
+        return self.cursor.fetchone()[0]
+    
+    def _ventas_en_centavos(self):
+        """True si la tabla ventas ya guarda los importes en centavos enteros"""
+        self.cursor.execute("PRAGMA table_info(ventas)")
+        return 'total_centavos' in [col[1] for col in self.cursor.fetchall()]
+    
+    def _migrar_importes_a_centavos(self):
+        """Pasa ventas, items_venta y el resumen diario de pesos REAL a centavos INTEGER.
+        
+        Antes de tocar nada deja una copia completa de la BD al lado de kiosco.db; la copia
+        sirve para `verificar-centavos`. Las tablas se rearman en una sola transacción y se
+        comprueba que la cantidad de filas y la suma de centavos coincidan antes de reemplazar
+        las originales: si algo no cuadra se deshace todo y la BD queda como estaba.
+        """
+        self.conn.commit()
+        respaldo = f"{os.path.splitext(self.ruta_bd)[0]}_antes_centavos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+        destino = sqlite3.connect(respaldo)
+        try:
+            self.conn.backup(destino)
+        finally:
+            destino.close()
+        print(f"✅ Respaldo de la BD guardado en '{respaldo}'")
+        
+        self.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            self.cursor.execute('''
+                CREATE TABLE ventas_centavos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fecha TEXT NOT NULL,
+                    usuario TEXT NOT NULL,
+                    metodo_pago TEXT NOT NULL,
+                    total_centavos INTEGER NOT NULL,
+                    costo_centavos INTEGER NOT NULL,
+                    turno TEXT NOT NULL
+                )
+            ''')
+            self.cursor.execute('''
+                INSERT INTO ventas_centavos (id, fecha, usuario, metodo_pago, total_centavos, costo_centavos, turno)
+                SELECT id, fecha, usuario, metodo_pago, a_centavos(total), a_centavos(costo_total), turno
+                FROM ventas
+            ''')
+            self.cursor.execute('''
+                CREATE TABLE items_venta_centavos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    venta_id INTEGER NOT NULL,
+                    producto_nombre TEXT NOT NULL,
+                    cantidad INTEGER NOT NULL,
+                    precio_centavos INTEGER NOT NULL,
+                    costo_centavos INTEGER NOT NULL,
+                    FOREIGN KEY (venta_id) REFERENCES ventas (id)
+                )
+            ''')
+            self.cursor.execute('''
+                INSERT INTO items_venta_centavos (id, venta_id, producto_nombre, cantidad, precio_centavos, costo_centavos)
+                SELECT id, venta_id, producto_nombre, cantidad, a_centavos(precio_unitario), a_centavos(costo_unitario)
+                FROM items_venta
+            ''')
+            
+            # Misma cantidad de filas y mismos centavos antes de reemplazar las tablas
+            controles = [
+                ("ventas", '''SELECT COUNT(*), COALESCE(SUM(a_centavos(total)), 0),
+                                  COALESCE(SUM(a_centavos(costo_total)), 0) FROM ventas''',
+                           '''SELECT COUNT(*), COALESCE(SUM(total_centavos), 0),
+                                  COALESCE(SUM(costo_centavos), 0) FROM ventas_centavos'''),
+                ("items_venta", '''SELECT COUNT(*), COALESCE(SUM(cantidad * a_centavos(precio_unitario)), 0),
+                                       COALESCE(SUM(cantidad * a_centavos(costo_unitario)), 0) FROM items_venta''',
+                                '''SELECT COUNT(*), COALESCE(SUM(cantidad * precio_centavos), 0),
+                                       COALESCE(SUM(cantidad * costo_centavos), 0) FROM items_venta_centavos'''),
+            ]
+            for tabla, consulta_vieja, consulta_nueva in controles:
+                vieja = self.cursor.execute(consulta_vieja).fetchone()
+                nueva = self.cursor.execute(consulta_nueva).fetchone()
+                if vieja != nueva:
+                    raise ValueError(f"los totales de '{tabla}' no coinciden ({vieja} != {nueva})")
+            
+            self.cursor.execute("DROP TABLE items_venta")
+            self.cursor.execute("DROP TABLE ventas")
+            self.cursor.execute("ALTER TABLE ventas_centavos RENAME TO ventas")
+            self.cursor.execute("ALTER TABLE items_venta_centavos RENAME TO items_venta")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas (fecha)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_turno_fecha ON ventas (turno, fecha)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_mes ON ventas (substr(fecha, 1, 7))")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_items_venta_venta ON items_venta (venta_id)")
+            
+            self.cursor.execute("DROP TABLE IF EXISTS ventas_resumen_diario")
+            filas = self.resumen_ventas.reconstruir()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        print(f"✅ Importes de ventas pasados a centavos; resumen diario con {filas} filas (versión 4)")
+    
+    def _asignar_productos_a_items(self):
+        """Completa producto_id, codigo_barras y categoria de los items vendidos antes de guardarlos.
+        
+        Las ventas viejas solo tienen el nombre: se busca el producto que hoy tiene ese nombre
+        (sin distinguir mayúsculas, acentos ni espacios; si hay varios, el de menor id). Los
+        items de productos que ya no existen quedan sin producto_id. No hace commit.
+        """
+        self.conn.create_function('normalizar_texto', 1, normalizar_texto, deterministic=True)
+        # Se normaliza cada nombre distinto una sola vez, no cada fila de items_venta
+        self.cursor.execute('''
+            CREATE TEMP TABLE productos_por_nombre AS
+            SELECT normalizar_texto(nombre) AS nombre_normalizado, MIN(id) AS id
+            FROM productos GROUP BY normalizar_texto(nombre)
+        ''')
+        self.cursor.execute('''
+            CREATE TEMP TABLE items_por_nombre AS
+            SELECT n.producto_nombre, p.id, p.codigo_barras, p.categoria
+            FROM (SELECT DISTINCT producto_nombre FROM items_venta WHERE producto_id IS NULL) n
+            JOIN productos_por_nombre pn ON pn.nombre_normalizado = normalizar_texto(n.producto_nombre)
+            JOIN productos p ON p.id = pn.id
+        ''')
+        self.cursor.execute("CREATE UNIQUE INDEX temp.idx_items_por_nombre ON items_por_nombre (producto_nombre)")
+        self.cursor.execute('''
+            UPDATE items_venta SET (producto_id, codigo_barras, categoria) = (
+                SELECT a.id, a.codigo_barras, a.categoria FROM items_por_nombre a
+                WHERE a.producto_nombre = items_venta.producto_nombre
+            )
+            WHERE producto_id IS NULL AND producto_nombre IN (SELECT producto_nombre FROM items_por_nombre)
+        ''')
+        asignados = self.cursor.rowcount
+        self.cursor.execute("DROP TABLE temp.items_por_nombre")
+        self.cursor.execute("DROP TABLE temp.productos_por_nombre")
+        return asignados
+    
     def get_configuracion(self, clave, default='1'):
-        """Obtiene un valor de configuración"""
-        self.cursor.execute("SELECT valor FROM configuracion WHERE clave = ?", (clave,))
-        result = self.cursor.fetchone()
-        return result[0] if result else default
+        """Obtiene un valor de configuración (desde memoria, sin consultar la BD)"""
+        return self.configuracion.texto(clave, default)
     
     def set_configuracion(self, clave, valor):
-        """Establece un valor de configuración"""
-        self.cursor.execute('''
-            INSERT OR REPLACE INTO configuracion (clave, valor)
-            VALUES (?, ?)
-        ''', (clave, valor))
-        self.conn.commit()
+        """Establece un valor de configuración y avisa a las vistas suscriptas"""
+        self.configuracion.set(clave, valor)
+    
+    def _rango_fechas(self, periodo):
+        """Convierte 'AAAA', 'AAAA-MM' o 'AAAA-MM-DD' en el rango [inicio, fin) de fechas.
+        
+        Comparar `fecha >= inicio AND fecha < fin` permite usar los índices, a diferencia
+        de DATE(fecha) = ? o strftime(...) = ?. Lanza ValueError si el período es inválido.
+        """
+        partes = periodo.strip().split('-')
+        if len(partes) == 1:
+            inicio = datetime.strptime(periodo.strip(), '%Y')
+            fin = inicio.replace(year=inicio.year + 1)
+        elif len(partes) == 2:
+            inicio = datetime.strptime(periodo.strip(), '%Y-%m')
+            fin = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            inicio = datetime.strptime(periodo.strip(), '%Y-%m-%d')
+            fin = inicio + timedelta(days=1)
+        return inicio.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d')
     
     def stock_habilitado(self):
         """Verifica si el stock está habilitado"""
-        return self.get_configuracion('stock_habilitado') == '1'
+        return self.configuracion.booleano('stock_habilitado', True)
     
     def calcular_precio_sugerido(self, costo, ganancia_deseada=None):
         """Calcula el precio sugerido usando la fórmula: P = C / (1 - R)
@@ -547,11 +2627,7 @@ class KioscoPOS:
         """
         if ganancia_deseada is None:
             # Obtener el % de ganancia deseada global
-            ganancia_str = self.get_configuracion('ganancia_deseada_default', '30')
-            try:
-                ganancia_deseada = float(ganancia_str) / 100.0  # Convertir de % a decimal
-            except ValueError:
-                ganancia_deseada = 0.30  # Default fallback
+            ganancia_deseada = self.configuracion.decimal('ganancia_deseada_default', 30.0) / 100.0
         else:
             # Si se pasa el % como número, convertir a decimal si es necesario
             if ganancia_deseada > 1:
@@ -568,6 +2644,36 @@ class KioscoPOS:
         precio_sugerido = costo / (1.0 - ganancia_deseada)
         return round(precio_sugerido, 1)
     
+    def recalcular_precios_sugeridos(self, auto_commit=True):
+        """Recalcula precio_sugerido con una sola UPDATE (misma fórmula que calcular_precio_sugerido).
+        
+        Se llama cuando cambia el costo o el % de ganancia (global o por producto); solo
+        escribe las filas cuyo valor cambia. Retorna la cantidad de productos actualizados.
+        """
+        ganancia_global = self.configuracion.decimal('ganancia_deseada_default', 30.0) / 100.0
+        
+        # ganancia_deseada por producto puede estar en % (30) o en decimal (0.30)
+        margen = '''CASE
+                WHEN ganancia_deseada IS NULL THEN :ganancia_global
+                WHEN ganancia_deseada > 1 THEN ganancia_deseada / 100.0
+                ELSE ganancia_deseada
+            END'''
+        sugerido = f'''CASE
+                WHEN costo <= 0 OR ({margen}) >= 1.0 THEN 0.0
+                ELSE redondear(costo / (1.0 - ({margen})), 1)
+            END'''
+        # round() de Python en lugar de ROUND de SQLite: redondean distinto los ,x5 y el
+        # resultado tiene que coincidir con calcular_precio_sugerido (guardar_producto)
+        self.conn.create_function('redondear', 2, round, deterministic=True)
+        self.cursor.execute(f'''
+            UPDATE productos SET precio_sugerido = {sugerido}
+            WHERE precio_sugerido IS NOT {sugerido}
+        ''', {'ganancia_global': ganancia_global})
+        actualizados = self.cursor.rowcount
+        if auto_commit:
+            self.conn.commit()
+        return actualizados
+    
     def centrar_ventana(self, ventana, ancho=400, alto=300, padre=None):
         """Centra una ventana emergente en la pantalla o relativa al padre."""
         ventana.update_idletasks()
@@ -772,7 +2878,11 @@ class KioscoPOS:
         tk.Label(frame_izq, text="Buscar por nombre o categoría:", bg='#FAF2E3').pack(pady=5)
         self.entry_buscar = tk.Entry(frame_izq, font=('Arial', 11), width=40)
         self.entry_buscar.pack(pady=5)
-        self.entry_buscar.bind('<KeyRelease>', lambda e: self.actualizar_lista_productos())
+        self.busqueda_ventas = BusquedaIncremental(
+            self.root, self.entry_buscar, self.catalogo, self._mostrar_lista_productos,
+            lambda ms: self._mostrar_latencia_busqueda('Ventas', self.busqueda_ventas, ms),
+            limite=self.LIMITE_LISTA_VENTAS
+        )
         
         # Búsqueda por código de barras
         tk.Label(frame_izq, text="Código de barras (presiona Enter):", bg='#FAF2E3').pack(pady=5)
@@ -795,6 +2905,8 @@ class KioscoPOS:
         )
         self.lista_productos.pack(side='left', fill='both', expand=True)
         scrollbar.config(command=self.lista_productos.yview)
+        # ID del producto mostrado en cada fila de la lista (mismo orden que el Listbox)
+        self.ids_lista_productos = []
         
         self.lista_productos.bind('<Double-Button-1>', lambda e: self.agregar_al_carrito())
         
@@ -923,6 +3035,29 @@ class KioscoPOS:
                 except Exception:
                     pass
         
+        # Venta rápida: cobra sin confirmaciones, el ticket sale según la preferencia guardada
+        frame_rapida = tk.Frame(frame_der, bg='#FAF2E3')
+        frame_rapida.pack(fill='x', pady=(8, 0))
+        self.venta_rapida_var = tk.BooleanVar(value=self.configuracion.booleano('venta_rapida'))
+        tk.Checkbutton(
+            frame_rapida,
+            text="⚡ Venta rápida",
+            variable=self.venta_rapida_var,
+            font=('Arial', 10, 'bold'),
+            bg='#FAF2E3',
+            command=lambda: self.set_configuracion('venta_rapida', '1' if self.venta_rapida_var.get() else '0')
+        ).pack(side='left')
+        tk.Label(frame_rapida, text="Ticket:", font=('Arial', 10), bg='#FAF2E3').pack(side='left', padx=(10, 2))
+        self.combo_ticket_preferencia = ttk.Combobox(
+            frame_rapida, values=list(self.PREFERENCIAS_TICKET), width=10, state='readonly'
+        )
+        self.combo_ticket_preferencia.set(self._preferencia_ticket().capitalize())
+        self.combo_ticket_preferencia.bind(
+            '<<ComboboxSelected>>',
+            lambda e: self.set_configuracion('ticket_preferencia', self.combo_ticket_preferencia.get().lower())
+        )
+        self.combo_ticket_preferencia.pack(side='left')
+        
         # Cargar productos
         self.actualizar_lista_productos()
 
@@ -1113,7 +3248,10 @@ class KioscoPOS:
         tk.Label(search_frame, text="Buscar:", font=('Arial', 10), bg='#FAF2E3').pack(side='left', padx=(0, 6))
         self.entry_buscar_productos = tk.Entry(search_frame, font=('Arial', 10), width=40)
         self.entry_buscar_productos.pack(side='left', fill='x', expand=True)
-        self.entry_buscar_productos.bind('<KeyRelease>', lambda e: self.actualizar_tabla_productos())
+        self.busqueda_productos = BusquedaIncremental(
+            self.root, self.entry_buscar_productos, self.catalogo, self._mostrar_tabla_productos,
+            lambda ms: self._mostrar_latencia_busqueda('Productos', self.busqueda_productos, ms)
+        )
         
         # Tabla de productos
         frame_tabla = tk.Frame(frame_lista_prod, bg='#FAF2E3')
@@ -1122,43 +3260,7 @@ class KioscoPOS:
         scrollbar_tabla = tk.Scrollbar(frame_tabla)
         scrollbar_tabla.pack(side='right', fill='y')
         
-        # Columnas condicionadas por configuración de stock
-        if self.stock_habilitado():
-            columnas = ('ID', 'Nombre', 'Precio', 'Costo', 'Stock', 'Sugerido', 'Categoría', 'Código')
-        else:
-            columnas = ('ID', 'Nombre', 'Precio', 'Costo', 'Sugerido', 'Categoría', 'Código')
-        
-        self.tabla_productos = ttk.Treeview(
-            frame_tabla,
-            columns=columnas,
-            show='headings',
-            yscrollcommand=scrollbar_tabla.set
-        )
-        
-        self.tabla_productos.heading('ID', text='ID', command=lambda: self.ordenar_tabla_productos('ID'))
-        self.tabla_productos.heading('Nombre', text='Nombre', command=lambda: self.ordenar_tabla_productos('Nombre'))
-        self.tabla_productos.heading('Precio', text='Precio', command=lambda: self.ordenar_tabla_productos('Precio'))
-        self.tabla_productos.heading('Costo', text='Costo', command=lambda: self.ordenar_tabla_productos('Costo'))
-        if self.stock_habilitado():
-            self.tabla_productos.heading('Stock', text='Stock', command=lambda: self.ordenar_tabla_productos('Stock'))
-        self.tabla_productos.heading('Sugerido', text='Sugerido', command=lambda: self.ordenar_tabla_productos('Sugerido'))
-        self.tabla_productos.heading('Categoría', text='Categoría', command=lambda: self.ordenar_tabla_productos('Categoría'))
-        self.tabla_productos.heading('Código', text='Código Barras', command=lambda: self.ordenar_tabla_productos('Código'))
-            
-        self.tabla_productos.column('ID', width=50)
-        self.tabla_productos.column('Nombre', width=200)
-        self.tabla_productos.column('Precio', width=80)
-        self.tabla_productos.column('Costo', width=80)
-        if self.stock_habilitado():
-            self.tabla_productos.column('Stock', width=60)
-        self.tabla_productos.column('Sugerido', width=80)
-        self.tabla_productos.column('Categoría', width=100)
-        self.tabla_productos.column('Código', width=120)
-        
-        self.tabla_productos.pack(side='left', fill='both', expand=True)
-        scrollbar_tabla.config(command=self.tabla_productos.yview)
-        
-        self.tabla_productos.bind('<Double-Button-1>', self.editar_producto)
+        self._crear_tabla_productos(frame_tabla, scrollbar_tabla)
         
         # Botones de acción
         frame_acciones = tk.Frame(frame_lista_prod, bg='#FAF2E3')
@@ -1281,10 +3383,17 @@ class KioscoPOS:
     def toggle_stock(self):
         """Cambia la configuración de stock habilitado/deshabilitado"""
         nuevo_valor = '1' if self.stock_var.get() else '0'
+        # Las vistas se actualizan en _al_cambiar_stock (suscripto a la clave)
         self.set_configuracion('stock_habilitado', nuevo_valor)
         
-        # Actualizar visibilidad de los campos
-        self.actualizar_visibilidad_stock()
+        mensaje = "Stock habilitado" if self.stock_var.get() else "Stock deshabilitado"
+        messagebox.showinfo("Configuración", f"{mensaje} correctamente")
+    
+    def _al_cambiar_stock(self, clave, valor):
+        """Adapta campos, botones y tablas al nuevo valor de stock_habilitado"""
+        if hasattr(self, 'stock_label'):
+            # Actualizar visibilidad de los campos
+            self.actualizar_visibilidad_stock()
         
         # Actualizar visibilidad del botón "Restar Stock" si existe
         if hasattr(self, 'btn_restar_stock'):
@@ -1298,54 +3407,21 @@ class KioscoPOS:
             # Guardar el frame padre
             frame_padre = self.tabla_productos.master
             
-            # Destruir tabla anterior
+            # Destruir tabla anterior y recrearla con las columnas correctas
             self.tabla_productos.destroy()
-            
-            # Recrear tabla con columnas correctas
-            if self.stock_habilitado():
-                columnas = ('ID', 'Nombre', 'Precio', 'Costo', 'Stock', 'Sugerido', 'Categoría', 'Código')
-            else:
-                columnas = ('ID', 'Nombre', 'Precio', 'Costo', 'Sugerido', 'Categoría', 'Código')
-            
-            self.tabla_productos = ttk.Treeview(
-                frame_padre,
-                columns=columnas,
-                show='headings',
-                yscrollcommand=frame_padre.children['!scrollbar'].set
-            )
-            
-            # Configurar encabezados
-            self.tabla_productos.heading('ID', text='ID', command=lambda: self.ordenar_tabla_productos('ID'))
-            self.tabla_productos.heading('Nombre', text='Nombre', command=lambda: self.ordenar_tabla_productos('Nombre'))
-            self.tabla_productos.heading('Precio', text='Precio', command=lambda: self.ordenar_tabla_productos('Precio'))
-            self.tabla_productos.heading('Costo', text='Costo', command=lambda: self.ordenar_tabla_productos('Costo'))
-            if self.stock_habilitado():
-                self.tabla_productos.heading('Stock', text='Stock', command=lambda: self.ordenar_tabla_productos('Stock'))
-            self.tabla_productos.heading('Sugerido', text='Sugerido', command=lambda: self.ordenar_tabla_productos('Sugerido'))
-            self.tabla_productos.heading('Categoría', text='Categoría', command=lambda: self.ordenar_tabla_productos('Categoría'))
-            self.tabla_productos.heading('Código', text='Código Barras', command=lambda: self.ordenar_tabla_productos('Código'))
-                
-            # Configurar ancho de columnas
-            self.tabla_productos.column('ID', width=50)
-            self.tabla_productos.column('Nombre', width=200)
-            self.tabla_productos.column('Precio', width=80)
-            self.tabla_productos.column('Costo', width=80)
-            if self.stock_habilitado():
-                self.tabla_productos.column('Stock', width=60)
-            self.tabla_productos.column('Sugerido', width=80)
-            self.tabla_productos.column('Categoría', width=100)
-            self.tabla_productos.column('Código', width=120)
-            
-            self.tabla_productos.pack(side='left', fill='both', expand=True)
-            self.tabla_productos.bind('<Double-Button-1>', self.editar_producto)
+            self._crear_tabla_productos(frame_padre, frame_padre.children['!scrollbar'])
+            self.actualizar_tabla_productos()
         
-        # Actualizar tabla y lista de productos
-        self.actualizar_tabla_productos()
-        if hasattr(self, 'actualizar_lista_productos'):
+        # Actualizar lista de productos del punto de venta
+        if hasattr(self, 'lista_productos'):
             self.actualizar_lista_productos()
-        
-        mensaje = "Stock habilitado" if self.stock_var.get() else "Stock deshabilitado"
-        messagebox.showinfo("Configuración", f"{mensaje} correctamente")
+    
+    def _al_cambiar_ganancia(self, clave, valor):
+        """Recalcula los precios sugeridos con la nueva ganancia global y redibuja la tabla"""
+        self.recalcular_precios_sugeridos()
+        self.recargar_catalogo()
+        if hasattr(self, 'tabla_virtual_productos'):
+            self.actualizar_tabla_productos()
     
     def actualizar_visibilidad_stock(self):
         """Actualiza la visibilidad de los campos relacionados con stock"""
@@ -1369,23 +3445,9 @@ class KioscoPOS:
                 self.spinbox_ganancia_deseada.insert(0, '30')
                 return
             
-            # Guardar en configuración
+            # Guardar en configuración (_al_cambiar_ganancia recalcula los precios sugeridos)
             self.set_configuracion('ganancia_deseada_default', str(ganancia))
             messagebox.showinfo("Éxito", f"Ganancia deseada global establecida a {ganancia}%")
-            
-            # Recalcular precios sugeridos para todos los productos sin override
-            self.cursor.execute('''
-                UPDATE productos 
-                SET precio_sugerido = CASE 
-                    WHEN costo > 0 THEN costo / (1 - ? / 100.0) 
-                    ELSE 0 
-                END
-                WHERE ganancia_deseada IS NULL
-            ''', (ganancia,))
-            self.conn.commit()
-            
-            # Actualizar tabla para mostrar los nuevos precios sugeridos
-            self.actualizar_tabla_productos()
         except ValueError:
             messagebox.showerror("Error", "La ganancia deseada debe ser un número válido")
     
@@ -1561,6 +3623,17 @@ class KioscoPOS:
             cursor='hand2'
         ).pack(side='left', padx=10)
         
+        tk.Button(
+            frame_exportar,
+            text="Ver Ticket",
+            font=('Arial', 10),
+            bg='#7c3aed',
+            fg='white',
+            command=self.ver_ticket_seleccionado,
+            cursor='hand2'
+        ).pack(side='left', padx=5)
+        self.tabla_ventas.bind('<Double-1>', lambda e: self.ver_ticket_seleccionado())
+        
         # Separador visual antes del botón peligroso
         # tk.Label(
         #     frame_exportar,
@@ -1696,21 +3769,19 @@ class KioscoPOS:
     
     def actualizar_lista_productos(self):
         """Actualiza la lista de productos en el punto de venta"""
-        busqueda = self.entry_buscar.get().lower()
+        # Buscar en el catálogo en memoria (sin consultar la BD), los más relevantes primero
+        self._mostrar_lista_productos(
+            self.catalogo.buscar_rankeado(self.entry_buscar.get(), self.LIMITE_LISTA_VENTAS)
+        )
+    
+    def _mostrar_lista_productos(self, productos):
+        """Dibuja en la lista del punto de venta los productos encontrados"""
         self.lista_productos.delete(0, tk.END)
-        
-        if busqueda:
-            self.cursor.execute('''
-                SELECT * FROM productos 
-                WHERE LOWER(nombre) LIKE ? OR LOWER(categoria) LIKE ?
-                ORDER BY nombre
-            ''', (f'%{busqueda}%', f'%{busqueda}%'))
-        else:
-            self.cursor.execute('SELECT * FROM productos ORDER BY nombre')
-        
-        productos = self.cursor.fetchall()
+        stock_habilitado = self.stock_habilitado()
+        textos = []
+        colores = []
         for producto in productos:
-            if self.stock_habilitado():
+            if stock_habilitado:
                 # Mostrar con información de stock
                 texto = f"{producto[1]} - ${producto[2]} - Stock: {producto[4]} - {producto[5]}"
                 # Determinar color según prioridades
@@ -1726,47 +3797,33 @@ class KioscoPOS:
                 # Color amarillo si precio o costo están en cero
                 color = '#fef3c7' if producto[2] == 0 or producto[3] == 0 else 'white'
             
-            self.lista_productos.insert(tk.END, texto)
-            self.lista_productos.itemconfig(tk.END, {'bg': color})
+            textos.append(texto)
+            colores.append(color)
+        
+        # Una sola inserción; solo se configuran las filas que no van en blanco
+        self.ids_lista_productos = [producto[0] for producto in productos]
+        if textos:
+            self.lista_productos.insert(tk.END, *textos)
+        for indice, color in enumerate(colores):
+            if color != 'white':
+                self.lista_productos.itemconfig(indice, {'bg': color})
     
     def buscar_por_barcode(self, event):
         """Busca y agrega producto por código de barras"""
-        codigo = self.entry_barcode.get()
+        codigo = self.entry_barcode.get().strip()
         if not codigo:
             return
         
-        self.cursor.execute('SELECT * FROM productos WHERE codigo_barras = ?', (codigo,))
-        producto = self.cursor.fetchone()
+        intervalo, modo = self.medidor_escaneos.escaneo()
+        if modo:
+            self._mostrar_tiempos_caja(intervalo, modo)
+        
+        # Búsqueda O(1) en el catálogo en memoria (sin consultar la BD)
+        producto = self.catalogo.buscar_codigo(codigo)
         
         if producto:
-            # Solo validar stock si está habilitado
-            if self.stock_habilitado() and producto[4] <= 0:
-                messagebox.showwarning("Sin Stock", "No hay stock disponible de este producto")
-                return
-            
-            # Verificar si ya está en el carrito
-            for item in self.carrito:
-                if item['id'] == producto[0]:
-                    # Solo validar límite de stock si está habilitado
-                    if self.stock_habilitado() and item['cantidad'] >= producto[4]:
-                        messagebox.showwarning("Stock Insuficiente", "No hay más stock disponible")
-                        return
-                    item['cantidad'] += 1
-                    self.actualizar_carrito_display()
-                    self.entry_barcode.delete(0, tk.END)
-                    return
-            
-            # Agregar nuevo item
-            self.carrito.append({
-                'id': producto[0],
-                'nombre': producto[1],
-                'precio': producto[2],
-                'costo': producto[3],
-                'cantidad': 1,
-                'stock_disponible': producto[4]
-            })
-            self.actualizar_carrito_display()
-            self.entry_barcode.delete(0, tk.END)
+            if self._agregar_producto_al_carrito(producto):
+                self.entry_barcode.delete(0, tk.END)
         else:
             messagebox.showerror("No encontrado", "Producto no encontrado con ese código de barras")
     
@@ -1777,59 +3834,54 @@ class KioscoPOS:
             messagebox.showwarning("Selección", "Por favor selecciona un producto")
             return
         
-        # Obtener el producto de la base de datos
-        busqueda = self.entry_buscar.get().lower()
-        if busqueda:
-            self.cursor.execute('''
-                SELECT * FROM productos 
-                WHERE LOWER(nombre) LIKE ? OR LOWER(categoria) LIKE ?
-                ORDER BY nombre
-            ''', (f'%{busqueda}%', f'%{busqueda}%'))
-        else:
-            self.cursor.execute('SELECT * FROM productos ORDER BY nombre')
-        
-        productos = self.cursor.fetchall()
-        producto = productos[seleccion[0]]
-        
-        # Solo validar stock si está habilitado
-        if self.stock_habilitado() and producto[4] <= 0:
-            messagebox.showwarning("Sin Stock", "No hay stock disponible de este producto")
+        # La fila guarda el ID del producto: búsqueda O(1) en el catálogo
+        producto = None
+        if seleccion[0] < len(self.ids_lista_productos):
+            producto = self.catalogo.obtener(self.ids_lista_productos[seleccion[0]])
+        if producto is None:
+            # El producto se eliminó después de dibujar la lista
+            messagebox.showwarning("Selección", "El producto ya no existe")
+            self.actualizar_lista_productos()
             return
         
-        # Verificar si ya está en el carrito
-        for item in self.carrito:
-            if item['id'] == producto[0]:
-                # Solo validar límite de stock si está habilitado
-                if self.stock_habilitado() and item['cantidad'] >= producto[4]:
-                    messagebox.showwarning("Stock Insuficiente", "No hay más stock disponible")
-                    return
-                item['cantidad'] += 1
-                self.actualizar_carrito_display()
-                return
-        
-        # Agregar nuevo item
-        self.carrito.append({
-            'id': producto[0],
-            'nombre': producto[1],
-            'precio': producto[2],
-            'costo': producto[3],
-            'cantidad': 1,
-            'stock_disponible': producto[4]
-        })
-        self.actualizar_carrito_display()
+        self._agregar_producto_al_carrito(producto)
     
-    def actualizar_carrito_display(self):
-        """Actualiza la visualización del carrito"""
-        self.lista_carrito.delete(0, tk.END)
-        total = 0
-        
-        for item in self.carrito:
-            subtotal = item['precio'] * item['cantidad']
-            total += subtotal
-            texto = f"{item['nombre']} x{item['cantidad']} - ${subtotal}"
-            self.lista_carrito.insert(tk.END, texto)
-        
-        self.label_total.config(text=f"TOTAL: ${total}")
+    def _agregar_producto_al_carrito(self, producto):
+        """Suma una unidad del producto al carrito validando el stock. Retorna True si se agregó"""
+        # Solo validar stock si está habilitado
+        if self.stock_habilitado():
+            if producto[4] <= 0:
+                messagebox.showwarning("Sin Stock", "No hay stock disponible de este producto")
+                return False
+            # Búsqueda O(1) de la línea del producto en el carrito
+            if self.carrito.cantidad_de(producto[0]) >= producto[4]:
+                messagebox.showwarning("Stock Insuficiente", "No hay más stock disponible")
+                return False
+        self.carrito.agregar(producto)
+        return True
+    
+    @staticmethod
+    def _texto_linea_carrito(item):
+        subtotal = item['precio_centavos'] * item['cantidad'] / 100
+        return f"{item['nombre']} x{item['cantidad']} - ${subtotal}"
+    
+    def _al_cambiar_carrito(self, accion, indice, item):
+        """Redibuja solo la línea del carrito que cambió y el total"""
+        if not hasattr(self, 'lista_carrito'):
+            return
+        if accion == 'agregar':
+            self.lista_carrito.insert(tk.END, self._texto_linea_carrito(item))
+        elif accion == 'actualizar':
+            seleccionada = indice in self.lista_carrito.curselection()
+            self.lista_carrito.delete(indice)
+            self.lista_carrito.insert(indice, self._texto_linea_carrito(item))
+            if seleccionada:
+                self.lista_carrito.selection_set(indice)
+        elif accion == 'quitar':
+            self.lista_carrito.delete(indice)
+        else:
+            self.lista_carrito.delete(0, tk.END)
+        self.label_total.config(text=f"TOTAL: ${self.carrito.total}")
     
     def eliminar_del_carrito(self):
         """Elimina el item seleccionado del carrito"""
@@ -1837,11 +3889,7 @@ class KioscoPOS:
         if not seleccion:
             messagebox.showwarning("Selección", "Por favor selecciona un item del carrito")
             return
-        print(self.carrito[seleccion[0]]['id'])
-        #logging.info(seleccion.id)
-        # messagebox.showwarning(seleccion[0])
-        del self.carrito[seleccion[0]]
-        self.actualizar_carrito_display()
+        self.carrito.quitar(seleccion[0])
 
     def eliminar_uno_del_carrito(self):
         """Elimina el item seleccionado del carrito"""
@@ -1850,24 +3898,15 @@ class KioscoPOS:
             messagebox.showwarning("Selección", "Por favor selecciona un item del carrito")
             return
         index = seleccion[0]
-        producto = self.carrito[index]
-
-        # Restar una unidad
-        producto["cantidad"] -= 1
-
-        # Si llega a 0, eliminar completamente
-        if producto["cantidad"] <= 0:
-            del self.carrito[index]
-
-        # Actualizar la interfaz
-        self.actualizar_carrito_display()
-        self.lista_carrito.selection_set(index)
+        # Restar una unidad (si llega a 0 se quita la línea)
+        self.carrito.quitar_unidad(index)
+        if index < len(self.carrito):
+            self.lista_carrito.selection_set(index)
 
     def vaciar_carrito(self):
         """Vacía completamente el carrito"""
         if self.carrito and messagebox.askyesno("Confirmar", "¿Vaciar el carrito?"):
-            self.carrito = []
-            self.actualizar_carrito_display()
+            self.carrito.vaciar()
     
     def restar_stock_interno(self):
         """Resta stock usando los productos del carrito sin registrar una venta."""
@@ -1883,15 +3922,12 @@ class KioscoPOS:
         if not messagebox.askyesno("Confirmar", "¿Deseas restar el stock de los productos del carrito sin registrar una venta?"):
             return
 
-        for item in self.carrito:
-            self.cursor.execute('''
-                UPDATE productos SET stock = stock - ? WHERE id = ?
-            ''', (item['cantidad'], item['id']))
-
+        self.descontar_stock([(item['id'], item['cantidad']) for item in self.carrito])
         self.conn.commit()
+        for item in self.carrito:
+            self.catalogo.ajustar_stock(item['id'], -item['cantidad'])
 
-        self.carrito = []
-        self.actualizar_carrito_display()
+        self.carrito.vaciar()
         if hasattr(self, 'actualizar_lista_productos'):
             self.actualizar_lista_productos()
 
@@ -1911,11 +3947,14 @@ class KioscoPOS:
             messagebox.showwarning("Carrito Vacío", "El carrito está vacío")
             return
 
-        total = sum(item['precio'] * item['cantidad'] for item in self.carrito)
+        total = self.carrito.total
 
         if metodo and metodo.lower() == 'efectivo':
             # Mostrar diálogo para ingresar el pago y calcular vuelto
             self.mostrar_dialogo_efectivo(total, metodo)
+        elif self.configuracion.booleano('venta_rapida'):
+            # Venta rápida: el botón (o F2-F4) ya es la confirmación
+            self.finalizar_venta(metodo)
         else:
             # Confirmar para otros métodos con diálogo que acepta F1
             self.mostrar_dialogo_confirmacion(total, metodo)
@@ -2016,6 +4055,8 @@ class KioscoPOS:
         tk.Button(frame_bot, text="Cancelar", bg='#ef4444', fg='white', font=('Arial', 10), command=_cancelar_efectivo).pack(side='left', expand=True, fill='x', padx=5)
 
         entry_pago.focus_set()
+        # Enter en el pago también confirma (el cobro se resuelve sin tocar el mouse)
+        entry_pago.bind('<Return>', lambda e: confirmar())
         # Inicializar vuelto
         actualizar_vuelto()
         # Permitir confirmar con F1 dentro del diálogo
@@ -2086,118 +4127,207 @@ class KioscoPOS:
         except Exception:
             pass
 
+    def descontar_stock(self, cantidades):
+        """Descuenta stock de varios productos con una sola sentencia UPDATE (no hace commit).
+        
+        `cantidades` es una lista de (producto_id, cantidad).
+        """
+        # Lotes de 400 filas (800 parámetros) para respetar el límite de variables de SQLite
+        for inicio in range(0, len(cantidades), 400):
+            lote = cantidades[inicio:inicio + 400]
+            valores = ', '.join(['(?, ?)'] * len(lote))
+            parametros = [valor for fila in lote for valor in fila]
+            self.cursor.execute(f'''
+                WITH descuento (id, cantidad) AS (VALUES {valores})
+                UPDATE productos
+                SET stock = stock - (SELECT SUM(cantidad) FROM descuento WHERE descuento.id = productos.id)
+                WHERE id IN (SELECT id FROM descuento)
+            ''', parametros)
+    
     def finalizar_venta(self, metodo_pago):
         """Finaliza la venta y la registra"""
         if not self.carrito:
             messagebox.showwarning("Carrito Vacío", "El carrito está vacío")
             return
         
-        # Calcular totales
-        total = sum(item['precio'] * item['cantidad'] for item in self.carrito)
-        costo_total = sum(item['costo'] * item['cantidad'] for item in self.carrito)
+        inicio = time.perf_counter()
+        venta_rapida = self.configuracion.booleano('venta_rapida')
+        
+        # Totales llevados por el carrito en centavos: se guardan tal cual, sin pasar por float
+        total_centavos = self.carrito.total_centavos
+        costo_centavos = self.carrito.costo_centavos
+        total = self.carrito.total
+        
+        # Leer la configuración una sola vez para todo el carrito
+        stock_habilitado = self.stock_habilitado()
         
         # Registrar venta con turno
         fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         turno = self.turno_actual if hasattr(self, 'turno_actual') and self.turno_actual else 'MAÑANA'
-        self.cursor.execute('''
-            INSERT INTO ventas (fecha, usuario, metodo_pago, total, costo_total, turno)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (fecha, self.usuario_actual['nombre'], metodo_pago, total, costo_total, turno))
-
-        venta_id = self.cursor.lastrowid
-        
-        # Registrar items de la venta
-        for item in self.carrito:
+        try:
+            # Una sola transacción (un único fsync): la venta nunca queda sin sus items
+            if self.conn.in_transaction:
+                self.conn.commit()
+            self.cursor.execute('BEGIN IMMEDIATE')
+            # La caja se lee dentro de la transacción: la venta queda en la sesión abierta al cobrar
+            caja_id = self.totales_caja.caja_abierta()
             self.cursor.execute('''
-                INSERT INTO items_venta (venta_id, producto_nombre, cantidad, precio_unitario, costo_unitario)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (venta_id, item['nombre'], item['cantidad'], item['precio'], item['costo']))
+                INSERT INTO ventas (fecha, usuario, metodo_pago, total_centavos, costo_centavos, turno, caja_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (fecha, self.usuario_actual['nombre'], metodo_pago, total_centavos, costo_centavos, turno, caja_id))
+
+            venta_id = self.cursor.lastrowid
+            # Actualizar el resumen diario y los totales de la caja en la misma transacción
+            self.resumen_ventas.registrar_venta(fecha, turno, metodo_pago, total_centavos, costo_centavos)
+            if caja_id is not None:
+                self.totales_caja.registrar_venta(caja_id, metodo_pago, total_centavos)
+            
+            # Registrar todos los items de la venta en lote
+            self.cursor.executemany('''
+                INSERT INTO items_venta (venta_id, producto_nombre, cantidad, precio_centavos, costo_centavos,
+                                         producto_id, codigo_barras, categoria)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(venta_id, item['nombre'], item['cantidad'], item['precio_centavos'], item['costo_centavos'],
+                   item['id'], item['codigo_barras'], item['categoria'])
+                  for item in self.carrito])
             
             # Solo actualizar stock si está habilitado
-            if self.stock_habilitado():
-                self.cursor.execute('''
-                    UPDATE productos SET stock = stock - ? WHERE id = ?
-                ''', (item['cantidad'], item['id']))
+            if stock_habilitado:
+                self.descontar_stock([(item['id'], item['cantidad']) for item in self.carrito])
+            
+            self.conn.commit()
+        except (sqlite3.Error, ValueError) as e:
+            self.conn.rollback()
+            messagebox.showerror("Error", f"No se pudo registrar la venta: {str(e)}")
+            return
         
-        self.conn.commit()
+        # Reflejar el descuento de stock y la venta en el catálogo en memoria
+        for item in self.carrito:
+            if stock_habilitado:
+                self.catalogo.ajustar_stock(item['id'], -item['cantidad'])
+            self.catalogo.registrar_venta(item['id'], item['cantidad'])
         
-        # Generar ticket
-        if messagebox.askyesno("Ticket", "¿Deseas generar el ticket de venta?"):
-            self.generar_ticket(venta_id, metodo_pago, total)
+        # Generar ticket (se arma en segundo plano a partir de una copia del carrito)
+        if self._quiere_ticket(venta_rapida):
+            self.generar_ticket(venta_id, metodo_pago, fecha)
         
         # Limpiar carrito
-        self.carrito = []
-        self.actualizar_carrito_display()
+        self.carrito.vaciar()
         if hasattr(self, 'actualizar_lista_productos'):
             self.actualizar_lista_productos()
         
-        messagebox.showinfo("Éxito", f"Venta registrada exitosamente\nTotal: ${total}")
+        if venta_rapida:
+            # Sin ventanas modales: aviso que se va solo y el lector listo para el próximo cliente
+            self.entry_barcode.focus_set()
+            self._mostrar_aviso(f"✅ Venta #{venta_id} registrada · Total ${total:.2f}")
+            self.medidor_escaneos.cobro('rapida', (time.perf_counter() - inicio) * 1000)
+        else:
+            messagebox.showinfo("Éxito", f"Venta registrada exitosamente\nTotal: ${total}")
+            self.medidor_escaneos.cobro('normal')
     
-    def generar_ticket(self, venta_id, metodo_pago, total):
-        """Genera un ticket PDF de la venta"""
+    def _preferencia_ticket(self):
+        """'preguntar', 'siempre' o 'nunca' (clave ticket_preferencia)"""
+        preferencia = self.configuracion.texto('ticket_preferencia', 'preguntar').lower()
+        return preferencia if preferencia in ('preguntar', 'siempre', 'nunca') else 'preguntar'
+
+    def _quiere_ticket(self, venta_rapida):
+        """Decide si la venta lleva ticket; la venta rápida nunca pregunta (sin preferencia, lo genera)"""
+        preferencia = self._preferencia_ticket()
+        if preferencia == 'preguntar' and not venta_rapida:
+            return messagebox.askyesno("Ticket", "¿Deseas generar el ticket de venta?")
+        return preferencia != 'nunca'
+
+    def _mostrar_aviso(self, texto):
+        """Aviso no modal al pie de la ventana que se oculta solo a los AVISO_MS"""
+        label = getattr(self, 'label_aviso', None)
+        if label is None or not label.winfo_exists():
+            self.label_aviso = label = tk.Label(
+                self.root, font=('Arial', 12, 'bold'), bg='#16a34a', fg='white', padx=14, pady=6
+            )
+            self._aviso_pendiente = None
+        label.config(text=texto)
+        label.place(relx=0.5, rely=1.0, anchor='s', y=-24)
+        label.lift()
+        if self._aviso_pendiente:
+            self.root.after_cancel(self._aviso_pendiente)
+        self._aviso_pendiente = self.root.after(self.AVISO_MS, label.place_forget)
+
+    def generar_ticket(self, venta_id, metodo_pago, fecha):
+        """Encola el ticket de la venta (con el carrito todavía cargado) para generarlo en segundo plano"""
+        ticket = ServicioTickets.instantanea(venta_id, fecha, self.usuario_actual['nombre'], metodo_pago, self.carrito)
+        self.servicio_tickets.encolar(ticket)
+        self._tickets_en_curso += 1
+        if self._tickets_en_curso == 1:
+            self.root.after(100, self._revisar_tickets)
+
+    def ticket_de_venta(self, venta_id):
+        """Datos del ticket de una venta armados desde la BD (None si la venta no existe)"""
+        self.cursor.execute('SELECT fecha, usuario, metodo_pago, total_centavos FROM ventas WHERE id = ?', (venta_id,))
+        venta = self.cursor.fetchone()
+        if not venta:
+            return None
+        self.cursor.execute('''
+            SELECT producto_nombre, cantidad, cantidad * precio_centavos
+            FROM items_venta WHERE venta_id = ? ORDER BY id
+        ''', (venta_id,))
+        return {
+            'venta_id': venta_id,
+            'fecha': venta[0],
+            'vendedor': venta[1],
+            'metodo_pago': venta[2],
+            'total_centavos': venta[3],
+            'items': self.cursor.fetchall(),
+        }
+
+    def ver_ticket_seleccionado(self):
+        """Abre en PDF el ticket de la venta seleccionada en el historial.
+        
+        Si al cobrar se guardó en PDF se abre ese mismo; si no (ESC/POS o sin ticket) se arma
+        desde la BD.
+        """
+        seleccion = self.tabla_ventas.selection()
+        if not seleccion:
+            messagebox.showwarning("Ver Ticket", "Selecciona una venta del historial")
+            return
+        venta_id = int(self.tabla_ventas.item(seleccion[0], 'values')[0])
+        ticket = self.ticket_de_venta(venta_id)
+        if not ticket:
+            messagebox.showerror("Ver Ticket", f"No se encontró la venta {venta_id}")
+            return
         try:
-            # Crear carpeta 'tickets' si no existe
-            carpeta_tickets = "tickets"
-            if not os.path.exists(carpeta_tickets):
-                os.makedirs(carpeta_tickets)
-
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font('Arial', 'B', 16)
-            
-            # Encabezado
-            pdf.cell(0, 10, 'KIOSCO - TICKET DE VENTA', 0, 1, 'C')
-            pdf.set_font('Arial', '', 10)
-            pdf.cell(0, 5, f'Ticket N: {venta_id}', 0, 1, 'C')
-            pdf.cell(0, 5, f'Fecha: {datetime.now().strftime("%d/%m/%Y %H:%M")}', 0, 1, 'C')
-            pdf.cell(0, 5, f'Vendedor: {self.usuario_actual["nombre"]}', 0, 1, 'C')
-            pdf.ln(5)
-            
-            # Línea separadora
-            pdf.cell(0, 0, '', 'T', 1)
-            pdf.ln(3)
-            
-            # Items
-            pdf.set_font('Arial', 'B', 10)
-            pdf.cell(100, 5, 'Producto', 0, 0)
-            pdf.cell(30, 5, 'Cant.', 0, 0, 'C')
-            pdf.cell(40, 5, 'Precio', 0, 1, 'R')
-            
-            pdf.set_font('Arial', '', 9)
-            self.cursor.execute('''
-                SELECT producto_nombre, cantidad, precio_unitario
-                FROM items_venta WHERE venta_id = ?
-            ''', (venta_id,))
-            
-            items = self.cursor.fetchall()
-            for item in items:
-                pdf.cell(100, 5, item[0][:30], 0, 0)
-                pdf.cell(30, 5, str(item[1]), 0, 0, 'C')
-                pdf.cell(40, 5, f'${item[2] * item[1]:.2f}', 0, 1, 'R')
-            
-            pdf.ln(3)
-            pdf.cell(0, 0, '', 'T', 1)
-            pdf.ln(3)
-            
-            # Total
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(130, 8, 'TOTAL:', 0, 0, 'R')
-            pdf.cell(40, 8, f'${total:.2f}', 0, 1, 'R')
-            
-            pdf.set_font('Arial', '', 10)
-            pdf.cell(0, 5, f'Metodo de pago: {metodo_pago}', 0, 1, 'C')
-            
-            pdf.ln(10)
-            pdf.set_font('Arial', 'I', 8)
-            pdf.cell(0, 5, 'Gracias por su compra!', 0, 1, 'C')
-            
-            # Guardar en subcarpeta 'tickets'
-            filename = os.path.join(carpeta_tickets, f'ticket_{venta_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf')
-            pdf.output(filename)
-            messagebox.showinfo("Ticket Generado", f"Ticket guardado como: {filename}")
-            
+            guardado = self.servicio_tickets.archivo.leer(venta_id, ticket['fecha'][:10])
+            datos = guardado[1] if guardado and guardado[0] == TicketPDF.extension else TicketPDF().renderizar(ticket)
+            archivo = os.path.join(tempfile.gettempdir(), f"ticket_{venta_id}.pdf")
+            with open(archivo, 'wb') as salida:
+                salida.write(datos)
+            if sys.platform.startswith('win'):
+                os.startfile(archivo)
+            else:
+                subprocess.Popen(['open' if sys.platform == 'darwin' else 'xdg-open', archivo])
         except Exception as e:
-            messagebox.showerror("Error", f"Error al generar ticket: {str(e)}")
+            messagebox.showerror("Error", f"No se pudo abrir el ticket: {e}")
+
+    def _al_cambiar_formato_ticket(self, clave, valor):
+        """Cambia el backend de tickets (los que ya están en la cola salen con el nuevo)"""
+        try:
+            self.servicio_tickets.backend = ServicioTickets.desde_configuracion(self.configuracion)
+        except ValueError as e:
+            messagebox.showerror("Tickets", str(e))
+
+    def _revisar_tickets(self):
+        """Lee los tickets terminados (desde el hilo principal) mientras queden en curso"""
+        try:
+            while True:
+                estado, venta_id, detalle, armado_ms, espera_ms = self.servicio_tickets.resultados.get_nowait()
+                self._tickets_en_curso -= 1
+                if estado == 'ok':
+                    self._mostrar_latencia_ticket(venta_id, armado_ms, espera_ms)
+                else:
+                    messagebox.showerror("Error", f"Error al generar el ticket {venta_id}: {detalle}")
+        except queue.Empty:
+            pass
+        if self._tickets_en_curso > 0:
+            self.root.after(100, self._revisar_tickets)
 
     # ===== Métodos de Caja (Abrir/Cerrar) =====
     def get_caja_abierta(self):
@@ -2325,21 +4455,14 @@ class KioscoPOS:
             return
 
         caja_id = caja[0]
-        fecha_ap = datetime.fromisoformat(caja[3]) if isinstance(caja[3], str) else datetime.strptime(caja[3], '%Y-%m-%d %H:%M:%S')
         ahora = datetime.now()
 
-        # Calcular totales por metodo desde fecha_apertura hasta ahora
-        self.cursor.execute('''
-            SELECT metodo_pago, SUM(total) FROM ventas
-            WHERE fecha >= ? AND fecha <= ?
-            GROUP BY metodo_pago
-        ''', (fecha_ap.strftime('%Y-%m-%d %H:%M:%S'), ahora.strftime('%Y-%m-%d %H:%M:%S')))
-        rows = self.cursor.fetchall()
-        totals = {r[0]: (r[1] or 0.0) for r in rows}
+        # Totales por método acumulados en la fila de la caja con cada venta
+        totals = self.totales_caja.totales(caja_id)
 
         # Obtener movimientos de caja
         self.cursor.execute('''
-            SELECT tipo, SUM(monto) FROM movimientos_caja
+            SELECT tipo, SUM(a_centavos(monto)) / 100.0 FROM movimientos_caja
             WHERE caja_id = ?
             GROUP BY tipo
         ''', (caja_id,))
@@ -2672,6 +4795,19 @@ class KioscoPOS:
     
     # ===== MÉTODOS DE PRODUCTOS =====
     
+    def recargar_catalogo(self):
+        """Recarga el catálogo en memoria (tras altas, bajas o renumeración de IDs)"""
+        self.catalogo.cargar(self.cursor)
+    
+    def refrescar_producto_catalogo(self, producto_id):
+        """Relee un producto de la BD y lo actualiza en el catálogo en memoria"""
+        self.cursor.execute('SELECT * FROM productos WHERE id = ?', (producto_id,))
+        producto = self.cursor.fetchone()
+        if producto:
+            self.catalogo.actualizar(producto)
+        else:
+            self.catalogo.quitar(producto_id)
+    
     def guardar_producto(self):
         """Guarda o actualiza un producto"""
         nombre = self.prod_nombre.get()
@@ -2753,13 +4889,17 @@ class KioscoPOS:
             # Reorganizar IDs después de agregar nuevo producto (sin commit automático)
             self.reorganizar_ids_productos(auto_commit=False)
             self.conn.commit()
+            self.recargar_catalogo()
             messagebox.showinfo("Éxito", "Producto agregado correctamente")
         
         if self.producto_id:  # Solo commit si es actualización (inserción ya hizo commit)
             self.conn.commit()
+            self.refrescar_producto_catalogo(self.producto_id)
+            self.actualizar_fila_producto(self.producto_id)
+        else:
+            self.actualizar_tabla_productos()
         
         self.limpiar_formulario_producto()
-        self.actualizar_tabla_productos()
         if hasattr(self, 'actualizar_lista_productos'):
             self.actualizar_lista_productos()
     
@@ -2775,74 +4915,141 @@ class KioscoPOS:
         if hasattr(self, 'prod_ganancia_deseada'):
             self.prod_ganancia_deseada.delete(0, tk.END)
     
+    def _crear_tabla_productos(self, frame_padre, scrollbar):
+        """Crea el Treeview de productos (columnas según la configuración de stock) y su TablaVirtual"""
+        self._stock_en_tabla = self.stock_habilitado()
+        if self._stock_en_tabla:
+            columnas = ('ID', 'Nombre', 'Precio', 'Costo', 'Stock', 'Sugerido', 'Categoría', 'Código')
+        else:
+            columnas = ('ID', 'Nombre', 'Precio', 'Costo', 'Sugerido', 'Categoría', 'Código')
+        
+        self.tabla_productos = ttk.Treeview(
+            frame_padre,
+            columns=columnas,
+            show='headings'
+        )
+        
+        titulos = {'Código': 'Código Barras'}
+        anchos = {'ID': 50, 'Nombre': 200, 'Precio': 80, 'Costo': 80, 'Stock': 60, 'Sugerido': 80, 'Categoría': 100, 'Código': 120}
+        for columna in columnas:
+            self.tabla_productos.heading(
+                columna, text=titulos.get(columna, columna),
+                command=lambda c=columna: self.ordenar_tabla_productos(c)
+            )
+            self.tabla_productos.column(columna, width=anchos[columna])
+        
+        # Colores de los estados (se configuran una sola vez)
+        self.tabla_productos.tag_configure('incompleto', background='#fef3c7', foreground='#92400e')  # Amarillo
+        self.tabla_productos.tag_configure('precio_bajo', background='#fee2e2', foreground='#dc2626')  # Rojo claro
+        self.tabla_productos.tag_configure('bajo_stock', background='#fee2e2', foreground='#dc2626')  # Rojo claro
+        
+        self.tabla_productos.pack(side='left', fill='both', expand=True)
+        self.tabla_productos.bind('<Double-Button-1>', self.editar_producto)
+        self.tabla_virtual_productos = TablaVirtual(self.tabla_productos, scrollbar, self._fila_tabla_productos)
+    
     def actualizar_tabla_productos(self):
-        """Actualiza la tabla de productos"""
-        for item in self.tabla_productos.get_children():
-            self.tabla_productos.delete(item)
+        """Actualiza la tabla de productos (solo se dibujan las filas visibles)"""
         # Soporte para filtro de búsqueda si el campo existe
+        filtro = ''
         if hasattr(self, 'entry_buscar_productos'):
-            filtro = self.entry_buscar_productos.get().lower().strip()
-            if filtro:
-                # Buscar por nombre, categoría o código de barras
-                self.cursor.execute('''
-                    SELECT * FROM productos
-                    WHERE LOWER(nombre) LIKE ? OR LOWER(categoria) LIKE ? OR LOWER(COALESCE(codigo_barras, '')) LIKE ?
-                    ORDER BY nombre
-                ''', (f'%{filtro}%', f'%{filtro}%', f'%{filtro}%'))
-            else:
-                self.cursor.execute('SELECT * FROM productos ORDER BY nombre')
+            # Busca por nombre, categoría o código de barras
+            filtro = self.entry_buscar_productos.get()
+        self._mostrar_tabla_productos(self.catalogo.buscar(filtro))
+    
+    def _mostrar_tabla_productos(self, productos):
+        """Carga en la tabla de productos el resultado de una búsqueda"""
+        self._stock_en_tabla = self.stock_habilitado()
+        self.tabla_virtual_productos.cargar(producto[0] for producto in productos)
+    
+    def _mostrar_latencia_ticket(self, venta_id, armado_ms, espera_ms):
+        """Overlay de depuración con lo que tardó el último ticket (clave debug_tickets = 1)"""
+        if not self.configuracion.booleano('debug_tickets'):
+            return
+        label = getattr(self, 'label_latencia_ticket', None)
+        if label is None or not label.winfo_exists():
+            self.label_latencia_ticket = tk.Label(
+                self.root, font=('Consolas', 9), bg='#111827', fg='#F9FAFB', padx=6, pady=2
+            )
+            # Encima del overlay de búsqueda
+            self.label_latencia_ticket.place(relx=1.0, rely=1.0, anchor='se', y=-22)
+        latencias = self.servicio_tickets.latencias_ms
+        self.label_latencia_ticket.config(
+            text=f"Ticket {venta_id}: {armado_ms:.1f} ms + {espera_ms:.1f} ms en cola "
+                 f"(mediana {statistics.median(latencias):.1f} ms en {len(latencias)})"
+        )
+        self.label_latencia_ticket.lift()
+    
+    def _mostrar_tiempos_caja(self, intervalo, modo):
+        """Overlay de depuración con el tiempo entre clientes (clave debug_caja = 1)"""
+        if not self.configuracion.booleano('debug_caja'):
+            return
+        label = getattr(self, 'label_tiempos_caja', None)
+        if label is None or not label.winfo_exists():
+            self.label_tiempos_caja = tk.Label(
+                self.root, font=('Consolas', 9), bg='#111827', fg='#F9FAFB', padx=6, pady=2
+            )
+            self.label_tiempos_caja.place(relx=0.0, rely=1.0, anchor='sw')
+        cantidad, mediana = self.medidor_escaneos.resumen(modo)
+        texto = (f"{'Venta rápida' if modo == 'rapida' else 'Normal'}: {intervalo:.2f} s entre clientes "
+                 f"(mediana {mediana:.2f} s en {cantidad} cobros)")
+        listo = self.medidor_escaneos.listo_mediana()
+        if modo == 'rapida' and listo is not None:
+            texto += f" | caja lista en {listo:.0f} ms"
+        self.label_tiempos_caja.config(text=texto)
+        self.label_tiempos_caja.lift()
+    
+    def _mostrar_latencia_busqueda(self, nombre, busqueda, ms):
+        """Overlay de depuración con la latencia de la búsqueda (clave debug_busqueda = 1)"""
+        if not self.configuracion.booleano('debug_busqueda'):
+            return
+        label = getattr(self, 'label_latencia_busqueda', None)
+        if label is None or not label.winfo_exists():
+            self.label_latencia_busqueda = tk.Label(
+                self.root, font=('Consolas', 9), bg='#111827', fg='#F9FAFB', padx=6, pady=2
+            )
+            self.label_latencia_busqueda.place(relx=1.0, rely=1.0, anchor='se')
+        # Un cuadro a 60 Hz dura ~16.7 ms: por encima de eso el tecleo se nota trabado
+        self.label_latencia_busqueda.config(
+            text=f"{nombre}: {ms:.1f} ms (máx {busqueda.maxima_ms:.1f} ms)",
+            fg='#F9FAFB' if ms <= 16.7 else '#FCA5A5'
+        )
+        self.label_latencia_busqueda.lift()
+    
+    def actualizar_fila_producto(self, producto_id):
+        """Redibuja la fila de un producto que cambió (sin recargar la tabla)"""
+        self.tabla_virtual_productos.actualizar_clave(producto_id)
+    
+    def _fila_tabla_productos(self, producto_id):
+        """Valores y tags de la fila de un producto en la tabla de productos"""
+        # Solo lectura: precio_sugerido se mantiene al día con recalcular_precios_sugeridos
+        # Estructura: id(0), nombre(1), precio(2), costo(3), stock(4), categoria(5), codigo_barras(6), precio_sugerido(7), ganancia_deseada(8)
+        producto_lista = list(self.catalogo.obtener(producto_id))
+        # Limpiar código de barras si tiene .0 al final
+        if producto_lista[6] and str(producto_lista[6]).endswith('.0'):
+            producto_lista[6] = str(producto_lista[6])[:-2]
+        producto_lista[7] = producto_lista[7] or 0
+        
+        producto = tuple(producto_lista)
+        # Determinar tags según el estado del producto
+        tags = []
+        
+        # Tag por precio/costo incompleto (prioridad alta)
+        if producto[2] == 0 or producto[3] == 0:  # precio == 0 o costo == 0
+            tags.append('incompleto')
+        # Tag por precio menor al sugerido (segunda prioridad)
+        elif producto[2] > 0 and producto[7] > 0 and producto[2] < producto[7]:
+            tags.append('precio_bajo')
+        # Tag por stock bajo (solo si stock habilitado y no está incompleto ni precio bajo)
+        elif self._stock_en_tabla and producto[4] <= 5:
+            tags.append('bajo_stock')
+        
+        if self._stock_en_tabla:
+            # Mostrar: ID(0), Nombre(1), Precio(2), Costo(3), Stock(4), Sugerido(7), Categoría(5), Código(6)
+            valores = (producto[0], producto[1], producto[2], producto[3], producto[4], producto[7], producto[5], producto[6])
         else:
-            self.cursor.execute('SELECT * FROM productos ORDER BY nombre')
-
-        productos = self.cursor.fetchall()
-        
-        for producto in productos:
-            # Limpiar código de barras si tiene .0 al final
-            producto_lista = list(producto)
-            if producto_lista[6] and str(producto_lista[6]).endswith('.0'):
-                producto_lista[6] = str(producto_lista[6])[:-2]
-            
-            # Recalcular precio_sugerido si es 0 o inválido
-            # Estructura: id(0), nombre(1), precio(2), costo(3), stock(4), categoria(5), codigo_barras(6), precio_sugerido(7), ganancia_deseada(8)
-            costo = producto_lista[3]
-            ganancia_deseada = producto_lista[8] if len(producto_lista) > 8 else None
-            precio_sugerido = self.calcular_precio_sugerido(costo, ganancia_deseada)
-            if precio_sugerido != producto_lista[7]:
-                # Actualizar en la base de datos
-                self.cursor.execute('''
-                    UPDATE productos SET precio_sugerido = ? WHERE id = ?
-                ''', (precio_sugerido, producto_lista[0]))
-                self.conn.commit()
-            producto_lista[7] = precio_sugerido
-            
-            producto = tuple(producto_lista)
-            # Determinar tags según el estado del producto
-            tags = []
-            
-            # Tag por precio/costo incompleto (prioridad alta)
-            if producto[2] == 0 or producto[3] == 0:  # precio == 0 o costo == 0
-                tags.append('incompleto')
-            # Tag por precio menor al sugerido (segunda prioridad)
-            elif producto[2] > 0 and producto[7] > 0 and producto[2] < producto[7]:
-                tags.append('precio_bajo')
-            # Tag por stock bajo (solo si stock habilitado y no está incompleto ni precio bajo)
-            elif self.stock_habilitado() and producto[4] <= 5:
-                tags.append('bajo_stock')
-            
-            if self.stock_habilitado():
-                # Mostrar: ID(0), Nombre(1), Precio(2), Costo(3), Stock(4), Sugerido(7), Categoría(5), Código(6)
-                valores = (producto[0], producto[1], producto[2], producto[3], producto[4], producto[7], producto[5], producto[6])
-            else:
-                # Omitir stock: ID(0), Nombre(1), Precio(2), Costo(3), Sugerido(7), Categoría(5), Código(6)
-                valores = (producto[0], producto[1], producto[2], producto[3], producto[7], producto[5], producto[6])
-            
-            self.tabla_productos.insert('', 'end', values=valores, tags=tuple(tags))
-        
-        # Configurar colores para los tags
-        self.tabla_productos.tag_configure('incompleto', background='#fef3c7', foreground='#92400e')  # Amarillo
-        self.tabla_productos.tag_configure('precio_bajo', background='#fee2e2', foreground='#dc2626')  # Rojo claro
-        if self.stock_habilitado():
-            self.tabla_productos.tag_configure('bajo_stock', background='#fee2e2', foreground='#dc2626')  # Rojo claro
+            # Omitir stock: ID(0), Nombre(1), Precio(2), Costo(3), Sugerido(7), Categoría(5), Código(6)
+            valores = (producto[0], producto[1], producto[2], producto[3], producto[7], producto[5], producto[6])
+        return valores, tuple(tags)
     
     def editar_producto(self, event=None):
         """Carga el producto seleccionado en el formulario para editar"""
@@ -2902,6 +5109,7 @@ class KioscoPOS:
             # Reorganizar IDs después de eliminar producto (sin commit automático)
             self.reorganizar_ids_productos(auto_commit=False)
             self.conn.commit()
+            self.recargar_catalogo()
             
             self.actualizar_tabla_productos()
             if hasattr(self, 'actualizar_lista_productos'):
@@ -2941,11 +5149,13 @@ class KioscoPOS:
         stock = producto[4]
         categoria = producto[5]
         codigo_barras = producto[6]
+        precio_sugerido = producto[7]
+        ganancia_deseada = producto[8]
 
         self.cursor.execute('''
-            INSERT INTO productos (nombre, precio, costo, stock, categoria, codigo_barras)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (nuevo_nombre, precio, costo, stock, categoria, codigo_barras))
+            INSERT INTO productos (nombre, precio, costo, stock, categoria, codigo_barras, precio_sugerido, ganancia_deseada)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (nuevo_nombre, precio, costo, stock, categoria, codigo_barras, precio_sugerido, ganancia_deseada))
 
         # Mantener consistencia con el flujo de inserción existente (reorganizar IDs si existe)
         if hasattr(self, 'reorganizar_ids_productos'):
@@ -2955,6 +5165,7 @@ class KioscoPOS:
                 pass
 
         self.conn.commit()
+        self.recargar_catalogo()
 
         messagebox.showinfo("Éxito", f"Producto duplicado como: {nuevo_nombre}")
         self.actualizar_tabla_productos()
@@ -2962,13 +5173,19 @@ class KioscoPOS:
             self.actualizar_lista_productos()
     def ordenar_tabla_productos(self, col, reverse=False):
         """Ordena la tabla de productos por la columna seleccionada"""
-        l = [(self.tabla_productos.set(k, col), k) for k in self.tabla_productos.get_children('')]
-        try:
-            l.sort(key=lambda t: float(t[0]) if col in ['ID', 'Precio', 'Costo', 'Stock'] else t[0], reverse=reverse)
-        except ValueError:
-            l.sort(key=lambda t: t[0], reverse=reverse)
-        for index, (val, k) in enumerate(l):
-            self.tabla_productos.move(k, '', index)
+        # Posición de cada columna en la fila de productos
+        indices = {'ID': 0, 'Nombre': 1, 'Precio': 2, 'Costo': 3, 'Stock': 4, 'Sugerido': 7, 'Categoría': 5, 'Código': 6}
+        indice = indices[col]
+        numerica = col in ('ID', 'Precio', 'Costo', 'Stock', 'Sugerido')
+        
+        def clave(producto_id):
+            valor = self.catalogo.obtener(producto_id)[indice]
+            if numerica:
+                return valor or 0
+            return str(valor or '')
+        
+        tabla = self.tabla_virtual_productos
+        tabla.cargar(sorted(tabla.claves, key=clave, reverse=reverse))
         # Alterna el orden para el próximo click
         self.tabla_productos.heading(col, command=lambda: self.ordenar_tabla_productos(col, not reverse))
     def exportar_productos_excel(self):
@@ -3018,105 +5235,49 @@ class KioscoPOS:
         )
         if not file_path:
             return
+        
+        actualizar = messagebox.askyesnocancel(
+            "Modo de importación",
+            "¿Actualizar los productos que ya existen?\n\n"
+            "• Sí: busca cada fila por código de barras (o por nombre) y actualiza precio, costo, "
+            "stock y categoría; los que no existen se agregan.\n"
+            "• No: agrega todas las filas como productos nuevos."
+        )
+        if actualizar is None:
+            return
     
         try:
-            if file_path.endswith('.xlsx'):
-                # Leer con tipos específicos para códigos de barras como texto
-                df = pd.read_excel(file_path, dtype={'Código Barras': str})
+            importador = ImportadorProductos(self.conn, self.stock_habilitado())
+            inicio = time.perf_counter()
+            if actualizar:
+                resumen, errores_detalle = importador.importar_actualizando(file_path)
+                productos_importados = resumen['nuevo'] + resumen['cambiado']
             else:
-                # Para CSV también especificar tipos
-                df = pd.read_csv(file_path, dtype={'Código Barras': str})
-    
-            # Mostrar las columnas disponibles para debug
-            print(f"Columnas encontradas: {list(df.columns)}")
-            
-            productos_importados = 0
-            productos_saltados = 0
-            errores_detalle = []
+                productos_importados, errores_detalle = importador.importar(file_path)
+            productos_saltados = len(errores_detalle)
+            # Los productos nuevos y los costos cambiados necesitan su precio sugerido
+            self.recalcular_precios_sugeridos()
             
-            # Verificar configuración de stock
-            stock_habilitado = self.stock_habilitado()
+            # Mostrar las columnas disponibles para debug
+            print(f"Columnas encontradas: {importador.columnas_encontradas}")
+            print(f"✅ {productos_importados} productos importados en {time.perf_counter() - inicio:.2f} s")
+            for error in errores_detalle:
+                print(f"⚠️ {error}")
             
-            # Espera columnas: Nombre, Precio, Costo, Stock, Categoría, Código Barras
-            for index, row in df.iterrows():
-                try:
-                    nombre = row.get('Nombre')
-                    precio = row.get('Precio')
-                    costo = row.get('Costo')
-                    stock = row.get('Stock')
-                    categoria = row.get('Categoría', 'Otros')
-                    codigo_barras = row.get('Código Barras', '')
-                    
-                    # Validar que al menos tenga nombre
-                    if pd.isnull(nombre) or str(nombre).strip() == '':
-                        productos_saltados += 1
-                        errores_detalle.append(f"Fila {index + 2}: Nombre es obligatorio")
-                        continue
-                    
-                    # Manejar stock según configuración
-                    if stock_habilitado:
-                        if pd.isnull(stock):
-                            productos_saltados += 1
-                            errores_detalle.append(f"Fila {index + 2}: Stock requerido cuando está habilitado")
-                            continue
-                        stock = int(float(stock))
-                    else:
-                        stock = 0  # Valor por defecto cuando stock está deshabilitado
-                    
-                    # Convertir tipos de datos
-                    nombre = str(nombre).strip()
-                    
-                    # Manejar precio y costo - permitir valores nulos/cero
-                    if pd.isnull(precio) or precio == '':
-                        precio = 0.0
-                    else:
-                        precio = float(precio)
-                    
-                    if pd.isnull(costo) or costo == '':
-                        costo = 0.0
-                    else:
-                        costo = float(costo)
-                    
-                    categoria = str(categoria) if not pd.isnull(categoria) else 'Otros'
-                    
-                    # Manejar código de barras - remover .0 si existe
-                    if pd.isnull(codigo_barras) or codigo_barras == '':
-                        codigo_barras = ''
-                    else:
-                        codigo_barras = str(codigo_barras)
-                        # Si termina en .0, removerlo (problema común con Excel/pandas)
-                        if codigo_barras.endswith('.0'):
-                            codigo_barras = codigo_barras[:-2]
-                    
-                    # Insertar en base de datos
-                    self.cursor.execute('''
-                        INSERT INTO productos (nombre, precio, costo, stock, categoria, codigo_barras)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (nombre, precio, costo, stock, categoria, codigo_barras))
-                    
-                    productos_importados += 1
-                    
-                except sqlite3.IntegrityError as e:
-                    productos_saltados += 1
-                    errores_detalle.append(f"Fila {index + 2}: Producto duplicado o error de integridad")
-                    continue
-                except ValueError as e:
-                    productos_saltados += 1
-                    errores_detalle.append(f"Fila {index + 2}: Error de formato de datos - {str(e)}")
-                    continue
-                except Exception as e:
-                    productos_saltados += 1
-                    errores_detalle.append(f"Fila {index + 2}: Error inesperado - {str(e)}")
-                    continue
-    
-            self.conn.commit()
+            self.recargar_catalogo()
             self.actualizar_tabla_productos()
             if hasattr(self, 'actualizar_lista_productos'):
                 self.actualizar_lista_productos()
             
             # Mensaje detallado de resultado
             mensaje = f"Importación completada:\n\n"
-            mensaje += f"✅ Productos importados: {productos_importados}\n"
+            if actualizar:
+                mensaje += f"🆕 Nuevos: {resumen['nuevo']}\n"
+                mensaje += f"✏️ Actualizados: {resumen['cambiado']}\n"
+                mensaje += f"➖ Sin cambios: {resumen['sin_cambios']}\n"
+                mensaje += f"⚠️ En conflicto (no modificados): {resumen['conflicto']}\n"
+            else:
+                mensaje += f"✅ Productos importados: {productos_importados}\n"
             if productos_saltados > 0:
                 mensaje += f"⚠️ Productos saltados: {productos_saltados}\n\n"
                 if errores_detalle:
@@ -3127,9 +5288,7 @@ class KioscoPOS:
                     if len(errores_detalle) > 5:
                         mensaje += f"... y {len(errores_detalle) - 5} errores más"
             
-            if productos_importados > 0:
-                # Reorganizar IDs después de la importación
-                self.reorganizar_ids_productos()
+            if productos_importados > 0 or (actualizar and resumen['sin_cambios'] > 0):
                 messagebox.showinfo("Importación Completada", mensaje)
             else:
                 messagebox.showwarning("Sin Productos Importados", mensaje)
@@ -3146,6 +5305,7 @@ class KioscoPOS:
             
             if not productos:
                 # Si no hay productos, asegurar que la secuencia esté en 0
+                self._renumerar_items_vendidos({}, 0)
                 self.cursor.execute('''
                     INSERT OR REPLACE INTO sqlite_sequence (name, seq) VALUES ('productos', 0)
                 ''')
@@ -3159,6 +5319,7 @@ class KioscoPOS:
             
             if ids_actuales == ids_esperados:
                 # Los IDs ya están correctos, solo actualizar secuencia
+                self._renumerar_items_vendidos({}, len(productos))
                 self.cursor.execute(f'''
                     INSERT OR REPLACE INTO sqlite_sequence (name, seq) VALUES ('productos', {len(productos)})
                 ''')
@@ -3172,24 +5333,29 @@ class KioscoPOS:
                 SELECT * FROM productos WHERE 1=0
             ''')
             
-            # Insertar productos con nuevos IDs secuenciales
-            for nuevo_id, producto in enumerate(productos, 1):
-                self.cursor.execute('''
-                    INSERT INTO productos_temp (id, nombre, precio, costo, stock, categoria, codigo_barras)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (nuevo_id, producto[1], producto[2], producto[3], producto[4], producto[5], producto[6]))
+            # Insertar productos con nuevos IDs secuenciales (conservando precio sugerido y ganancia deseada)
+            self.cursor.executemany('''
+                INSERT INTO productos_temp (id, nombre, precio, costo, stock, categoria, codigo_barras, precio_sugerido, ganancia_deseada)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(nuevo_id,) + tuple(producto[1:9]) for nuevo_id, producto in enumerate(productos, 1)])
             
             # Reemplazar tabla original
             self.cursor.execute('DELETE FROM productos')
             self.cursor.execute('''
-                INSERT INTO productos (id, nombre, precio, costo, stock, categoria, codigo_barras)
-                SELECT id, nombre, precio, costo, stock, categoria, codigo_barras 
+                INSERT INTO productos (id, nombre, precio, costo, stock, categoria, codigo_barras, precio_sugerido, ganancia_deseada)
+                SELECT id, nombre, precio, costo, stock, categoria, codigo_barras, precio_sugerido, ganancia_deseada
                 FROM productos_temp
             ''')
             
             # Limpiar tabla temporal
             self.cursor.execute('DROP TABLE productos_temp')
             
+            # Los items vendidos guardan el id del producto: se renumeran igual
+            sin_cambios = next(i for i, (actual, esperado) in enumerate(zip(ids_actuales, ids_esperados)) if actual != esperado)
+            self._renumerar_items_vendidos(
+                {actual: nuevo for nuevo, actual in enumerate(ids_actuales, 1) if nuevo > sin_cambios}, sin_cambios
+            )
+            
             # Actualizar el contador autoincrement
             self.cursor.execute(f'''
                 INSERT OR REPLACE INTO sqlite_sequence (name, seq) VALUES ('productos', {len(productos)})
@@ -3206,6 +5372,23 @@ class KioscoPOS:
             if auto_commit:
                 self.conn.rollback()
     
+    def _renumerar_items_vendidos(self, nuevos_ids, sin_cambios):
+        """Aplica a items_venta.producto_id la renumeración {id viejo: id nuevo} de productos.
+        
+        Los ids hasta `sin_cambios` no se tocan. Los items con un id mayor que no está en el
+        mapa son de productos borrados: quedan sin producto_id (conservan nombre, código y
+        categoría) para no quedar asociados al producto que reciba ese id.
+        """
+        self.cursor.execute('CREATE TEMP TABLE ids_productos (viejo INTEGER PRIMARY KEY, nuevo INTEGER NOT NULL)')
+        self.cursor.executemany('INSERT INTO ids_productos (viejo, nuevo) VALUES (?, ?)', nuevos_ids.items())
+        # Usa idx_items_venta_producto: solo recorre los items con ids que cambian
+        self.cursor.execute('''
+            UPDATE items_venta
+            SET producto_id = (SELECT nuevo FROM ids_productos WHERE viejo = items_venta.producto_id)
+            WHERE producto_id > ?
+        ''', (sin_cambios,))
+        self.cursor.execute('DROP TABLE ids_productos')
+    
     def limpiar_codigos_barras(self):
         """Limpia los códigos de barras que terminan en .0 en la base de datos"""
         try:
@@ -3305,11 +5488,13 @@ class KioscoPOS:
             self.cursor.execute("DELETE FROM productos")
             productos_eliminados = self.cursor.rowcount
             
-            # Reiniciar el contador de autoincrement
+            # Reiniciar el contador de autoincrement (los ids se van a volver a usar)
             self.cursor.execute("DELETE FROM sqlite_sequence WHERE name='productos'")
+            self._renumerar_items_vendidos({}, 0)
             
             # Confirmar cambios
             self.conn.commit()
+            self.recargar_catalogo()
             
             # Actualizar interfaces
             self.actualizar_tabla_productos()
@@ -3335,30 +5520,10 @@ class KioscoPOS:
     
     def actualizar_estadisticas(self):
         """Actualiza las estadísticas de ventas"""
-        hoy = datetime.now().strftime('%Y-%m-%d')
-        mes_actual = datetime.now().strftime('%Y-%m')
-        anio_actual = datetime.now().strftime('%Y')
-        
-        # Ventas de hoy
-        self.cursor.execute('''
-            SELECT COUNT(*), COALESCE(SUM(total), 0), COALESCE(SUM(total - costo_total), 0)
-            FROM ventas WHERE DATE(fecha) = ?
-        ''', (hoy,))
-        ventas_hoy = self.cursor.fetchone()
-        
-        # Ventas del mes
-        self.cursor.execute('''
-            SELECT COUNT(*), COALESCE(SUM(total), 0), COALESCE(SUM(total - costo_total), 0)
-            FROM ventas WHERE strftime('%Y-%m', fecha) = ?
-        ''', (mes_actual,))
-        ventas_mes = self.cursor.fetchone()
-        
-        # Ventas del año
-        self.cursor.execute('''
-            SELECT COUNT(*), COALESCE(SUM(total), 0), COALESCE(SUM(total - costo_total), 0)
-            FROM ventas WHERE strftime('%Y', fecha) = ?
-        ''', (anio_actual,))
-        ventas_anio = self.cursor.fetchone()
+        # Leer del resumen diario: unas pocas filas por día en lugar de toda la tabla ventas
+        ventas_hoy = self.resumen_ventas.totales(*self._rango_fechas(datetime.now().strftime('%Y-%m-%d')))
+        ventas_mes = self.resumen_ventas.totales(*self._rango_fechas(datetime.now().strftime('%Y-%m')))
+        ventas_anio = self.resumen_ventas.totales(*self._rango_fechas(datetime.now().strftime('%Y')))
         
         # Actualizar labels
         self.label_hoy_total.config(text=f"${ventas_hoy[1]:.2f}")
@@ -3382,12 +5547,17 @@ class KioscoPOS:
         
         fecha = self.entry_fecha_reporte.get()
         turno = self.combo_turno_reporte.get()
-        query = 'SELECT * FROM ventas'
+        query = 'SELECT id, fecha, usuario, metodo_pago, total_centavos, costo_centavos, turno FROM ventas'
         params = []
         where = []
         if fecha:
-            where.append('DATE(fecha) = ?')
-            params.append(fecha)
+            try:
+                rango = self._rango_fechas(fecha)
+            except ValueError:
+                # Fecha inválida: no hay ventas que mostrar
+                return
+            where.append('fecha >= ? AND fecha < ?')
+            params.extend(rango)
         if turno:
             where.append('turno = ?')
             params.append(turno)
@@ -3397,242 +5567,302 @@ class KioscoPOS:
         self.cursor.execute(query, params)
         ventas = self.cursor.fetchall()
         for venta in ventas:
-            ganancia = venta[4] - venta[5]
-            valores = (venta[0], venta[1], venta[2], venta[3], f'${venta[4]:.2f}', f'${ganancia:.2f}', venta[6])
+            ganancia_centavos = venta[4] - venta[5]
+            valores = (venta[0], venta[1], venta[2], venta[3], f'${venta[4] / 100:.2f}',
+                       f'${ganancia_centavos / 100:.2f}', venta[6])
             self.tabla_ventas.insert('', 'end', values=valores)
     
     def exportar_todo_excel(self):
         """Exporta todos los datos a Excel con formato profesional"""
-        try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx")],
-                initialfile=f"reporte_completo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx")],
+            initialfile=f"reporte_completo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        )
+        if filename:
+            self._exportar_en_segundo_plano(
+                "Exportando reporte completo", filename, self._generar_reporte_completo,
+                "Reporte completo exportado con formato mejorado a:"
             )
+    
+    def _generar_reporte_completo(self, trabajo):
+        """Escribe el reporte completo (corre en el hilo de exportación)"""
+        cursor = trabajo.cursor
+        resumen = ResumenVentas(cursor)
+        libro = LibroExcelStreaming()
+        
+        # Productos (el margen se calcula en la consulta para volcar el cursor directo a la hoja)
+        trabajo.avance(5, "Exportando productos...")
+        cursor.execute('''
+            SELECT id, nombre, precio, costo, stock, categoria, codigo_barras,
+                   ROUND((precio - costo) * 100.0 / NULLIF(precio, 0), 1)
+            FROM productos ORDER BY nombre
+        ''')
+        libro.agregar_hoja(
+            'Productos', 'Listado Completo de Productos',
+            ['ID', 'Nombre', 'Precio', 'Costo', 'Stock', 'Categoría', 'Código Barras', 'Margen (%)'],
+            cursor, trabajo
+        )
+        
+        # Ventas con ganancia calculada
+        trabajo.avance(20, "Exportando ventas...")
+        cursor.execute('''
+            SELECT id, fecha, usuario, metodo_pago, total_centavos / 100.0, costo_centavos / 100.0, turno,
+                   (total_centavos - costo_centavos) / 100.0,
+                   ROUND((total_centavos - costo_centavos) * 100.0 / NULLIF(total_centavos, 0), 1)
+            FROM ventas ORDER BY fecha DESC
+        ''')
+        libro.agregar_hoja(
+            'Todas las Ventas', 'Historial Completo de Ventas',
+            ['ID', 'Fecha', 'Usuario', 'Método Pago', 'Total', 'Costo Total', 'Turno', 'Ganancia', 'Margen (%)'],
+            cursor, trabajo
+        )
+        
+        # Items de ventas con más detalle
+        trabajo.avance(45, "Exportando detalle de items...")
+        cursor.execute('''
+            SELECT iv.id, iv.venta_id, iv.producto_nombre, iv.cantidad,
+                   iv.precio_centavos / 100.0, iv.costo_centavos / 100.0,
+                   v.fecha, v.usuario,
+                   iv.cantidad * iv.precio_centavos / 100.0,
+                   (iv.precio_centavos - iv.costo_centavos) * iv.cantidad / 100.0
+            FROM items_venta iv 
+            JOIN ventas v ON iv.venta_id = v.id 
+            ORDER BY v.fecha DESC
+        ''')
+        libro.agregar_hoja(
+            'Detalle Completo', 'Detalle Completo de Productos Vendidos',
+            ['ID Item', 'ID Venta', 'Producto', 'Cantidad', 'Precio Unit.', 'Costo Unit.', 'Fecha Venta', 'Usuario',
+             'Subtotal', 'Ganancia Item'],
+            cursor, trabajo
+        )
+        
+        # Resumen estadístico mejorado
+        trabajo.avance(75, "Calculando resumen estadístico...")
+        resumen_hoy = resumen.totales(*self._rango_fechas(datetime.now().strftime('%Y-%m-%d')))
+        resumen_mes = resumen.totales(*self._rango_fechas(datetime.now().strftime('%Y-%m')))
+        resumen_anio = resumen.totales(*self._rango_fechas(datetime.now().strftime('%Y')))
+        
+        # Estadísticas adicionales
+        cursor.execute('SELECT COUNT(*) FROM productos')
+        total_productos = cursor.fetchone()[0]
+        
+        cursor.execute('SELECT SUM(stock * costo) FROM productos')
+        valor_inventario = cursor.fetchone()[0] or 0
+        
+        libro.agregar_hoja(
+            'Resumen Estadístico', 'Resumen Estadístico General',
+            ['Período', 'Cantidad', 'Total Vendido ($)', 'Ganancia ($)'],
+            [
+                ('Hoy', resumen_hoy[0] or 0, resumen_hoy[1] or 0, resumen_hoy[2] or 0),
+                ('Este Mes', resumen_mes[0] or 0, resumen_mes[1] or 0, resumen_mes[2] or 0),
+                ('Este Año', resumen_anio[0] or 0, resumen_anio[1] or 0, resumen_anio[2] or 0),
+                ('Productos Registrados', total_productos, '', ''),
+                ('Valor Inventario', '', f"${valor_inventario:,.2f}", ''),
+            ]
+        )
+        
+        # Historial de Cajas (nueva hoja)
+        trabajo.avance(85, "Exportando historial de cajas...")
+        cursor.execute('''
+            SELECT id, usuario, rol, fecha_apertura, fecha_cierre, fondo_inicial, total_ventas_por_metodo, faltante_sobrante, estado, turno
+            FROM cajas ORDER BY fecha_apertura DESC
+        ''')
+        libro.agregar_hoja_registros('Historial de Cajas', 'Historial Completo de Cajas', self._registros_cajas(cursor.fetchall()))
+        
+        trabajo.avance(95, "Guardando archivo...")
+        libro.guardar(trabajo.archivo)
+    
+    def _registros_cajas(self, cajas):
+        """Filas de la hoja 'Historial de Cajas' (fondos y recaudación por método)"""
+        cajas_data = []
+        for caja in cajas:
+            caja_id, usuario, rol, fecha_ap, fecha_ci, fondo_ini, totales_metodos, falt_sobr, estado, turno = caja
             
-            if filename:
-                with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                    # Productos
-                    self.cursor.execute('SELECT id, nombre, precio, costo, stock, categoria, codigo_barras FROM productos ORDER BY nombre')
-                    productos = self.cursor.fetchall()
-                    df_productos = pd.DataFrame(productos, columns=['ID', 'Nombre', 'Precio', 'Costo', 'Stock', 'Categoría', 'Código Barras'])
-                    df_productos['Margen (%)'] = ((df_productos['Precio'] - df_productos['Costo']) / df_productos['Precio'] * 100).round(1)
-                    df_productos.to_excel(writer, sheet_name='Productos', index=False)
-                    
-                    # Formatear hoja productos
-                    ws_productos = writer.sheets['Productos']
-                    self._formatear_hoja_excel(ws_productos, df_productos, 'Listado Completo de Productos')
-                    
-                    # Ventas con ganancia calculada
-                    self.cursor.execute('SELECT * FROM ventas ORDER BY fecha DESC')
-                    ventas = self.cursor.fetchall()
-                    df_ventas = pd.DataFrame(ventas, columns=['ID', 'Fecha', 'Usuario', 'Método Pago', 'Total', 'Costo Total', 'Turno'])
-                    df_ventas['Ganancia'] = df_ventas['Total'] - df_ventas['Costo Total']
-                    df_ventas['Margen (%)'] = ((df_ventas['Total'] - df_ventas['Costo Total']) / df_ventas['Total'] * 100).round(1)
-                    df_ventas.to_excel(writer, sheet_name='Todas las Ventas', index=False)
-                    
-                    # Formatear hoja ventas
-                    ws_ventas = writer.sheets['Todas las Ventas']
-                    self._formatear_hoja_excel(ws_ventas, df_ventas, 'Historial Completo de Ventas')
-                    
-                    # Items de ventas con más detalle
-                    self.cursor.execute('''
-                        SELECT iv.*, v.fecha, v.usuario 
-                        FROM items_venta iv 
-                        JOIN ventas v ON iv.venta_id = v.id 
-                        ORDER BY v.fecha DESC
-                    ''')
-                    items = self.cursor.fetchall()
-                    df_items = pd.DataFrame(items, columns=[
-                        'ID Item', 'ID Venta', 'Producto', 'Cantidad', 'Precio Unit.', 'Costo Unit.', 'Fecha Venta', 'Usuario'
-                    ])
-                    df_items['Subtotal'] = df_items['Cantidad'] * df_items['Precio Unit.']
-                    df_items['Ganancia Item'] = (df_items['Precio Unit.'] - df_items['Costo Unit.']) * df_items['Cantidad']
-                    df_items.to_excel(writer, sheet_name='Detalle Completo', index=False)
-                    
-                    # Formatear hoja items
-                    ws_items = writer.sheets['Detalle Completo']
-                    self._formatear_hoja_excel(ws_items, df_items, 'Detalle Completo de Productos Vendidos')
-                    
-                    # Resumen estadístico mejorado
-                    hoy = datetime.now().strftime('%Y-%m-%d')
-                    mes_actual = datetime.now().strftime('%Y-%m')
-                    anio_actual = datetime.now().strftime('%Y')
-                    
-                    self.cursor.execute('SELECT COUNT(*), SUM(total), SUM(total - costo_total) FROM ventas WHERE DATE(fecha) = ?', (hoy,))
-                    resumen_hoy = self.cursor.fetchone()
-                    
-                    self.cursor.execute('SELECT COUNT(*), SUM(total), SUM(total - costo_total) FROM ventas WHERE strftime("%Y-%m", fecha) = ?', (mes_actual,))
-                    resumen_mes = self.cursor.fetchone()
-                    
-                    self.cursor.execute('SELECT COUNT(*), SUM(total), SUM(total - costo_total) FROM ventas WHERE strftime("%Y", fecha) = ?', (anio_actual,))
-                    resumen_anio = self.cursor.fetchone()
-                    
-                    # Estadísticas adicionales
-                    self.cursor.execute('SELECT COUNT(*) FROM productos')
-                    total_productos = self.cursor.fetchone()[0]
-                    
-                    self.cursor.execute('SELECT SUM(stock * costo) FROM productos')
-                    valor_inventario = self.cursor.fetchone()[0] or 0
-                    
-                    df_resumen = pd.DataFrame({
-                        'Período': ['Hoy', 'Este Mes', 'Este Año', 'Productos Registrados', 'Valor Inventario'],
-                        'Cantidad': [resumen_hoy[0] or 0, resumen_mes[0] or 0, resumen_anio[0] or 0, total_productos, ''],
-                        'Total Vendido ($)': [resumen_hoy[1] or 0, resumen_mes[1] or 0, resumen_anio[1] or 0, '', f"${valor_inventario:,.2f}"],
-                        'Ganancia ($)': [resumen_hoy[2] or 0, resumen_mes[2] or 0, resumen_anio[2] or 0, '', '']
-                    })
-                    df_resumen.to_excel(writer, sheet_name='Resumen Estadístico', index=False)
-                    
-                    # Formatear hoja resumen
-                    ws_resumen = writer.sheets['Resumen Estadístico']
-                    self._formatear_hoja_excel(ws_resumen, df_resumen, 'Resumen Estadístico General')
-                    
-                    # Historial de Cajas (nueva hoja)
-                    self.cursor.execute('''
-                        SELECT id, usuario, rol, fecha_apertura, fecha_cierre, fondo_inicial, total_ventas_por_metodo, faltante_sobrante, estado, turno
-                        FROM cajas ORDER BY fecha_apertura DESC
-                    ''')
-                    cajas = self.cursor.fetchall()
-                    
-                    if cajas:
-                        cajas_data = []
-                        for caja in cajas:
-                            caja_id, usuario, rol, fecha_ap, fecha_ci, fondo_ini, totales_metodos, falt_sobr, estado, turno = caja
-                            
-                            # Parsear JSON
-                            fondo_inicial = json.loads(fondo_ini) if fondo_ini else {}
-                            totales = json.loads(totales_metodos) if totales_metodos else {}
-                            
-                            cajas_data.append({
-                                'ID': caja_id,
-                                'Usuario': usuario,
-                                'Rol': rol,
-                                'Turno': turno or '',
-                                'Fecha Apertura': fecha_ap,
-                                'Fecha Cierre': fecha_ci or 'Abierta',
-                                'Fondo Inicial Efectivo': fondo_inicial.get('Efectivo', 0),
-                                'Fondo Inicial Transferencia': fondo_inicial.get('Transferencia', 0),
-                                'Fondo Inicial Débito': fondo_inicial.get('Débito', 0),
-                                'Fondo Inicial Crédito': fondo_inicial.get('Crédito', 0),
-                                'Recaudado Efectivo': totales.get('Efectivo', 0),
-                                'Recaudado Transferencia': totales.get('Transferencia', 0),
-                                'Recaudado Débito': totales.get('Débito', 0),
-                                'Recaudado Crédito': totales.get('Crédito', 0),
-                                'Faltante/Sobrante': falt_sobr or 0,
-                                'Estado': estado
-                            })
-                        
-                        df_cajas = pd.DataFrame(cajas_data)
-                        df_cajas.to_excel(writer, sheet_name='Historial de Cajas', index=False)
-                        
-                        # Formatear hoja cajas
-                        ws_cajas = writer.sheets['Historial de Cajas']
-                        self._formatear_hoja_excel(ws_cajas, df_cajas, 'Historial Completo de Cajas')
+            # Parsear JSON
+            fondo_inicial = json.loads(fondo_ini) if fondo_ini else {}
+            totales = json.loads(totales_metodos) if totales_metodos else {}
             
-            messagebox.showinfo("Éxito", f"Reporte completo exportado con formato mejorado a:\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al exportar: {str(e)}")
+            cajas_data.append({
+                'ID': caja_id,
+                'Usuario': usuario,
+                'Rol': rol,
+                'Turno': turno or '',
+                'Fecha Apertura': fecha_ap,
+                'Fecha Cierre': fecha_ci or 'Abierta',
+                'Fondo Inicial Efectivo': fondo_inicial.get('Efectivo', 0),
+                'Fondo Inicial Transferencia': fondo_inicial.get('Transferencia', 0),
+                'Fondo Inicial Débito': fondo_inicial.get('Débito', 0),
+                'Fondo Inicial Crédito': fondo_inicial.get('Crédito', 0),
+                'Recaudado Efectivo': totales.get('Efectivo', 0),
+                'Recaudado Transferencia': totales.get('Transferencia', 0),
+                'Recaudado Débito': totales.get('Débito', 0),
+                'Recaudado Crédito': totales.get('Crédito', 0),
+                'Faltante/Sobrante': falt_sobr or 0,
+                'Estado': estado
+            })
+        return cajas_data
+    
     def exportar_ventas_dia_excel(self):
         """Exporta las ventas de un día específico a Excel con formato mejorado y detalles completos"""
         fecha = self.entry_fecha_reporte.get()
         if not fecha:
             messagebox.showwarning("Fecha requerida", "Por favor ingresa una fecha en formato YYYY-MM-DD")
             return
-
         try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx")],
-                initialfile=f"ventas_detalladas_{fecha.replace('-', '')}.xlsx"
+            rango_dia = self._rango_fechas(fecha)
+        except ValueError:
+            messagebox.showwarning("Fecha inválida", "Por favor ingresa una fecha válida en formato YYYY-MM-DD")
+            return
+
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel files", "*.xlsx")],
+            initialfile=f"ventas_detalladas_{fecha.replace('-', '')}.xlsx"
+        )
+        if filename:
+            self._exportar_en_segundo_plano(
+                f"Exportando ventas del {fecha}", filename,
+                lambda trabajo: self._generar_reporte_dia(trabajo, fecha, rango_dia),
+                f"Reporte detallado del {fecha} exportado a:"
             )
-            if filename:
-                from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-                from openpyxl.utils.dataframe import dataframe_to_rows
-                
-                # Consulta mejorada con detalles completos de ventas
-                self.cursor.execute('''
-                    SELECT 
-                        v.id as venta_id,
-                        v.fecha,
-                        v.usuario,
-                        v.metodo_pago,
-                        v.total as total_venta,
-                        v.costo_total as costo_venta,
-                        (v.total - v.costo_total) as ganancia_venta,
-                        v.turno
-                    FROM ventas v 
-                    WHERE DATE(v.fecha) = ?
-                    ORDER BY v.fecha DESC
-                ''', (fecha,))
-                ventas = self.cursor.fetchall()
-                
-                # Consulta detallada de productos vendidos
-                self.cursor.execute('''
-                    SELECT 
-                        v.id as venta_id,
-                        v.fecha,
-                        v.usuario,
-                        v.turno,
-                        iv.producto_nombre as producto,
-                        iv.cantidad,
-                        iv.precio_unitario,
-                        iv.costo_unitario,
-                        (iv.cantidad * iv.precio_unitario) as subtotal,
-                        (iv.cantidad * iv.costo_unitario) as costo_subtotal,
-                        ((iv.cantidad * iv.precio_unitario) - (iv.cantidad * iv.costo_unitario)) as ganancia_producto
-                    FROM ventas v
-                    JOIN items_venta iv ON v.id = iv.venta_id
-                    WHERE DATE(v.fecha) = ?
-                    ORDER BY v.fecha DESC, iv.producto_nombre
-                ''', (fecha,))
-                detalle_productos = self.cursor.fetchall()
-
-                # Crear workbook con formato
-                with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                    
-                    # Hoja 1: Resumen de Ventas
-                    if ventas:
-                        df_ventas = pd.DataFrame(ventas, columns=[
-                            'ID Venta', 'Fecha y Hora', 'Usuario', 'Método Pago', 
-                            'Total Venta', 'Costo Venta', 'Ganancia Venta', 'Turno'
-                        ])
-                        df_ventas.to_excel(writer, sheet_name='Resumen Ventas', index=False)
-                        
-                        # Formatear hoja de ventas
-                        ws_ventas = writer.sheets['Resumen Ventas']
-                        self._formatear_hoja_excel(ws_ventas, df_ventas, 'Resumen de Ventas del ' + fecha)
-                    
-                    # Hoja 2: Detalle de Productos Vendidos
-                    if detalle_productos:
-                        df_detalle = pd.DataFrame(detalle_productos, columns=[
-                            'ID Venta', 'Fecha y Hora', 'Usuario', 'Turno', 'Producto',
-                            'Cantidad', 'Precio Unit.', 'Costo Unit.', 'Subtotal', 
-                            'Costo Subtotal', 'Ganancia por Producto'
-                        ])
-                        df_detalle.to_excel(writer, sheet_name='Detalle Productos', index=False)
-                        
-                        # Formatear hoja de detalle
-                        ws_detalle = writer.sheets['Detalle Productos']
-                        self._formatear_hoja_excel(ws_detalle, df_detalle, 'Detalle de Productos Vendidos - ' + fecha)
-                    
-                    # Hoja 3: Análisis y Totales
-                    totales_data = self._calcular_totales_dia(fecha, ventas, detalle_productos)
-                    df_totales = pd.DataFrame(totales_data)
-                    df_totales.to_excel(writer, sheet_name='Análisis y Totales', index=False)
-                    
-                    # Formatear hoja de totales
-                    ws_totales = writer.sheets['Análisis y Totales']
-                    self._formatear_hoja_totales(ws_totales, df_totales, 'Análisis Financiero - ' + fecha)
+    
+    def _generar_reporte_dia(self, trabajo, fecha, rango_dia):
+        """Escribe el reporte de un día (corre en el hilo de exportación)"""
+        cursor = trabajo.cursor
+        
+        # Consulta mejorada con detalles completos de ventas
+        trabajo.avance(5, "Consultando ventas del día...")
+        cursor.execute('''
+            SELECT 
+                v.id as venta_id,
+                v.fecha,
+                v.usuario,
+                v.metodo_pago,
+                v.total_centavos,
+                v.costo_centavos,
+                v.turno
+            FROM ventas v 
+            WHERE v.fecha >= ? AND v.fecha < ?
+            ORDER BY v.fecha DESC
+        ''', rango_dia)
+        ventas = cursor.fetchall()
+        
+        # Consulta detallada de productos vendidos
+        cursor.execute('''
+            SELECT 
+                v.id as venta_id,
+                v.fecha,
+                v.usuario,
+                v.turno,
+                iv.producto_nombre as producto,
+                iv.cantidad,
+                iv.precio_centavos / 100.0 as precio_unitario,
+                iv.costo_centavos / 100.0 as costo_unitario,
+                iv.cantidad * iv.precio_centavos / 100.0 as subtotal,
+                iv.cantidad * iv.costo_centavos / 100.0 as costo_subtotal,
+                iv.cantidad * (iv.precio_centavos - iv.costo_centavos) / 100.0 as ganancia_producto
+            FROM ventas v
+            JOIN items_venta iv ON v.id = iv.venta_id
+            WHERE v.fecha >= ? AND v.fecha < ?
+            ORDER BY v.fecha DESC, iv.producto_nombre
+        ''', rango_dia)
+        detalle_productos = cursor.fetchall()
 
-                messagebox.showinfo("Éxito", f"Reporte detallado del {fecha} exportado a:\n{filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al exportar: {str(e)}")
+        libro = LibroExcelStreaming()
+        
+        # Hoja 1: Resumen de Ventas
+        trabajo.avance(30, "Exportando resumen de ventas...")
+        if ventas:
+            libro.agregar_hoja(
+                'Resumen Ventas', 'Resumen de Ventas del ' + fecha,
+                ['ID Venta', 'Fecha y Hora', 'Usuario', 'Método Pago', 'Total Venta', 'Costo Venta', 'Ganancia Venta', 'Turno'],
+                self._filas_resumen_ventas(ventas), trabajo
+            )
+        
+        # Hoja 2: Detalle de Productos Vendidos
+        trabajo.avance(50, "Exportando detalle de productos...")
+        if detalle_productos:
+            libro.agregar_hoja(
+                'Detalle Productos', 'Detalle de Productos Vendidos - ' + fecha,
+                ['ID Venta', 'Fecha y Hora', 'Usuario', 'Turno', 'Producto', 'Cantidad', 'Precio Unit.', 'Costo Unit.',
+                 'Subtotal', 'Costo Subtotal', 'Ganancia por Producto'],
+                detalle_productos, trabajo
+            )
+        
+        # Hoja 3: Análisis y Totales
+        trabajo.avance(85, "Calculando totales...")
+        libro.agregar_hoja_registros(
+            'Análisis y Totales', 'Análisis Financiero - ' + fecha,
+            self._calcular_totales_dia(fecha, ventas, self._ventas_por_producto(cursor, rango_dia)), analisis=True
+        )
+        
+        trabajo.avance(95, "Guardando archivo...")
+        libro.guardar(trabajo.archivo)
+    
+    def _exportar_en_segundo_plano(self, titulo, filename, funcion, mensaje_exito):
+        """Corre una exportación en otro hilo con barra de progreso y botón Cancelar.
+        
+        La ventana no es modal: se puede seguir vendiendo mientras se genera el archivo.
+        """
+        if self.exportacion_activa and self.exportacion_activa.en_curso():
+            messagebox.showwarning("Exportación en curso", "Espera a que termine la exportación actual o cancélala.")
+            return
+        
+        trabajo = TrabajoExportacion(self.ruta_bd, filename, funcion)
+        self.exportacion_activa = trabajo
+        
+        ventana = tk.Toplevel(self.root)
+        ventana.title(titulo)
+        ventana.geometry("420x150")
+        ventana.configure(bg='#FAF2E3')
+        ventana.resizable(False, False)
+        ventana.transient(self.root)
+        
+        etiqueta = tk.Label(ventana, text="Preparando exportación...", font=('Arial', 11), bg='#FAF2E3')
+        etiqueta.pack(pady=(20, 10))
+        barra = ttk.Progressbar(ventana, length=360, maximum=100, mode='determinate')
+        barra.pack(pady=(0, 15))
+        
+        def cancelar():
+            trabajo.cancelar()
+            boton_cancelar.config(state='disabled', text="Cancelando...")
+        
+        boton_cancelar = tk.Button(
+            ventana, text="Cancelar", font=('Arial', 10), bg='#dc2626', fg='white',
+            command=cancelar, cursor='hand2', width=14
+        )
+        boton_cancelar.pack()
+        ventana.protocol("WM_DELETE_WINDOW", cancelar)
+        
+        def revisar_mensajes():
+            try:
+                while True:
+                    tipo, valor, texto = trabajo.mensajes.get_nowait()
+                    if tipo == 'avance':
+                        barra['value'] = valor
+                        etiqueta.config(text=texto)
+                        continue
+                    ventana.destroy()
+                    if tipo == 'fin':
+                        messagebox.showinfo("Éxito", f"{mensaje_exito}\n{texto}\n\n(Generado en {valor:.1f} s)")
+                    elif tipo == 'cancelado':
+                        messagebox.showinfo("Exportación cancelada", "La exportación se canceló y no se guardó ningún archivo.")
+                    else:
+                        messagebox.showerror("Error", f"Error al exportar: {texto}")
+                    return
+            except queue.Empty:
+                pass
+            self.root.after(100, revisar_mensajes)
+        
+        trabajo.iniciar()
+        self.root.after(100, revisar_mensajes)
     
     def obtener_meses_con_ventas(self):
         """Obtiene la lista de meses que tienen ventas registradas"""
         try:
             self.cursor.execute('''
-                SELECT DISTINCT strftime('%Y-%m', fecha) as mes
+                SELECT DISTINCT substr(fecha, 1, 7) as mes
                 FROM ventas 
                 ORDER BY mes DESC
             ''')
@@ -3797,145 +6027,142 @@ class KioscoPOS:
                 filetypes=[("Excel files", "*.xlsx")],
                 initialfile=f"reporte_mensual_{nombre_mes}.xlsx"
             )
-            
-            if filename:
-                from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-                
-                # Consulta de ventas del mes
-                self.cursor.execute('''
-                    SELECT 
-                        v.id as venta_id,
-                        v.fecha,
-                        v.usuario,
-                        v.metodo_pago,
-                        v.total as total_venta,
-                        v.costo_total as costo_venta,
-                        (v.total - v.costo_total) as ganancia_venta,
-                        v.turno
-                    FROM ventas v 
-                    WHERE strftime('%Y-%m', v.fecha) = ?
-                    ORDER BY v.fecha DESC
-                ''', (mes_seleccionado,))
-                ventas_mes = self.cursor.fetchall()
-                
-                # Consulta detallada de productos vendidos en el mes
-                self.cursor.execute('''
-                    SELECT 
-                        v.id as venta_id,
-                        v.fecha,
-                        v.usuario,
-                        v.turno,
-                        iv.producto_nombre as producto,
-                        iv.cantidad,
-                        iv.precio_unitario,
-                        iv.costo_unitario,
-                        (iv.cantidad * iv.precio_unitario) as subtotal,
-                        (iv.cantidad * iv.costo_unitario) as costo_subtotal,
-                        ((iv.cantidad * iv.precio_unitario) - (iv.cantidad * iv.costo_unitario)) as ganancia_producto
-                    FROM ventas v
-                    JOIN items_venta iv ON v.id = iv.venta_id
-                    WHERE strftime('%Y-%m', v.fecha) = ?
-                    ORDER BY v.fecha DESC, iv.producto_nombre
-                ''', (mes_seleccionado,))
-                detalle_productos_mes = self.cursor.fetchall()
-                
-                # Crear workbook con formato
-                with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                    
-                    # Hoja 1: Resumen de Ventas del Mes
-                    if ventas_mes:
-                        df_ventas = pd.DataFrame(ventas_mes, columns=[
-                            'ID Venta', 'Fecha y Hora', 'Usuario', 'Método Pago', 
-                            'Total Venta', 'Costo Venta', 'Ganancia Venta', 'Turno'
-                        ])
-                        df_ventas.to_excel(writer, sheet_name='Resumen Ventas Mes', index=False)
-                        
-                        # Formatear hoja de ventas
-                        ws_ventas = writer.sheets['Resumen Ventas Mes']
-                        self._formatear_hoja_excel(ws_ventas, df_ventas, f'Resumen de Ventas - {nombre_mes.replace("_", " ")}')
-                    
-                    # Hoja 2: Detalle de Productos Vendidos
-                    if detalle_productos_mes:
-                        df_detalle = pd.DataFrame(detalle_productos_mes, columns=[
-                            'ID Venta', 'Fecha y Hora', 'Usuario', 'Turno', 'Producto',
-                            'Cantidad', 'Precio Unit.', 'Costo Unit.', 'Subtotal', 
-                            'Costo Subtotal', 'Ganancia por Producto'
-                        ])
-                        df_detalle.to_excel(writer, sheet_name='Detalle Productos Mes', index=False)
-                        
-                        # Formatear hoja de detalle
-                        ws_detalle = writer.sheets['Detalle Productos Mes']
-                        self._formatear_hoja_excel(ws_detalle, df_detalle, f'Detalle de Productos - {nombre_mes.replace("_", " ")}')
-                    
-                    # Hoja 3: Análisis Mensual
-                    analisis_data = self._calcular_analisis_mensual(mes_seleccionado, ventas_mes, detalle_productos_mes)
-                    df_analisis = pd.DataFrame(analisis_data)
-                    df_analisis.to_excel(writer, sheet_name='Análisis Mensual', index=False)
-                    
-                    # Formatear hoja de análisis
-                    ws_analisis = writer.sheets['Análisis Mensual']
-                    self._formatear_hoja_totales(ws_analisis, df_analisis, f'Análisis Financiero Mensual - {nombre_mes.replace("_", " ")}')
-                    
-                    # Hoja 4: Resumen por Días
-                    resumen_dias = self._calcular_resumen_por_dias(mes_seleccionado)
-                    if resumen_dias:
-                        df_dias = pd.DataFrame(resumen_dias)
-                        df_dias.to_excel(writer, sheet_name='Resumen por Días', index=False)
-                        
-                        # Formatear hoja de resumen diario
-                        ws_dias = writer.sheets['Resumen por Días']
-                        self._formatear_hoja_excel(ws_dias, df_dias, f'Resumen Diario - {nombre_mes.replace("_", " ")}')
-                    
-                    # Hoja 5: Historial de Cajas del Mes
-                    self.cursor.execute('''
-                        SELECT id, usuario, rol, fecha_apertura, fecha_cierre, fondo_inicial, total_ventas_por_metodo, faltante_sobrante, estado, turno
-                        FROM cajas 
-                        WHERE strftime('%Y-%m', fecha_apertura) = ?
-                        ORDER BY fecha_apertura DESC
-                    ''', (mes_seleccionado,))
-                    cajas_mes = self.cursor.fetchall()
-                    
-                    if cajas_mes:
-                        cajas_data = []
-                        for caja in cajas_mes:
-                            caja_id, usuario, rol, fecha_ap, fecha_ci, fondo_ini, totales_metodos, falt_sobr, estado, turno = caja
-                            
-                            # Parsear JSON
-                            fondo_inicial = json.loads(fondo_ini) if fondo_ini else {}
-                            totales = json.loads(totales_metodos) if totales_metodos else {}
-                            
-                            cajas_data.append({
-                                'ID': caja_id,
-                                'Usuario': usuario,
-                                'Rol': rol,
-                                'Turno': turno or '',
-                                'Fecha Apertura': fecha_ap,
-                                'Fecha Cierre': fecha_ci or 'Abierta',
-                                'Fondo Inicial Efectivo': fondo_inicial.get('Efectivo', 0),
-                                'Fondo Inicial Transferencia': fondo_inicial.get('Transferencia', 0),
-                                'Fondo Inicial Débito': fondo_inicial.get('Débito', 0),
-                                'Fondo Inicial Crédito': fondo_inicial.get('Crédito', 0),
-                                'Recaudado Efectivo': totales.get('Efectivo', 0),
-                                'Recaudado Transferencia': totales.get('Transferencia', 0),
-                                'Recaudado Débito': totales.get('Débito', 0),
-                                'Recaudado Crédito': totales.get('Crédito', 0),
-                                'Faltante/Sobrante': falt_sobr or 0,
-                                'Estado': estado
-                            })
-                        
-                        df_cajas = pd.DataFrame(cajas_data)
-                        df_cajas.to_excel(writer, sheet_name='Historial de Cajas', index=False)
-                        
-                        # Formatear hoja cajas
-                        ws_cajas = writer.sheets['Historial de Cajas']
-                        self._formatear_hoja_excel(ws_cajas, df_cajas, f'Historial de Cajas - {nombre_mes.replace("_", " ")}')
-
-                messagebox.showinfo("Éxito", f"Reporte mensual de {nombre_mes.replace('_', ' ')} exportado exitosamente a:\n{filename}")
-                
         except Exception as e:
             messagebox.showerror("Error", f"Error al exportar reporte mensual: {str(e)}")
+            return
+        
+        if filename:
+            self._exportar_en_segundo_plano(
+                f"Exportando {nombre_mes.replace('_', ' ')}", filename,
+                lambda trabajo: self._generar_reporte_mes(trabajo, mes_seleccionado, nombre_mes),
+                f"Reporte mensual de {nombre_mes.replace('_', ' ')} exportado exitosamente a:"
+            )
+    
+    def _generar_reporte_mes(self, trabajo, mes, nombre_mes):
+        """Escribe el reporte mensual (corre en el hilo de exportación)"""
+        cursor = trabajo.cursor
+        rango_mes = self._rango_fechas(mes)
+        
+        # Consulta de ventas del mes
+        trabajo.avance(5, "Consultando ventas del mes...")
+        cursor.execute('''
+            SELECT 
+                v.id as venta_id,
+                v.fecha,
+                v.usuario,
+                v.metodo_pago,
+                v.total_centavos,
+                v.costo_centavos,
+                v.turno
+            FROM ventas v 
+            WHERE v.fecha >= ? AND v.fecha < ?
+            ORDER BY v.fecha DESC
+        ''', rango_mes)
+        ventas_mes = cursor.fetchall()
+        
+        # Consulta detallada de productos vendidos en el mes
+        cursor.execute('''
+            SELECT 
+                v.id as venta_id,
+                v.fecha,
+                v.usuario,
+                v.turno,
+                iv.producto_nombre as producto,
+                iv.cantidad,
+                iv.precio_centavos / 100.0 as precio_unitario,
+                iv.costo_centavos / 100.0 as costo_unitario,
+                iv.cantidad * iv.precio_centavos / 100.0 as subtotal,
+                iv.cantidad * iv.costo_centavos / 100.0 as costo_subtotal,
+                iv.cantidad * (iv.precio_centavos - iv.costo_centavos) / 100.0 as ganancia_producto
+            FROM ventas v
+            JOIN items_venta iv ON v.id = iv.venta_id
+            WHERE v.fecha >= ? AND v.fecha < ?
+            ORDER BY v.fecha DESC, iv.producto_nombre
+        ''', rango_mes)
+        detalle_productos_mes = cursor.fetchall()
+        
+        periodo = nombre_mes.replace("_", " ")
+        libro = LibroExcelStreaming()
+        columnas_detalle = [
+            'ID Venta', 'Fecha y Hora', 'Usuario', 'Turno', 'Producto', 'Cantidad', 'Precio Unit.', 'Costo Unit.',
+            'Subtotal', 'Costo Subtotal', 'Ganancia por Producto'
+        ]
+        
+        # Hoja 1: Resumen de Ventas del Mes
+        trabajo.avance(25, "Exportando resumen de ventas...")
+        if ventas_mes:
+            libro.agregar_hoja(
+                'Resumen Ventas Mes', f'Resumen de Ventas - {periodo}',
+                ['ID Venta', 'Fecha y Hora', 'Usuario', 'Método Pago', 'Total Venta', 'Costo Venta', 'Ganancia Venta', 'Turno'],
+                self._filas_resumen_ventas(ventas_mes), trabajo
+            )
+        
+        # Hoja 2: Detalle de Productos Vendidos
+        trabajo.avance(40, "Exportando detalle de productos...")
+        if detalle_productos_mes:
+            libro.agregar_hoja(
+                'Detalle Productos Mes', f'Detalle de Productos - {periodo}',
+                columnas_detalle, detalle_productos_mes, trabajo
+            )
+        
+        # Hoja 3: Análisis Mensual
+        trabajo.avance(70, "Calculando análisis mensual...")
+        libro.agregar_hoja_registros(
+            'Análisis Mensual', f'Análisis Financiero Mensual - {periodo}',
+            self._calcular_analisis_mensual(mes, ventas_mes, self._ventas_por_producto(cursor, rango_mes)),
+            analisis=True
+        )
+        
+        # Hoja 4: Resumen por Días
+        trabajo.avance(80, "Calculando resumen por días...")
+        libro.agregar_hoja_registros(
+            'Resumen por Días', f'Resumen Diario - {periodo}', self._calcular_resumen_por_dias(mes, cursor)
+        )
+        
+        # Hoja 5: Historial de Cajas del Mes
+        trabajo.avance(90, "Exportando historial de cajas...")
+        cursor.execute('''
+            SELECT id, usuario, rol, fecha_apertura, fecha_cierre, fondo_inicial, total_ventas_por_metodo, faltante_sobrante, estado, turno
+            FROM cajas 
+            WHERE fecha_apertura >= ? AND fecha_apertura < ?
+            ORDER BY fecha_apertura DESC
+        ''', rango_mes)
+        libro.agregar_hoja_registros('Historial de Cajas', f'Historial de Cajas - {periodo}', self._registros_cajas(cursor.fetchall()))
+        
+        trabajo.avance(95, "Guardando archivo...")
+        libro.guardar(trabajo.archivo)
+    
+    @staticmethod
+    def _filas_resumen_ventas(ventas):
+        """Filas de la hoja de resumen (importes en pesos) a partir de las ventas en centavos"""
+        for venta_id, fecha, usuario, metodo_pago, total_centavos, costo_centavos, turno in ventas:
+            yield (venta_id, fecha, usuario, metodo_pago, total_centavos / 100, costo_centavos / 100,
+                   (total_centavos - costo_centavos) / 100, turno)
+    
+    def _ventas_por_producto(self, cursor, rango):
+        """Unidades, ventas y ganancia (en centavos) por producto en el rango de fechas [inicio, fin).
+        
+        Agrupa por producto_id, así un producto renombrado sigue sumando junto; los items
+        sin producto (ventas viejas de productos borrados) se agrupan por el nombre guardado.
+        Retorna una lista de dicts con nombre, cantidad, ventas y ganancia.
+        """
+        cursor.execute('''
+            SELECT COALESCE(p.nombre, MAX(iv.producto_nombre)),
+                   SUM(iv.cantidad),
+                   SUM(iv.cantidad * iv.precio_centavos),
+                   SUM(iv.cantidad * (iv.precio_centavos - iv.costo_centavos))
+            FROM ventas v
+            JOIN items_venta iv ON iv.venta_id = v.id
+            LEFT JOIN productos p ON p.id = iv.producto_id
+            WHERE v.fecha >= ? AND v.fecha < ?
+            GROUP BY iv.producto_id, CASE WHEN iv.producto_id IS NULL THEN iv.producto_nombre END
+        ''', rango)
+        return [
+            {'nombre': nombre, 'cantidad': cantidad, 'ventas': ventas / 100, 'ganancia': ganancia / 100}
+            for nombre, cantidad, ventas, ganancia in cursor.fetchall()
+        ]
     
-    def _calcular_analisis_mensual(self, mes, ventas_mes, detalle_productos_mes):
+    def _calcular_analisis_mensual(self, mes, ventas_mes, productos_mes):
         """Calcula análisis completo del mes"""
         if not ventas_mes:
             return [{'Concepto': 'Sin ventas registradas en este mes', 'Valor': 'N/A'}]
@@ -3956,11 +6183,13 @@ class KioscoPOS:
         except:
             nombre_mes = mes
         
-        # Cálculos básicos
+        # Cálculos básicos: las ventas vienen en centavos enteros y se pasan a pesos solo para mostrar
         total_ventas = len(ventas_mes)
-        total_vendido = sum(v[4] for v in ventas_mes)  # total_venta
-        total_costo = sum(v[5] for v in ventas_mes)    # costo_venta
-        total_ganancia = total_vendido - total_costo
+        vendido_centavos = sum(v[4] for v in ventas_mes)  # total_centavos
+        costo_centavos = sum(v[5] for v in ventas_mes)    # costo_centavos
+        total_vendido = vendido_centavos / 100
+        total_costo = costo_centavos / 100
+        total_ganancia = (vendido_centavos - costo_centavos) / 100
         
         # Análisis por días únicos
         dias_con_ventas = len(set(v[1][:10] for v in ventas_mes))  # fecha (solo día)
@@ -3968,46 +6197,30 @@ class KioscoPOS:
         # Análisis por turno
         ventas_por_turno = {}
         for venta in ventas_mes:
-            turno = venta[7]  # turno
+            turno = venta[6]  # turno
             if turno in ventas_por_turno:
                 ventas_por_turno[turno]['cantidad'] += 1
                 ventas_por_turno[turno]['total'] += venta[4]
-                ventas_por_turno[turno]['ganancia'] += venta[6]
+                ventas_por_turno[turno]['ganancia'] += venta[4] - venta[5]
             else:
                 ventas_por_turno[turno] = {
                     'cantidad': 1, 
                     'total': venta[4], 
-                    'ganancia': venta[6]
-                }
-        
-        # Análisis por producto
-        productos_mes = {}
-        for item in detalle_productos_mes:
-            producto = item[4]  # producto
-            cantidad = item[5]  # cantidad
-            ganancia = item[10] # ganancia_producto
-            subtotal = item[8]  # subtotal
-            
-            if producto in productos_mes:
-                productos_mes[producto]['cantidad'] += cantidad
-                productos_mes[producto]['ganancia'] += ganancia
-                productos_mes[producto]['ventas'] += subtotal
-            else:
-                productos_mes[producto] = {
-                    'cantidad': cantidad, 
-                    'ganancia': ganancia,
-                    'ventas': subtotal
+                    'ganancia': venta[4] - venta[5]
                 }
+        for datos in ventas_por_turno.values():
+            datos['total'] /= 100
+            datos['ganancia'] /= 100
         
-        # Productos destacados
+        # Productos destacados (productos_mes ya viene agrupado por producto desde SQL)
         if productos_mes:
-            producto_mas_vendido = max(productos_mes.items(), key=lambda x: x[1]['cantidad'])
-            producto_mayor_ganancia = max(productos_mes.items(), key=lambda x: x[1]['ganancia'])
-            producto_mayor_ventas = max(productos_mes.items(), key=lambda x: x[1]['ventas'])
+            producto_mas_vendido = max(productos_mes, key=lambda x: x['cantidad'])
+            producto_mayor_ganancia = max(productos_mes, key=lambda x: x['ganancia'])
+            producto_mayor_ventas = max(productos_mes, key=lambda x: x['ventas'])
         else:
-            producto_mas_vendido = ('N/A', {'cantidad': 0})
-            producto_mayor_ganancia = ('N/A', {'ganancia': 0})
-            producto_mayor_ventas = ('N/A', {'ventas': 0})
+            producto_mas_vendido = {'nombre': 'N/A', 'cantidad': 0}
+            producto_mayor_ganancia = {'nombre': 'N/A', 'ganancia': 0}
+            producto_mayor_ventas = {'nombre': 'N/A', 'ventas': 0}
         
         # Turno más productivo
         turno_mas_productivo = max(ventas_por_turno.items(), key=lambda x: x[1]['total']) if ventas_por_turno else ('N/A', {'total': 0, 'cantidad': 0})
@@ -4029,9 +6242,9 @@ class KioscoPOS:
             {'Concepto': 'Promedio por Día ($)', 'Valor': f"${promedio_dia:,.2f}"},
             {'Concepto': 'Margen de Ganancia (%)', 'Valor': f"{margen_ganancia:.1f}%"},
             {'Concepto': 'Productos Únicos Vendidos', 'Valor': len(productos_mes)},
-            {'Concepto': 'Producto Más Vendido', 'Valor': f"{producto_mas_vendido[0]} ({producto_mas_vendido[1]['cantidad']} unidades)"},
-            {'Concepto': 'Producto con Mayor Ganancia', 'Valor': f"{producto_mayor_ganancia[0]} (${producto_mayor_ganancia[1]['ganancia']:,.2f})"},
-            {'Concepto': 'Producto con Mayores Ventas', 'Valor': f"{producto_mayor_ventas[0]} (${producto_mayor_ventas[1]['ventas']:,.2f})"},
+            {'Concepto': 'Producto Más Vendido', 'Valor': f"{producto_mas_vendido['nombre']} ({producto_mas_vendido['cantidad']} unidades)"},
+            {'Concepto': 'Producto con Mayor Ganancia', 'Valor': f"{producto_mayor_ganancia['nombre']} (${producto_mayor_ganancia['ganancia']:,.2f})"},
+            {'Concepto': 'Producto con Mayores Ventas', 'Valor': f"{producto_mayor_ventas['nombre']} (${producto_mayor_ventas['ventas']:,.2f})"},
             {'Concepto': 'Turno Más Productivo', 'Valor': f"{turno_mas_productivo[0]} (${turno_mas_productivo[1]['total']:,.2f} en {turno_mas_productivo[1]['cantidad']} ventas)"}
         ]
         
@@ -4045,23 +6258,23 @@ class KioscoPOS:
         
         return analisis
     
-    def _calcular_resumen_por_dias(self, mes):
+    def _calcular_resumen_por_dias(self, mes, cursor):
         """Calcula resumen de ventas por día del mes"""
         try:
-            self.cursor.execute('''
+            cursor.execute('''
                 SELECT 
-                    DATE(fecha) as dia,
+                    substr(fecha, 1, 10) as dia,
                     COUNT(*) as num_ventas,
-                    SUM(total) as total_dia,
-                    SUM(costo_total) as costo_dia,
-                    SUM(total - costo_total) as ganancia_dia
+                    SUM(total_centavos) / 100.0 as total_dia,
+                    SUM(costo_centavos) / 100.0 as costo_dia,
+                    SUM(total_centavos - costo_centavos) / 100.0 as ganancia_dia
                 FROM ventas 
-                WHERE strftime('%Y-%m', fecha) = ?
-                GROUP BY DATE(fecha)
+                WHERE fecha >= ? AND fecha < ?
+                GROUP BY substr(fecha, 1, 10)
                 ORDER BY dia
-            ''', (mes,))
+            ''', self._rango_fechas(mes))
             
-            resultados = self.cursor.fetchall()
+            resultados = cursor.fetchall()
             
             resumen_dias = []
             for resultado in resultados:
@@ -4096,126 +6309,24 @@ class KioscoPOS:
             print(f"Error al calcular resumen por días: {e}")
             return []
     
-    def _formatear_hoja_excel(self, worksheet, dataframe, titulo):
-        """Aplica formato profesional a una hoja de Excel"""
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-        
-        # Colores y estilos
-        header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-        title_fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Insertar fila para título
-        worksheet.insert_rows(1)
-        worksheet['A1'] = titulo
-        worksheet['A1'].font = Font(bold=True, size=14, color='FFFFFF')
-        worksheet['A1'].fill = PatternFill(start_color='203764', end_color='203764', fill_type='solid')
-        worksheet['A1'].alignment = Alignment(horizontal='center')
-        worksheet.merge_cells('A1:' + chr(65 + len(dataframe.columns) - 1) + '1')
-        
-        # Formatear encabezados (ahora en fila 2)
-        for col_num, column_title in enumerate(dataframe.columns, 1):
-            cell = worksheet.cell(row=2, column=col_num)
-            cell.font = Font(bold=True, color='FFFFFF')
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = border
-        
-        # Formatear datos y ajustar columnas
-        for row_num in range(3, len(dataframe) + 3):
-            for col_num in range(1, len(dataframe.columns) + 1):
-                cell = worksheet.cell(row=row_num, column=col_num)
-                cell.border = border
-                cell.alignment = Alignment(vertical='center')
-                
-                # Formato especial para columnas de dinero
-                column_name = dataframe.columns[col_num - 1].lower()
-                if any(word in column_name for word in ['precio', 'costo', 'total', 'ganancia', 'subtotal']):
-                    cell.number_format = '"$" #,##0.00'
-                    cell.alignment = Alignment(horizontal='right', vertical='center')
-        
-        # Ajustar ancho de columnas automáticamente
-        for col_num in range(1, len(dataframe.columns) + 1):
-            max_length = 0
-            column_letter = chr(64 + col_num)  # A=65, B=66, etc.
-            
-            # Revisar todas las celdas de la columna
-            for row_num in range(1, len(dataframe) + 3):  # +3 por título y header
-                try:
-                    cell = worksheet.cell(row=row_num, column=col_num)
-                    if hasattr(cell, 'value') and cell.value is not None:
-                        cell_length = len(str(cell.value))
-                        if cell_length > max_length:
-                            max_length = cell_length
-                except:
-                    pass
-            
-            # Ajustar ancho mínimo para headers
-            if col_num <= len(dataframe.columns):
-                header_length = len(str(dataframe.columns[col_num - 1]))
-                max_length = max(max_length, header_length)
-            
-            adjusted_width = min(max(max_length + 2, 12), 50)  # Mínimo 12, máximo 50
-            worksheet.column_dimensions[column_letter].width = adjusted_width
-    
-    def _formatear_hoja_totales(self, worksheet, dataframe, titulo):
-        """Formato especial para la hoja de totales y análisis"""
-        from openpyxl.styles import Font, PatternFill, Alignment
-        
-        # Aplicar formato base
-        self._formatear_hoja_excel(worksheet, dataframe, titulo)
-        
-        # Destacar totales importantes con colores
-        for row_num in range(3, len(dataframe) + 3):
-            concepto_cell = worksheet.cell(row=row_num, column=1)
-            valor_cell = worksheet.cell(row=row_num, column=2)
-            
-            concepto = str(concepto_cell.value).lower()
-            
-            if 'total' in concepto or 'ganancia total' in concepto:
-                concepto_cell.fill = PatternFill(start_color='70AD47', end_color='70AD47', fill_type='solid')
-                concepto_cell.font = Font(bold=True, color='FFFFFF')
-                valor_cell.fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')
-                valor_cell.font = Font(bold=True)
-            elif 'producto más vendido' in concepto or 'mejor' in concepto:
-                concepto_cell.fill = PatternFill(start_color='FFC000', end_color='FFC000', fill_type='solid')
-                concepto_cell.font = Font(bold=True)
-                valor_cell.fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
-    
-    def _calcular_totales_dia(self, fecha, ventas, detalle_productos):
+    def _calcular_totales_dia(self, fecha, ventas, productos_vendidos):
         """Calcula análisis completo del día"""
         if not ventas:
             return [{'Concepto': 'Sin ventas registradas', 'Valor': 'N/A'}]
         
-        # Cálculos básicos
+        # Cálculos básicos: las ventas vienen en centavos enteros y se pasan a pesos solo para mostrar
         total_ventas = len(ventas)
-        total_vendido = sum(v[4] for v in ventas)  # total_venta
-        total_costo = sum(v[5] for v in ventas)    # costo_venta
-        total_ganancia = total_vendido - total_costo
-        
-        # Análisis por producto
-        productos_vendidos = {}
-        for item in detalle_productos:
-            producto = item[4]  # producto
-            cantidad = item[5]  # cantidad
-            ganancia = item[10] # ganancia_producto
-            
-            if producto in productos_vendidos:
-                productos_vendidos[producto]['cantidad'] += cantidad
-                productos_vendidos[producto]['ganancia'] += ganancia
-            else:
-                productos_vendidos[producto] = {'cantidad': cantidad, 'ganancia': ganancia}
+        vendido_centavos = sum(v[4] for v in ventas)  # total_centavos
+        costo_centavos = sum(v[5] for v in ventas)    # costo_centavos
+        total_vendido = vendido_centavos / 100
+        total_costo = costo_centavos / 100
+        total_ganancia = (vendido_centavos - costo_centavos) / 100
         
-        # Producto más vendido
-        producto_mas_vendido = max(productos_vendidos.items(), key=lambda x: x[1]['cantidad']) if productos_vendidos else ('N/A', {'cantidad': 0})
+        # Producto más vendido (productos_vendidos ya viene agrupado por producto desde SQL)
+        producto_mas_vendido = max(productos_vendidos, key=lambda x: x['cantidad']) if productos_vendidos else {'nombre': 'N/A', 'cantidad': 0}
         
         # Producto con mayor ganancia
-        producto_mayor_ganancia = max(productos_vendidos.items(), key=lambda x: x[1]['ganancia']) if productos_vendidos else ('N/A', {'ganancia': 0})
+        producto_mayor_ganancia = max(productos_vendidos, key=lambda x: x['ganancia']) if productos_vendidos else {'nombre': 'N/A', 'ganancia': 0}
         
         # Promedio por venta
         promedio_venta = total_vendido / total_ventas if total_ventas > 0 else 0
@@ -4232,8 +6343,8 @@ class KioscoPOS:
             {'Concepto': 'Promedio por Venta ($)', 'Valor': f"${promedio_venta:,.2f}"},
             {'Concepto': 'Margen de Ganancia (%)', 'Valor': f"{margen_ganancia:.1f}%"},
             {'Concepto': 'Productos Únicos Vendidos', 'Valor': len(productos_vendidos)},
-            {'Concepto': 'Producto Más Vendido', 'Valor': f"{producto_mas_vendido[0]} ({producto_mas_vendido[1]['cantidad']} unidades)"},
-            {'Concepto': 'Producto con Mayor Ganancia', 'Valor': f"{producto_mayor_ganancia[0]} (${producto_mayor_ganancia[1]['ganancia']:,.2f})"}
+            {'Concepto': 'Producto Más Vendido', 'Valor': f"{producto_mas_vendido['nombre']} ({producto_mas_vendido['cantidad']} unidades)"},
+            {'Concepto': 'Producto con Mayor Ganancia', 'Valor': f"{producto_mayor_ganancia['nombre']} (${producto_mayor_ganancia['ganancia']:,.2f})"}
         ]
 
     def confirmar_eliminar_reportes(self):
@@ -4306,6 +6417,7 @@ class KioscoPOS:
             # Eliminar ventas
             self.cursor.execute("DELETE FROM ventas")
             ventas_eliminadas = self.cursor.rowcount
+            self.cursor.execute("DELETE FROM ventas_resumen_diario")
             
             # Confirmar cambios
             self.conn.commit()
@@ -4469,7 +6581,319 @@ class KioscoPOS:
             self.conn.close()
 
 
+def benchmark_conexion(ventas=200):
+    """Mide la latencia de commit de una venta típica sin perfil y con PerfilConexion.
+    
+    Usa bases temporales, no toca kiosco.db. También prueba si una venta puede
+    guardarse mientras otra conexión mantiene abierta una lectura larga (exportación).
+    """
+    def preparar(conn):
+        conn.execute('''
+            CREATE TABLE ventas (id INTEGER PRIMARY KEY AUTOINCREMENT, fecha TEXT NOT NULL, usuario TEXT NOT NULL,
+                metodo_pago TEXT NOT NULL, total_centavos INTEGER NOT NULL, costo_centavos INTEGER NOT NULL,
+                turno TEXT NOT NULL)
+        ''')
+        conn.execute('''
+            CREATE TABLE items_venta (id INTEGER PRIMARY KEY AUTOINCREMENT, venta_id INTEGER NOT NULL,
+                producto_nombre TEXT NOT NULL, cantidad INTEGER NOT NULL, precio_centavos INTEGER NOT NULL,
+                costo_centavos INTEGER NOT NULL)
+        ''')
+        ResumenVentas(conn.cursor()).crear_tabla()
+        conn.commit()
+
+    def registrar_venta(conn):
+        cursor = conn.cursor()
+        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            INSERT INTO ventas (fecha, usuario, metodo_pago, total_centavos, costo_centavos, turno)
+            VALUES (?, 'benchmark', 'Efectivo', 250000, 160000, 'MAÑANA')
+        ''', (fecha,))
+        venta_id = cursor.lastrowid
+        ResumenVentas(cursor).registrar_venta(fecha, 'MAÑANA', 'Efectivo', 250000, 160000)
+        cursor.executemany('''
+            INSERT INTO items_venta (venta_id, producto_nombre, cantidad, precio_centavos, costo_centavos)
+            VALUES (?, ?, 1, 50000, 32000)
+        ''', [(venta_id, f'Producto {i}') for i in range(5)])
+        conn.commit()
+
+    perfiles = [('Sin perfil (DELETE, FULL)', None), ('PerfilConexion', PerfilConexion())]
+    print(f"Commit de {ventas} ventas de 5 items:")
+    with tempfile.TemporaryDirectory() as carpeta:
+        for nombre, perfil in perfiles:
+            ruta = os.path.join(carpeta, f"benchmark_{len(nombre)}.db")
+            conn = sqlite3.connect(ruta, timeout=0.2)
+            if perfil:
+                perfil.aplicar(conn)
+            preparar(conn)
+            
+            tiempos = []
+            for _ in range(ventas):
+                inicio = time.perf_counter()
+                registrar_venta(conn)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+            print(f"  {nombre:<28} mediana {statistics.median(tiempos):7.3f} ms   p95 {p95:7.3f} ms")
+            
+            # Venta mientras otra conexión lee (como una exportación a Excel en curso)
+            lector = sqlite3.connect(ruta)
+            lector.execute('BEGIN')
+            lector.execute('SELECT * FROM ventas').fetchone()
+            try:
+                inicio = time.perf_counter()
+                registrar_venta(conn)
+                print(f"  {'':<28} venta con lectura abierta: {(time.perf_counter() - inicio) * 1000:.3f} ms")
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                print(f"  {'':<28} venta con lectura abierta: bloqueada ({e})")
+            finally:
+                lector.rollback()
+                lector.close()
+                conn.close()
+    return 0
+
+def benchmark_busqueda(productos=50000):
+    """Mide la búsqueda del punto de venta tecla por tecla sobre un catálogo sintético.
+    
+    Arma el catálogo en una BD en memoria (no toca kiosco.db) y simula tipear cada
+    búsqueda letra por letra, con y sin errores de tipeo.
+    """
+    rubros = ['Alfajor', 'Café', 'Yerba', 'Galletitas', 'Chocolate', 'Gaseosa', 'Leche', 'Azúcar',
+              'Fideos', 'Arroz', 'Aceite', 'Atún', 'Jamón', 'Queso', 'Cerveza', 'Agua', 'Jugo']
+    marcas = ['Arcor', 'Coca Cola', 'La Serenísima', 'Taragüí', 'Bagley', 'Marolio', 'Quilmes', 'Ñandú']
+    categorias = ['Almacén', 'Bebidas', 'Golosinas', 'Lácteos', 'Limpieza']
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE productos (id INTEGER PRIMARY KEY, nombre TEXT, precio REAL, costo REAL, stock INTEGER,
+            categoria TEXT, codigo_barras TEXT, precio_sugerido REAL, ganancia_deseada REAL)
+    ''')
+    conn.execute('CREATE TABLE ventas (id INTEGER PRIMARY KEY, fecha TEXT)')
+    conn.execute('CREATE TABLE items_venta (venta_id INTEGER, producto_nombre TEXT, cantidad INTEGER, producto_id INTEGER)')
+    conn.executemany('''
+        INSERT INTO productos (nombre, precio, costo, stock, categoria, codigo_barras)
+        VALUES (?, 1000, 700, 10, ?, ?)
+    ''', [(f"{rubros[i % len(rubros)]} {marcas[i // len(rubros) % len(marcas)]} {100 + i % 900}g #{i}",
+           categorias[i % len(categorias)], str(7790000000000 + i)) for i in range(productos)])
+    
+    catalogo = CatalogoProductos()
+    inicio = time.perf_counter()
+    catalogo.cargar(conn.cursor())
+    print(f"Catálogo sintético de {productos} productos: carga e índices en {time.perf_counter() - inicio:.2f} s")
+    # El primer uso arma el texto concatenado y las listas ordenadas de palabras y códigos
+    catalogo.buscar_rankeado('#')
+    catalogo.buscar_rankeado('# #')
+    
+    busquedas = [
+        ('Tal cual', ['alfajor arcor', 'cafe', 'yerba taragui', 'coca cola', '7790000012345', 'serenisima']),
+        ('Con errores', ['alfajr arcor', 'cocacola', 'yrba taragui', 'chocolte', 'serenisma', 'galetitas']),
+    ]
+    for nombre, textos in busquedas:
+        tiempos = []
+        for texto in textos:
+            for largo in range(1, len(texto) + 1):
+                inicio = time.perf_counter()
+                resultado = catalogo.buscar_rankeado(texto[:largo], KioscoPOS.LIMITE_LISTA_VENTAS)
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            primero = resultado[0][1] if resultado else '(sin resultados)'
+            print(f"  {texto!r:<18} -> {len(resultado):>3} resultados, primero: {primero}")
+        tiempos.sort()
+        p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+        print(f"  {nombre:<12} {len(tiempos)} teclas: mediana {statistics.median(tiempos):6.2f} ms   "
+              f"p95 {p95:6.2f} ms   máx {tiempos[-1]:6.2f} ms")
+    conn.close()
+    return 0
+
+def verificar_centavos(conn, ruta_respaldo):
+    """Compara los importes en pesos REAL del respaldo previo a la migración con los centavos actuales.
+    
+    Cada venta e item tiene que coincidir exacto al centavo, y la suma en float de cada día
+    y de cada mes tiene que quedar a menos de medio centavo de la suma en centavos (si no,
+    el redondeo cambió la recaudación). Por mes se muestra además el desvío. Retorna la
+    lista de diferencias como (tabla/día/mes, id o fecha, centavos del respaldo, centavos
+    actuales), vacía si todo coincide.
+    """
+    conn.create_function('a_centavos', 1, a_centavos, deterministic=True)
+    conn.execute("ATTACH DATABASE ? AS respaldo", (ruta_respaldo,))
+    try:
+        diferencias = conn.execute('''
+            SELECT 'venta', r.id, a_centavos(r.total), v.total_centavos
+            FROM respaldo.ventas r LEFT JOIN main.ventas v ON v.id = r.id
+            WHERE v.id IS NULL OR a_centavos(r.total) != v.total_centavos
+                  OR a_centavos(r.costo_total) != v.costo_centavos
+            UNION ALL
+            SELECT 'item', r.id, a_centavos(r.precio_unitario), i.precio_centavos
+            FROM respaldo.items_venta r LEFT JOIN main.items_venta i ON i.id = r.id
+            WHERE i.id IS NULL OR r.cantidad != i.cantidad
+                  OR a_centavos(r.precio_unitario) != i.precio_centavos
+                  OR a_centavos(r.costo_unitario) != i.costo_centavos
+        ''').fetchall()
+        
+        def sumas_por(largo):
+            # Suma en float del respaldo y en centavos de la BD actual por prefijo de fecha (día o mes)
+            return conn.execute('''
+                SELECT r.periodo, r.cantidad, r.total, COALESCE(v.total, 0)
+                FROM (SELECT substr(fecha, 1, ?) AS periodo, COUNT(*) AS cantidad, SUM(total) AS total
+                      FROM respaldo.ventas GROUP BY periodo) r
+                LEFT JOIN (SELECT substr(fecha, 1, ?) AS periodo, SUM(total_centavos) AS total
+                           FROM main.ventas GROUP BY periodo) v ON v.periodo = r.periodo
+                ORDER BY r.periodo
+            ''', (largo, largo)).fetchall()
+        
+        for dia, _, suma_real, suma_centavos in sumas_por(10):
+            if abs(suma_real - suma_centavos / 100) >= 0.005:
+                diferencias.append(('día', dia, round(suma_real * 100, 2), suma_centavos))
+        
+        print("Mes       ventas   total REAL (float)   total centavos   desvío float")
+        for mes, cantidad, suma_real, suma_centavos in sumas_por(7):
+            desvio = suma_real - suma_centavos / 100
+            fuera = abs(desvio) >= 0.005
+            if fuera:
+                diferencias.append(('mes', mes, round(suma_real * 100, 2), suma_centavos))
+            print(f"{mes}  {cantidad:>7}  {suma_real:>19.6f}  {suma_centavos / 100:>15.2f}  {desvio:>13.2e}"
+                  + ("  ⚠️" if fuera else ""))
+        return diferencias
+    finally:
+        conn.execute("DETACH DATABASE respaldo")
+
+
+def benchmark_tickets(tickets=500, items=8):
+    """Mide cuánto tarda armar un ticket (sin escribirlo) con cada backend"""
+    carrito = Carrito()
+    for i in range(items):
+        carrito.agregar((i, f"Producto de prueba número {i}", 1234.5 + i, 800, 100, "Varios", str(i)), i % 3 + 1)
+    ticket = ServicioTickets.instantanea(12345, '2025-10-16 18:30:00', 'Administrador', 'Efectivo', carrito)
+    backends = [('PDF 80 mm', TicketPDF()), ('ESC/POS 58 mm', TicketESCPOS(58)), ('ESC/POS 80 mm', TicketESCPOS(80))]
+    print(f"Armado de {tickets} tickets de {items} items:")
+    for nombre, backend in backends:
+        backend.renderizar(ticket)
+        tiempos = []
+        for _ in range(tickets):
+            inicio = time.perf_counter()
+            datos = backend.renderizar(ticket)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+        print(f"  {nombre:<16} mediana {statistics.median(tiempos):7.3f} ms   p95 {p95:7.3f} ms   {len(datos)} bytes")
+    
+    # Guardar en el archivo del día y volver a leer por venta_id
+    backend = TicketPDF()
+    with tempfile.TemporaryDirectory() as carpeta:
+        archivo = ArchivoTickets(carpeta)
+        for venta_id in range(1, tickets + 1):
+            archivo.guardar(venta_id, ticket['fecha'], backend.renderizar(dict(ticket, venta_id=venta_id)), backend.extension)
+        tiempos = []
+        for venta_id in range(1, tickets + 1, max(1, tickets // 100)):
+            inicio = time.perf_counter()
+            archivo.leer(venta_id, ticket['fecha'][:10])
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        print(f"  Lectura del archivo del día ({tickets} tickets PDF): mediana {statistics.median(tiempos):7.3f} ms")
+    return 0
+
+
+COMANDOS_MANTENIMIENTO = (
+    'reconstruir-resumen', 'verificar-resumen', 'benchmark-bd', 'benchmark-busqueda',
+    'benchmark-tickets', 'verificar-centavos',
+)
+
+def es_mantenimiento(argumentos):
+    """True si los argumentos piden un comando de mantenimiento (y no abrir la interfaz).
+    
+    Cualquier otro argumento (un archivo arrastrado sobre el .exe, un flag que agrega un
+    acceso directo) se ignora y se abre el punto de venta.
+    """
+    if not argumentos:
+        return False
+    primero = argumentos[0]
+    return primero in COMANDOS_MANTENIMIENTO or primero in ('-h', '--help') or primero == '--bd' or primero.startswith('--bd=')
+
+def entero_positivo(valor):
+    """Tipo de argparse para cantidades de los benchmarks (al menos 1, si no no hay muestras)"""
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{valor}' no es un número entero")
+    if numero < 1:
+        raise argparse.ArgumentTypeError(f"tiene que ser al menos 1 (se recibió {numero})")
+    return numero
+
+def ejecutar_mantenimiento(argumentos):
+    """Ejecuta comandos de mantenimiento de la BD sin abrir la interfaz.
+    
+    Uso: python pos-kiosco-python.py <comando> [--bd kiosco.db]
+    """
+    parser = argparse.ArgumentParser(description="Mantenimiento del Sistema POS Kiosco")
+    parser.add_argument('--bd', default='kiosco.db', help="Archivo de base de datos (por defecto kiosco.db)")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comandos.add_parser('reconstruir-resumen', help="Recalcula ventas_resumen_diario y los totales de cajas desde la tabla ventas")
+    comandos.add_parser('verificar-resumen', help="Compara ventas_resumen_diario y los totales de cajas con la tabla ventas")
+    comando_benchmark = comandos.add_parser('benchmark-bd', help="Mide la latencia de commit con y sin el perfil de conexión")
+    comando_benchmark.add_argument('--ventas', type=entero_positivo, default=200, help="Cantidad de ventas a registrar")
+    comando_busqueda = comandos.add_parser('benchmark-busqueda', help="Mide la búsqueda de productos sobre un catálogo sintético")
+    comando_busqueda.add_argument('--productos', type=entero_positivo, default=50000, help="Cantidad de productos del catálogo")
+    comando_tickets = comandos.add_parser('benchmark-tickets', help="Mide el armado de tickets PDF y ESC/POS")
+    comando_tickets.add_argument('--tickets', type=entero_positivo, default=500, help="Cantidad de tickets a armar")
+    comando_centavos = comandos.add_parser('verificar-centavos', help="Compara los importes en centavos con el respaldo previo a la migración")
+    comando_centavos.add_argument('--respaldo', required=True, help="Respaldo creado por la migración (kiosco_antes_centavos_*.db)")
+    args = parser.parse_args(argumentos)
+    
+    if args.comando == 'benchmark-bd':
+        return benchmark_conexion(args.ventas)
+    if args.comando == 'benchmark-busqueda':
+        return benchmark_busqueda(args.productos)
+    if args.comando == 'benchmark-tickets':
+        return benchmark_tickets(args.tickets)
+    
+    if not os.path.exists(args.bd):
+        print(f"No existe la base de datos: {args.bd}")
+        return 1
+    conn = sqlite3.connect(args.bd)
+    try:
+        resumen = ResumenVentas(conn.cursor())
+        totales_caja = TotalesCaja(conn.cursor())
+        if args.comando == 'reconstruir-resumen':
+            filas = resumen.reconstruir()
+            cajas = totales_caja.reconstruir()
+            conn.commit()
+            print(f"✅ Resumen reconstruido: {filas} filas; totales recalculados en {cajas} cajas")
+        elif args.comando == 'verificar-resumen':
+            diferencias = resumen.verificar()
+            diferencias_caja = totales_caja.verificar()
+            if not diferencias and not diferencias_caja:
+                print("✅ El resumen y los totales de cajas coinciden con la tabla ventas")
+                return 0
+            if diferencias:
+                print(f"⚠️ {len(diferencias)} diferencias (día, turno, método, ventas, resumen):")
+                for diferencia in diferencias:
+                    print(f"   {diferencia}")
+            if diferencias_caja:
+                print(f"⚠️ {len(diferencias_caja)} cajas con diferencias (caja, ventas, guardado en cajas):")
+                for diferencia in diferencias_caja:
+                    print(f"   {diferencia}")
+            return 1
+        elif args.comando == 'verificar-centavos':
+            if not os.path.exists(args.respaldo):
+                print(f"No existe el respaldo: {args.respaldo}")
+                return 1
+            diferencias = verificar_centavos(conn, args.respaldo)
+            if not diferencias:
+                print("✅ Todas las ventas, items y totales por día y mes coinciden al centavo con el respaldo")
+                return 0
+            print(f"⚠️ {len(diferencias)} diferencias (tabla/día/mes, id o fecha, centavos del respaldo, centavos actuales):")
+            for diferencia in diferencias:
+                print(f"   {diferencia}")
+            return 1
+        return 0
+    finally:
+        conn.close()
+
+
 if __name__ == '__main__':
+    if es_mantenimiento(sys.argv[1:]):
+        sys.exit(ejecutar_mantenimiento(sys.argv[1:]))
     root = tk.Tk()
     app = KioscoPOS(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    if hasattr(app, 'servicio_tickets'):
+        # Terminar los tickets que quedaron en la cola antes de salir
+        app.servicio_tickets.detener()
\ No newline at end of file